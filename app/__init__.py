@@ -1,22 +1,47 @@
-from flask import Flask, jsonify
+import threading
+
+from flask import Flask, jsonify, request
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from app.config import get_config
-from flask_pyjwt import AuthManager, current_token
 from http import HTTPStatus
 from flask_restx import abort
 from flask_mail import Mail
+from app.utils.routing_session import RoutingSession
+from app.utils.token_cache import CachingAuthManager
 
 # Initialize Flask extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 bcrypt = Bcrypt()
-auth_manager = AuthManager()
+auth_manager = CachingAuthManager()
 mail = Mail()
 cors = CORS()
 
+_background_lock = threading.Lock()
+
+
+# Function to start the background threads of an app serving requests, once
+def _start_background_workers(app):
+    with _background_lock:
+        if app.extensions.get("background_workers"):
+            return
+        app.extensions["background_workers"] = True
+
+        from app.services.popularity_events import start_popularity_flusher
+
+        start_popularity_flusher(app)
+
+        from app.services.mail_outbox import start_mail_outbox_workers
+
+        start_mail_outbox_workers(app)
+
+        from app.services.token_sweeper import start_token_sweeper
+
+        start_token_sweeper(app)
+
 
 def create_app(config_name):
     # Create Flask application instance
@@ -32,12 +57,13 @@ def create_app(config_name):
     # Function to run before each request to check for blacklisted tokens
     @app.before_request
     def check_blacklist():
-        if current_token:
-            from app.models import BlacklistedToken
+        # require_token has not run yet, so read the bearer token directly
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header[:7].lower() == "bearer " and auth_header[7:]:
+            from app.services.token_blacklist import is_token_blacklisted
 
             # Check if the token is blacklisted
-            token = BlacklistedToken.check_blacklist(current_token.signed)
-            if token:
+            if is_token_blacklisted(auth_header[7:]):
                 abort(HTTPStatus.UNAUTHORIZED, "Unauthorized")
 
     # Enable CORS for API routes
@@ -46,12 +72,81 @@ def create_app(config_name):
 
     # Initialize Flask extensions with the application instance
     cors.init_app(app, origins=allow_origins)
+
+    # Size the connection pool from the waitress thread count
+    from app.services.db_pool import configure_engine_options
+
+    configure_engine_options(app)
+
+    # Register the read replicas as extra binds
+    from app.services.read_replicas import configure_replica_binds
+
+    configure_replica_binds(app)
     db.init_app(app)
-    migrate.init_app(app)
+    migrate.init_app(app, db)
     bcrypt.init_app(app)
     auth_manager.init_app(app)
     mail.init_app(app)
 
+    # Limit how long the statements of a request may run
+    from app.services.db_pool import init_statement_timeout
+
+    init_statement_timeout(app)
+
+    # Keep the full-text search documents in sync with book changes
+    from app.services.full_text_search import init_full_text_search
+
+    init_full_text_search(app)
+
+    # Build the in-memory search index when it is enabled
+    from app.services.inverted_index import init_inverted_index
+
+    init_inverted_index(app)
+
+    # Apply tokens blacklisted by this process to its blacklist cache
+    from app.services.token_blacklist import init_token_blacklist
+
+    init_token_blacklist(app)
+
+    # Drop cached user identities when users change
+    from app.services.identity_cache import init_identity_cache
+
+    init_identity_cache(app)
+
+    # Serve read-only requests from healthy read replicas
+    from app.services.read_replicas import init_read_replicas
+
+    init_read_replicas(app)
+
+    # Buffer popularity events until the background flusher applies them
+    from app.services.popularity_events import init_popularity_events
+
+    init_popularity_events(app)
+
+    # Drop stored recommendation lists when a user's interests change
+    from app.services.recommendation_cache import init_recommendation_cache
+
+    init_recommendation_cache(app)
+
+    # Wake the mail workers when emails are queued
+    from app.services.mail_outbox import init_mail_outbox
+
+    init_mail_outbox(app)
+
+    # Start the background threads with the first request served, so CLI
+    # commands and migrations run without them
+    @app.before_request
+    def start_background_workers():
+        if not app.extensions.get("background_workers") and app.config.get(
+            "BACKGROUND_WORKERS", True
+        ):
+            _start_background_workers(app)
+
+    # Register the maintenance CLI commands
+    from app.commands import register_commands
+
+    register_commands(app)
+
     # Define a route for the root endpoint
     @app.route("/")
     def index():
@@ -3,6 +3,8 @@
 # Import necessary modules and classes
 from flask import Blueprint, jsonify
 from flask_restx import Api
+from http import HTTPStatus
+from app.utils.password_hashing import PasswordHashingBusy
 
 # Import endpoints from different namespaces
 from .auth.endpoints import auth_ns
@@ -17,6 +19,7 @@ from .languages.endpoints import language_ns
 from .publishers.endpoints import publisher_ns
 from .bookmarks.endpoints import bookmark_ns
 from .token.endpoints import token_ns
+from .monitoring.endpoints import monitoring_ns
 
 # Define the API blueprint
 api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
@@ -35,6 +38,16 @@ api = Api(
 )
 
 
+# Answer with 503 and Retry-After while the password hashing pool is saturated
+@api.errorhandler(PasswordHashingBusy)
+def handle_password_hashing_busy(error):
+    return (
+        {"message": "Server busy, please retry shortly"},
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        {"Retry-After": str(error.retry_after)},
+    )
+
+
 # Define the root route for the API
 @api_bp.route("/")
 def index():
@@ -68,3 +81,4 @@ api.add_namespace(language_ns, path="/languages")
 api.add_namespace(publisher_ns, path="/publishers")
 api.add_namespace(bookmark_ns, path="/bookmarks")
 api.add_namespace(token_ns, path="/clear_tokens")
+api.add_namespace(monitoring_ns, path="/monitoring")
@@ -1,9 +1,14 @@
 from http import HTTPStatus
 from flask_restx import abort, marshal
 from app import db
-from flask import jsonify, url_for
+from flask import url_for
 from app.models import Agent, AgentType, Book
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from app.utils.pagination import (
+    _paginate,
+    _paginate_ranked_ids,
+    _paginated_response,
+)
+from app.services.inverted_index import search_catalog
 from app.api.v1.agents.dto import agent_pagination_model, agent_model
 
 
@@ -69,6 +74,11 @@ def process_delete_agent(agent_id):
 
 # Process retrieval of agents with pagination and filtering
 def process_get_agents(page=1, per_page=10, type=None, q=None):
+    # Name searches across all types can be answered from the in-memory index
+    ranked_ids = search_catalog("agents", q) if type in (None, "all") else None
+    if ranked_ids is not None:
+        pagination = _paginate_ranked_ids(ranked_ids, Agent, page, per_page)
+        return _paginated_response(pagination, agent_pagination_model, "agents", q=q)
 
     filter_conditions = []
     if q:
@@ -77,59 +87,24 @@ def process_get_agents(page=1, per_page=10, type=None, q=None):
         agent_type = AgentType[type.upper()]
         filter_conditions.append(Agent.type == agent_type)
 
-    if filter_conditions:
-        agents = Agent.query.filter(*filter_conditions).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-    else:
-        agents = Agent.query.paginate(page=page, per_page=per_page)
-
-    pagination = dict(
-        page=agents.page,
-        items_per_page=agents.per_page,
-        total_pages=agents.pages,
-        total_items=agents.total,
-        items=agents.items,
-        has_next=agents.has_next,
-        has_prev=agents.has_prev,
-        next_num=agents.next_num,
-        prev_num=agents.prev_num,
-        links=[],
+    agents = Agent.query.filter(*filter_conditions)
+
+    pagination = _paginate(
+        agents, page, per_page, "agents", error_out=not filter_conditions
+    )
+    return _paginated_response(
+        pagination, agent_pagination_model, "agents", type=type, q=q
     )
-    response_data = marshal(pagination, agent_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "agents")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "agents")
-    response.headers["Total-Count"] = agents.pages
-    return response
 
 
 # Process retrieval of popular agents with pagination
 def process_get_popular_agents(page=1, per_page=10):
     agents = Agent.query.filter(
         Agent.type == AgentType.AUTHOR, Agent.books.any(Book.downloads > 20)
-    ).paginate(page=page, per_page=per_page, error_out=False)
-
-    pagination = dict(
-        page=agents.page,
-        items_per_page=agents.per_page,
-        total_pages=agents.pages,
-        total_items=agents.total,
-        items=agents.items,
-        has_next=agents.has_next,
-        has_prev=agents.has_prev,
-        next_num=agents.next_num,
-        prev_num=agents.prev_num,
-        links=[],
     )
-    response_data = marshal(pagination, agent_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "popular_agents")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(
-        pagination, "popular_agents"
-    )
-    response.headers["Total-Count"] = agents.pages
-    return response
+
+    pagination = _paginate(agents, page, per_page, "popular_agents", error_out=False)
+    return _paginated_response(pagination, agent_pagination_model, "popular_agents")
 
 
 # Process adding a book to an agent
@@ -2,11 +2,12 @@ from http import HTTPStatus
 import os
 from flask import jsonify, current_app, url_for
 import jwt
-from app import db, mail, auth_manager
+from app import db, auth_manager
 from flask_restx import abort
 from app.models import User, Profile, UserGender, BlacklistedToken
 from flask_pyjwt import current_token
-from flask_mail import Message
+from app.utils.datetime_util import utc_now
+from app.services.mail_outbox import enqueue_email
 
 
 # function to register new user
@@ -50,6 +51,9 @@ def process_login_request(email, password):
 
     user: User = User.find_by_email(email)
     if user and user.check_password(password):
+        # Recently active users get their recommendations precomputed
+        user.last_logged_in = utc_now()
+        db.session.commit()
         auth = user.encode_auth_token()
         response = jsonify(
             status="success",
@@ -165,35 +169,27 @@ def _get_token_expire_time():
     return expires_in_seconds
 
 
-# function to send forgot password email
+# function to queue the forgot password email
 def process_send_forgot_password_email(email, public_id):
-    try:
-
-        token = _generate_confirmation_token(email, public_id)
-        base_url = current_app.config["PICO_LIB_APP"]
-        update_password_url = f"{base_url}change-password?token={token}&email={email}"
-        msg = Message("Forgot Password", recipients=[email])
-        msg.body = f"Hello!\n\nWe received a request to reset your password. If this was you, please click on the following link to reset your password:\n\n{update_password_url}\n\nIf you didn't request a password reset, you can safely ignore this email.\n\nBest regards,\nThe Pico-Library Team"
-        msg.sender = current_app.config["MAIL_USERNAME"]
-        mail.send(msg)
-    except Exception as e:
-        print(e)
-        abort(HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to send email")
+    token = _generate_confirmation_token(email, public_id)
+    base_url = current_app.config["PICO_LIB_APP"]
+    update_password_url = f"{base_url}change-password?token={token}&email={email}"
+    body = f"Hello!\n\nWe received a request to reset your password. If this was you, please click on the following link to reset your password:\n\n{update_password_url}\n\nIf you didn't request a password reset, you can safely ignore this email.\n\nBest regards,\nThe Pico-Library Team"
+    # Sent by the mail outbox workers once committed
+    enqueue_email("Forgot Password", [email], body=body)
+    db.session.commit()
+    return {"status": "success", "message": "Email queued"}, HTTPStatus.ACCEPTED
 
 
-# function to send confirmation email
+# function to queue the confirmation email
 def process_send_confirmation_email(email, public_id):
-    try:
-        token = _generate_confirmation_token(email, public_id)
-        base_url = current_app.config["PICO_LIB_APP"]
-        confirm_email_url = f"{base_url}confirm-email?token={token}&email={email}"
-        msg = Message("Confirm Your Email Address", recipients=[email])
-        msg.body = f"Hello!\n\nThank you for registering with us. Please click on the following link to confirm your email address:\n\n{confirm_email_url}\n\nIf you didn't sign up for an account, you can safely ignore this email.\n\nBest regards,\nThe Pico-Library Team"
-        msg.sender = current_app.config["MAIL_USERNAME"]
-        mail.send(msg)
-    except Exception as e:
-        print(e)
-        abort(HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to send email")
+    token = _generate_confirmation_token(email, public_id)
+    base_url = current_app.config["PICO_LIB_APP"]
+    confirm_email_url = f"{base_url}confirm-email?token={token}&email={email}"
+    body = f"Hello!\n\nThank you for registering with us. Please click on the following link to confirm your email address:\n\n{confirm_email_url}\n\nIf you didn't sign up for an account, you can safely ignore this email.\n\nBest regards,\nThe Pico-Library Team"
+    enqueue_email("Confirm Your Email Address", [email], body=body)
+    db.session.commit()
+    return {"status": "success", "message": "Email queued"}, HTTPStatus.ACCEPTED
 
 
 # function to generate confirmation token
@@ -11,6 +11,7 @@ from app.api.v1.auth.business import (
 )
 from flask_pyjwt import require_token, current_token
 from http import HTTPStatus
+from app.services.read_replicas import use_primary
 from app.api.v1.auth.dto import (
     auth_register_reqparser,
     auth_login_reqparser,
@@ -28,6 +29,7 @@ auth_ns = Namespace(name="auth", validate=True)
 class AuthUser(Resource):
     # Endpoint for logging in a user
     @require_token()
+    @use_primary
     @auth_ns.response(HTTPStatus.OK, "User logged in successfully")
     @auth_ns.response(HTTPStatus.BAD_REQUEST, "Bad request")
     @auth_ns.response(HTTPStatus.CONFLICT, "User already exists")
@@ -129,9 +131,8 @@ class LogoutUser(Resource):
 class ForgotPassword(Resource):
     # Endpoint for sending a forgot password email
     @auth_ns.expect(auth_send_forgot_password_reqparser)
-    @auth_ns.response(HTTPStatus.OK, "Email sent successfully")
+    @auth_ns.response(HTTPStatus.ACCEPTED, "Email queued")
     @auth_ns.response(HTTPStatus.BAD_REQUEST, "Bad request")
-    @auth_ns.response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
     @auth_ns.doc(description="Send a forgot password email")
     def post(self):
         request_data = auth_send_forgot_password_reqparser.parse_args()
@@ -221,22 +222,17 @@ class ConfirmEmail(Resource):
 class SendConfirmationEmail(Resource):
     # Endpoint for sending a confirmation email
     @require_token()
-    @auth_ns.response(HTTPStatus.OK, "Email sent successfully")
-    @auth_ns.response(HTTPStatus.BAD_REQUEST, "Bad request")
-    @auth_ns.response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
+    @auth_ns.response(HTTPStatus.ACCEPTED, "Email queued")
     @auth_ns.response(HTTPStatus.UNAUTHORIZED, "Unauthorized")
     @auth_ns.response(HTTPStatus.NOT_FOUND, "Not found")
     @auth_ns.doc(security="Bearer")
     def post(self):
         from app.models import User
 
-        from flask import jsonify
-
         public_id = current_token.sub["public_id"]
 
         user = User.find_by_public_id(public_id)
         if user is None:
             abort(404, "User not found")
         else:
-            process_send_confirmation_email(user.email, user.public_id)
-            return jsonify({"message": "Email sent successfully"})
+            return process_send_confirmation_email(user.email, user.public_id)
@@ -1,8 +1,10 @@
-from app.models import Book, Bookmark, BookmarkStatus, User
+from app.models import Book, Bookmark, BookmarkStatus
+from app.services.identity_cache import find_identity
+from app.services.popularity_events import record_popularity_event
 from flask_restx import abort, marshal
 from http import HTTPStatus
-from flask import jsonify, url_for
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from flask import url_for
+from app.utils.pagination import _paginate, _paginated_response
 from .dto import (
     bookmark_model,
     bookmarks_pagination_model,
@@ -20,7 +22,7 @@ def process_create_bookmark(book_id, status):
     if not book:
         abort(HTTPStatus.NOT_FOUND, message=f"Book not found")
 
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, message=f"User not found")
 
@@ -34,7 +36,9 @@ def process_create_bookmark(book_id, status):
 
     bookmark = Bookmark(book_id=book_id, user_id=user.id, status=status)
     db.session.add(bookmark)
+    Book.adjust_aggregates(book.id, bookmark_count=1)
     db.session.commit()
+    record_popularity_event(book.id, "bookmark")
     bookmark_data = marshal(bookmark, bookmark_model)
     response = {
         "status": "success",
@@ -49,7 +53,7 @@ def process_create_bookmark(book_id, status):
 
 def process_delete_bookmark(book_id):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, message=f"User not found")
 
@@ -62,6 +66,7 @@ def process_delete_bookmark(book_id):
     ).first()
     if bookmark:
         db.session.delete(bookmark)
+        Book.adjust_aggregates(book.id, bookmark_count=-1)
         db.session.commit()
         return {"status": "success", "message": "Bookmark deleted successfully"}
     else:
@@ -70,7 +75,7 @@ def process_delete_bookmark(book_id):
 
 def process_update_bookmark(bookmark_id, status):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, message=f"User not found")
 
@@ -98,7 +103,7 @@ def process_update_bookmark(bookmark_id, status):
 
 def process_get_bookmark(bookmark_id):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, message=f"User not found")
 
@@ -113,7 +118,7 @@ def process_get_bookmark(bookmark_id):
 
 def process_get_user_book_bookmark(book_id):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, message=f"User not found")
 
@@ -127,65 +132,28 @@ def process_get_user_book_bookmark(book_id):
 
 
 def process_get_bookmarks(book_id, page=1, per_page=10):
-    bookmarks = Bookmark.query.filter(Bookmark.book_id == book_id).paginate(
-        page=page,
-        per_page=per_page,
-    )
+    bookmarks = Bookmark.query.filter(Bookmark.book_id == book_id)
 
-    pagination = dict(
-        page=bookmarks.page,
-        items_per_page=bookmarks.per_page,
-        total_pages=bookmarks.pages,
-        total_items=bookmarks.total,
-        items=bookmarks.items,
-        has_next=bookmarks.has_next,
-        has_prev=bookmarks.has_prev,
-        next_num=bookmarks.next_num,
-        prev_num=bookmarks.prev_num,
-        links=[],
+    pagination = _paginate(bookmarks, page, per_page, "bookmarks")
+    return _paginated_response(
+        pagination, bookmarks_pagination_model, "bookmarks", book_id=book_id
     )
-    response_data = marshal(pagination, bookmarks_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "bookmarks")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "bookmarks")
-    response.headers["Total-Count"] = bookmarks.pages
-    return response
 
 
 def process_get_bookmark_books(page=1, per_page=10, status=None):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, message=f"User not found")
 
+    # Start from the user's bookmarks; both conditions hold for the same one
+    bookmarked = db.select(Bookmark.book_id).where(Bookmark.user_id == user.id)
     if status:
         status = BookmarkStatus[status.upper()]
-        books = Book.query.filter(
-            Book.bookmarks.any(Bookmark.user_id == user.id),
-            Book.bookmarks.any(Bookmark.status == status),
-        ).paginate(page=page, per_page=per_page)
-    else:
-        books = Book.query.filter(
-            Book.bookmarks.any(Bookmark.user_id == user.id),
-        ).paginate(page=page, per_page=per_page)
-
-    pagination = dict(
-        page=page,
-        items_per_page=per_page,
-        total_pages=books.pages,
-        total_items=books.total,
-        items=books.items,
-        has_next=books.has_next,
-        has_prev=books.has_prev,
-        next_num=books.next_num,
-        prev_num=books.prev_num,
-        links=[],
-    )
-    response_data = marshal(pagination, bookmark_books_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "bookmark_books")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(
-        pagination, "bookmark_books"
+        bookmarked = bookmarked.where(Bookmark.status == status)
+    books = Book.query.filter(Book.id.in_(bookmarked)).order_by(Book.id)
+
+    pagination = _paginate(books, page, per_page, "bookmark_books")
+    return _paginated_response(
+        pagination, bookmark_books_pagination_model, "bookmark_books"
     )
-    response.headers["Total-Count"] = books.total
-    return response
@@ -5,7 +5,8 @@ from flask_restx.inputs import positive
 from app.api.v1.user.dto import user_model
 from datetime import datetime
 from flask_pyjwt import current_token
-from app.models import User, Bookmark
+from app.models import Bookmark
+from app.services.identity_cache import find_identity
 
 
 def check_string_iso_format(date_string):
@@ -18,7 +19,7 @@ def check_string_iso_format(date_string):
 
 def get_bookmark(book):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     bookmark = Bookmark.query.filter(
         Bookmark.book_id == book.id, Bookmark.user_id == user.id
     ).first()
@@ -1,8 +1,13 @@
 from flask_pyjwt import current_token
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from flask_pyjwt.typing import TokenType
+from app.utils.pagination import (
+    _keyset_pagination,
+    _paginate,
+    _paginate_ranked_ids,
+    _paginated_response,
+)
 from app.models import (
     Book,
-    User,
     Agent,
     Subject,
     Bookshelf,
@@ -12,11 +17,21 @@ from app.models import (
 )
 from flask_restx import abort, marshal
 from http import HTTPStatus
-from app.services.recommendation_engine import generate_recommendations
-from flask import jsonify, url_for, request
+from app.services.recommendation_cache import cached_recommendation_ids
+from app.services.also_read import also_read_ids
+from app.services.similar_books import similar_book_ids
+from app.services.full_text_search import search_books
+from app.services.identity_cache import find_identity
+from app.services.popularity_events import record_popularity_event
+from app.services.inverted_index import search_catalog
+from flask import url_for, request
 from app.api.v1.books.dto import book_pagination_model, book_model
 from app import db
-from app.utils.functions import add_resources
+from app.utils.functions import add_resources, linked_book_ids
+from app.models.agents import book_agents_association
+from app.models.bookshelves import book_bookshelves_association
+from app.models.languages import book_languages_association
+from app.models.subjects import book_subjects_association
 from app import auth_manager
 
 
@@ -69,22 +84,20 @@ def process_create_book(data):
     agents = get_agents(data["agents"]) if "agents" in data else []
     bookshelves = get_bookshelves(data["bookshelves"]) if "bookshelves" in data else []
     languages = get_languages(data["languages"]) if "languages" in data else []
-    resources = add_resources(data["resources"]) if "resources" in data else []
+    resources = data.pop("resources", None) or []
     subjects = get_subjects(data["subjects"]) if "subjects" in data else []
     publishers = get_publishers(data["publishers"]) if "publishers" in data else []
     data["agents"] = agents
     data["bookshelves"] = bookshelves
     data["languages"] = languages
-    data["resources"] = resources
     data["subjects"] = subjects
     data["publishers"] = publishers
-
-    for key, value in data.items():
-        if value is None:
-            del data[key]
+    data = {key: value for key, value in data.items() if value is not None}
 
     book = Book(**data)
     db.session.add(book)
+    # Attach resources through add_resources so the cover image is resolved
+    add_resources(resources, book=book)
     db.session.commit()
     book_data = marshal(book, book_model)
     response = {
@@ -124,6 +137,21 @@ def process_update_book(book_id, data):
     }
 
 
+# Map of `sort` options to the Book attribute they order by
+BOOK_SORT_ATTRIBUTES = {
+    "popularity": "popularity_score",
+    "trending": "trending_score",
+    "downloads": "downloads",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "title": "title",
+    "rating": "average_rating",
+    "reviews": "review_count",
+    "comments": "comment_count",
+    "bookmarks": "bookmark_count",
+}
+
+
 def process_get_books(
     page,
     per_page,
@@ -134,71 +162,117 @@ def process_get_books(
     q=None,
     order=None,
     sort=None,
+    cursor=None,
+    criteria=None,
 ):
+    # Plain title searches can be answered from the in-memory index
+    has_filters = (lan and lan != "all") or subject or agent or bookshelf
+    if criteria in (None, "title") and not (has_filters or sort or cursor is not None):
+        ranked_ids = search_catalog("books", q)
+        if ranked_ids is not None:
+            pagination = _paginate_ranked_ids(ranked_ids, Book, page, per_page)
+            return _paginated_response(
+                pagination, book_pagination_model, "books", lan=lan, q=q
+            )
+
     filter_conditions = []
     if lan and lan != "all":
-        filter_conditions.append(Book.languages.any(Language.code == lan))
-    if q:
-        filter_conditions.append(Book.title.ilike(f"%{q}%"))
+        language_id = (
+            db.select(Language.id).where(Language.code == lan).scalar_subquery()
+        )
+        filter_conditions.append(
+            Book.id.in_(
+                linked_book_ids(book_languages_association, "language_id", language_id)
+            )
+        )
     if subject:
-        filter_conditions.append(Book.subjects.any(Subject.id == subject))
+        filter_conditions.append(
+            Book.id.in_(
+                linked_book_ids(book_subjects_association, "subject_id", subject)
+            )
+        )
     if agent:
-        filter_conditions.append(Book.agents.any(Agent.id == agent))
+        filter_conditions.append(
+            Book.id.in_(linked_book_ids(book_agents_association, "agent_id", agent))
+        )
     if bookshelf:
-        filter_conditions.append(Book.bookshelves.any(Bookshelf.id == bookshelf))
+        filter_conditions.append(
+            Book.id.in_(
+                linked_book_ids(book_bookshelves_association, "bookshelf_id", bookshelf)
+            )
+        )
     if filter_conditions:
         books = Book.query.filter(*filter_conditions)
     else:
         books = Book.query
 
-    if sort == "popularity":
-        if order == "desc":
-            books = books.order_by(Book.popularity_score.desc())
-        else:
-            books = books.order_by(Book.popularity_score.asc())
-    elif sort == "downloads":
-        if order == "desc":
-            books = books.order_by(Book.downloads.desc())
-        else:
-            books = books.order_by(Book.downloads.asc())
-    elif sort == "created_at":
-        if order == "desc":
-            books = books.order_by(Book.created_at.desc())
-        else:
-            books = books.order_by(Book.created_at.asc())
-    elif sort == "updated_at":
-        if order == "desc":
-            books = books.order_by(Book.updated_at.desc())
-        else:
-            books = books.order_by(Book.updated_at.asc())
-    elif sort == "title":
+    sort_attr = BOOK_SORT_ATTRIBUTES.get(sort)
+
+    # Rank by relevance unless an explicit sort was requested
+    if q:
+        books = search_books(books, q, criteria, rank=not sort_attr)
+
+    if cursor is not None:
+        return _process_get_books_by_cursor(
+            books,
+            per_page,
+            cursor,
+            sort_attr,
+            order,
+            lan=lan,
+            subject=subject,
+            agent=agent,
+            bookshelf=bookshelf,
+            q=q,
+            criteria=criteria,
+            sort=sort,
+        )
+
+    if sort_attr:
+        sort_column = getattr(Book, sort_attr)
         if order == "desc":
-            books = books.order_by(Book.title.desc())
+            sort_order = sort_column.desc()
         else:
-            books = books.order_by(Book.title.asc())
-
-    books = books.paginate(page=page, per_page=per_page)
-
-    pagination = dict(
-        page=books.page,
-        items_per_page=books.per_page,
-        total_pages=books.pages,
-        total_items=books.total,
-        items=books.items,
-        has_next=books.has_next,
-        has_prev=books.has_prev,
-        next_num=books.next_num,
-        prev_num=books.prev_num,
-        links=[],
+            sort_order = sort_column.asc()
+        # Books without a value come last, as in cursor mode
+        if getattr(sort_column, "nullable", False):
+            sort_order = sort_order.nulls_last()
+        books = books.order_by(sort_order)
+    elif not q:
+        # A stable order keeps offset pages from overlapping
+        books = books.order_by(Book.id)
+
+    pagination = _paginate(books, page, per_page, "books")
+    return _paginated_response(
+        pagination,
+        book_pagination_model,
+        "books",
+        lan=lan,
+        subject=subject,
+        agent=agent,
+        bookshelf=bookshelf,
+        q=q,
+        criteria=criteria,
+        order=order,
+        sort=sort,
     )
-    response_data = marshal(pagination, book_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "books", lan=lan)
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(
-        pagination, "books", lan=lan
+
+
+def _process_get_books_by_cursor(books, per_page, cursor, sort_attr, order, **kwargs):
+    # The cursor is only valid for the sort it was issued under
+    scope = f"{kwargs['sort'] or 'id'}:{order or 'asc'}"
+    pagination = _keyset_pagination(
+        books,
+        Book,
+        per_page,
+        cursor=cursor,
+        sort_attr=sort_attr,
+        descending=order == "desc",
+        scope=scope,
+    )
+    return _paginated_response(
+        pagination, book_pagination_model, "books", order=order, **kwargs
     )
-    response.headers["Total-Count"] = books.pages
-    return response
 
 
 def process_get_book(book_id):
@@ -215,17 +289,20 @@ def process_get_book(book_id):
                 "status": None,
             },
         }
-        current_token = (
-            request.headers["Authorization"].replace("Bearer ", "")
-            if "Authorization" in request.headers
+        # Optional authentication: only a verified auth token identifies the user
+        auth_header = request.headers.get("Authorization", "")
+        token = (
+            auth_manager.verified_token(auth_header[7:])
+            if auth_header[:7].lower() == "bearer "
             else None
         )
-        current_token = (
-            auth_manager.convert_token(current_token) if current_token else None
+        public_id = (
+            token.sub["public_id"]
+            if token and token.token_type == TokenType.AUTH
+            else None
         )
-        public_id = current_token.sub["public_id"] if current_token else None
         if public_id:
-            user: User = User.find_by_public_id(public_id)
+            user = find_identity(public_id)
             if user:
                 user_id = user.id
                 book_bookmark = Bookmark.query.filter(
@@ -242,33 +319,15 @@ def process_get_book(book_id):
 
 def process_get_recommedations(page, per_page, lan):
     public_id = current_token.sub["public_id"]
-    user: User = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if user:
-        recommendations, has_next, has_prev, total_pages = generate_recommendations(
-            user, page, per_page, lan
-        )
-        pagination = dict(
-            page=page,
-            items_per_page=per_page,
-            total_pages=total_pages,
-            total_items=len(recommendations),
-            items=recommendations,
-            has_next=has_next,
-            has_prev=has_prev,
-            next_num=page + 1 if has_next else None,
-            prev_num=page - 1 if has_prev else None,
-            links=[],
-        )
-        response_data = marshal(pagination, book_pagination_model)
-        response_data["links"] = _pagination_nav_links(
-            pagination, "book_recommendations"
+        ranked_ids = cached_recommendation_ids(user.id, lan)
+        pagination = _paginate_ranked_ids(
+            ranked_ids, Book, page, per_page, error_out=False
         )
-        response = jsonify(response_data)
-        response.headers["Link"] = _pagination_nav_header_links(
-            pagination, "book_recommendations"
+        return _paginated_response(
+            pagination, book_pagination_model, "book_recommendations", lan=lan
         )
-        response.headers["Total-Count"] = total_pages
-        return response_data
     else:
         abort(HTTPStatus.NOT_FOUND, "User not found")
 
@@ -277,34 +336,51 @@ def process_get_popular_books(page=1, per_page=10, lan="en"):
     filter_conditions = []
 
     if lan and lan != "all":
-        filter_conditions.append(Book.languages.any(Language.code == lan))
-
-    if filter_conditions:
-        books = (
-            Book.query.filter(*filter_conditions)
-            .order_by(Book.popularity_score.desc())
-            .paginate(page=page, per_page=per_page, error_out=False)
+        language_id = (
+            db.select(Language.id).where(Language.code == lan).scalar_subquery()
         )
-    else:
-        books = Book.query.order_by(Book.popularity_score.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        filter_conditions.append(
+            Book.id.in_(
+                linked_book_ids(book_languages_association, "language_id", language_id)
+            )
         )
 
-    pagination = dict(
-        page=books.page,
-        items_per_page=books.per_page,
-        total_pages=books.pages,
-        total_items=books.total,
-        items=books.items,
-        has_next=books.has_next,
-        has_prev=books.has_prev,
-        next_num=books.next_num,
-        prev_num=books.prev_num,
-        links=[],
+    # Recent engagement first, the batch popularity score breaks ties
+    books = Book.query.filter(*filter_conditions).order_by(
+        Book.trending_score.desc().nulls_last(), Book.popularity_score.desc(), Book.id
+    )
+
+    pagination = _paginate(books, page, per_page, "popular_books", error_out=False)
+    return _paginated_response(pagination, book_pagination_model, "popular_books")
+
+
+def process_record_download(book_id):
+    if db.session.scalar(db.select(Book.id).where(Book.id == book_id)) is None:
+        abort(HTTPStatus.NOT_FOUND, "Book not found")
+
+    # Counted in memory and written with the next popularity flush
+    record_popularity_event(book_id, "download")
+    return {"status": "success", "message": "Download recorded"}, HTTPStatus.ACCEPTED
+
+
+def process_get_also_read(book_id, page=1, per_page=10):
+    if db.session.scalar(db.select(Book.id).where(Book.id == book_id)) is None:
+        abort(HTTPStatus.NOT_FOUND, "Book not found")
+
+    # Precomputed neighbours, no join over bookmarks at request time
+    ranked_ids = also_read_ids(book_id)
+    pagination = _paginate_ranked_ids(ranked_ids, Book, page, per_page, error_out=False)
+    return _paginated_response(
+        pagination, book_pagination_model, "book_also_read", book_id=book_id
+    )
+
+
+def process_get_similar_books(book_id, page=1, per_page=10):
+    if db.session.scalar(db.select(Book.id).where(Book.id == book_id)) is None:
+        abort(HTTPStatus.NOT_FOUND, "Book not found")
+
+    ranked_ids = similar_book_ids(book_id)
+    pagination = _paginate_ranked_ids(ranked_ids, Book, page, per_page, error_out=False)
+    return _paginated_response(
+        pagination, book_pagination_model, "similar_books", book_id=book_id
     )
-    response_data = marshal(pagination, book_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "popular_books")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "popular_books")
-    response.headers["Total-Count"] = books.total
-    return response
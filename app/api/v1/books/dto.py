@@ -1,5 +1,5 @@
 from flask_restx import Model
-from flask_restx.fields import String, Integer, Boolean, Nested, List, Raw
+from flask_restx.fields import String, Integer, Boolean, Float, Nested, List, Raw
 from flask_restx.reqparse import RequestParser
 from flask_restx.inputs import positive
 from app.api.v1.agents.dto import short_agent_model
@@ -19,6 +19,11 @@ book_model_short = Model(
         "license": String,
         "downloads": Integer,
         "image": String,
+        "average_rating": Float,
+        "rating_count": Integer,
+        "review_count": Integer,
+        "comment_count": Integer,
+        "bookmark_count": Integer,
         "created_at": String(attribute="created_at_str"),
         "updated_at": String(attribute="updated_at_str"),
     },
@@ -33,6 +38,11 @@ book_model = Model(
         "license": String,
         "downloads": Integer,
         "image": String,
+        "average_rating": Float,
+        "rating_count": Integer,
+        "review_count": Integer,
+        "comment_count": Integer,
+        "bookmark_count": Integer,
         "publishers": List(Nested(publisher_model)),
         "subjects": List(Nested(subject_model)),
         "languages": List(Nested(langauge_model)),
@@ -50,9 +60,10 @@ pagination_reqparse.add_argument("q", type=str, required=False, help="Search que
 pagination_reqparse.add_argument(
     "criteria",
     type=str,
-    choices=["title", "author", "subject", "shelf"],
+    choices=["title", "author", "subject", "shelf", "all"],
     default="title",
     required=False,
+    help="Part of the book the search query is matched against",
 )
 pagination_reqparse.add_argument("page", type=positive, default=1, required=False)
 pagination_reqparse.add_argument("per_page", type=positive, default=10, required=False)
@@ -77,7 +88,25 @@ pagination_reqparse.add_argument(
     type=str,
     required=False,
     default=None,
-    choices=["title", "created_at", "updated_at", "downloads", "popularity"],
+    choices=[
+        "title",
+        "created_at",
+        "updated_at",
+        "downloads",
+        "popularity",
+        "trending",
+        "rating",
+        "reviews",
+        "comments",
+        "bookmarks",
+    ],
+)
+pagination_reqparse.add_argument(
+    "cursor",
+    type=str,
+    required=False,
+    default=None,
+    help="Opaque keyset cursor; pass an empty value for the first page",
 )
 
 pagination_links_model = Model(
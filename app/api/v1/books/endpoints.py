@@ -9,6 +9,9 @@ from app.api.v1.books.business import (
     process_get_books,
     process_update_book,
     process_get_popular_books,
+    process_record_download,
+    process_get_also_read,
+    process_get_similar_books,
 )
 from http import HTTPStatus
 from app.api.v1.books.dto import (
@@ -60,6 +63,8 @@ class BooksResource(Resource):
         q = args.get("q")
         order = args.get("order")
         sort = args.get("sort")
+        cursor = args.get("cursor")
+        criteria = args.get("criteria")
         return process_get_books(
             page=page,
             per_page=per_page,
@@ -70,6 +75,8 @@ class BooksResource(Resource):
             q=q,
             order=order,
             sort=sort,
+            cursor=cursor,
+            criteria=criteria,
         )
 
 
@@ -107,6 +114,47 @@ class BookResource(Resource):
         return process_update_book(book_id, data)
 
 
+@books_ns.route("/<int:book_id>/downloads", endpoint="book_downloads")
+class BookDownloads(Resource):
+    @books_ns.response(int(HTTPStatus.ACCEPTED), "Download recorded.")
+    @books_ns.response(int(HTTPStatus.NOT_FOUND), "Book not found.")
+    def post(self, book_id):
+        """
+        Record a download of a book.
+        """
+        return process_record_download(book_id)
+
+
+@books_ns.route("/<int:book_id>/also-read", endpoint="book_also_read")
+class BookAlsoRead(Resource):
+    @books_ns.expect(pagination_reqparse)
+    @books_ns.response(int(HTTPStatus.OK), "Books often read with this one.")
+    @books_ns.response(int(HTTPStatus.NOT_FOUND), "Book not found.")
+    def get(self, book_id):
+        """
+        Get the books most often bookmarked together with a book.
+        """
+        args = pagination_reqparse.parse_args()
+        page = args.get("page")
+        per_page = args.get("per_page")
+        return process_get_also_read(book_id, page, per_page)
+
+
+@books_ns.route("/<int:book_id>/similar", endpoint="similar_books")
+class SimilarBooks(Resource):
+    @books_ns.expect(pagination_reqparse)
+    @books_ns.response(int(HTTPStatus.OK), "Books with similar content.")
+    @books_ns.response(int(HTTPStatus.NOT_FOUND), "Book not found.")
+    def get(self, book_id):
+        """
+        Get the books whose content is most similar to a book.
+        """
+        args = pagination_reqparse.parse_args()
+        page = args.get("page")
+        per_page = args.get("per_page")
+        return process_get_similar_books(book_id, page, per_page)
+
+
 @books_ns.route("/recommendations", endpoint="book_recommendations")
 class GetRecommendations(Resource):
     @require_token()
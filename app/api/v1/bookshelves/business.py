@@ -1,19 +1,25 @@
 from flask_restx import marshal
-from app.models import User, Bookshelf, Book
+from app.models import Bookshelf, Book
 from app import db
-from flask import jsonify, url_for
+from flask import url_for
 from flask_restx import abort
 from http import HTTPStatus
 from .dto import bookshelf_model, bookshelf_pagination_model
 from flask_pyjwt import current_token
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from app.utils.pagination import (
+    _paginate,
+    _paginate_ranked_ids,
+    _paginated_response,
+)
+from app.services.identity_cache import find_identity
+from app.services.inverted_index import search_catalog
 from sqlalchemy import desc
 
 
 def process_create_bookshelf(data):
     public_id = current_token.sub["public_id"]
 
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, "user not found")
 
@@ -44,7 +50,7 @@ def process_get_bookshelf(bookshelf_id):
 
 def process_update_bookshelf(bookshelf_id, data):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, "user not found")
     bookshelf = Bookshelf.query.filter(
@@ -66,7 +72,7 @@ def process_update_bookshelf(bookshelf_id, data):
 
 def process_delete_bookshelf(bookshelf_id):
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, "user not found")
 
@@ -86,46 +92,32 @@ def process_delete_bookshelf(bookshelf_id):
 
 
 def process_get_bookshelves(page=1, per_page=10, q=None):
+    # Name searches over public shelves can be answered from the in-memory index
+    ranked_ids = search_catalog("bookshelves", q)
+    if ranked_ids is not None:
+        pagination = _paginate_ranked_ids(ranked_ids, Bookshelf, page, per_page)
+        return _paginated_response(
+            pagination, bookshelf_pagination_model, "bookshelves", q=q
+        )
+
     filter_conditions = []
     if q:
         filter_conditions.append(Bookshelf.name.ilike(f"%{q}%"))
-    if filter_conditions:
-        bookshelves = (
-            Bookshelf.query.filter(Bookshelf.is_public == True, *filter_conditions)
-            .order_by(desc(Bookshelf.score))
-            .paginate(page=page, per_page=per_page)
-        )
-    else:
-        bookshelves = (
-            Bookshelf.query.filter(Bookshelf.is_public == True)
-            .order_by(desc(Bookshelf.score))
-            .paginate(page=page, per_page=per_page)
-        )
-    pagination = dict(
-        page=bookshelves.page,
-        items_per_page=bookshelves.per_page,
-        total_pages=bookshelves.pages,
-        total_items=bookshelves.total,
-        items=bookshelves.items,
-        has_next=bookshelves.has_next,
-        has_prev=bookshelves.has_prev,
-        next_num=bookshelves.next_num,
-        prev_num=bookshelves.prev_num,
-        links=[],
+    bookshelves = Bookshelf.query.filter(
+        Bookshelf.is_public == True, *filter_conditions
+    ).order_by(desc(Bookshelf.score))
+
+    pagination = _paginate(bookshelves, page, per_page, "bookshelves")
+    return _paginated_response(
+        pagination, bookshelf_pagination_model, "bookshelves", q=q or None
     )
-    response_data = marshal(pagination, bookshelf_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "bookshelves")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "bookshelves")
-    response.headers["Total-Count"] = bookshelves.pages
-    return response
 
 
 def process_get_bookshelves_by_user(user_id, page=1, per_page=10):
     public_id = current_token.sub["public_id"]
     get_public_only = True
     if public_id:
-        user = User.find_by_public_id(public_id)
+        user = find_identity(public_id)
         if user:
             if user_id == user.id:
                 get_public_only = False
@@ -133,30 +125,20 @@ def process_get_bookshelves_by_user(user_id, page=1, per_page=10):
     if get_public_only:
         bookshelves = Bookshelf.query.filter(
             Bookshelf.user_id == user_id,
-            Bookshelf.public == True,
-        ).paginate(page=page, per_page=per_page)
+            Bookshelf.is_public == True,
+        )
     else:
         bookshelves = Bookshelf.query.filter(
             Bookshelf.user_id == user_id,
-        ).paginate(page=page, per_page=per_page)
-    pagination = dict(
-        page=bookshelves.page,
-        items_per_page=bookshelves.per_page,
-        total_pages=bookshelves.pages,
-        total_items=bookshelves.total,
-        items=bookshelves.items,
-        has_next=bookshelves.has_next,
-        has_prev=bookshelves.has_prev,
-        next_num=bookshelves.next_num,
-        prev_num=bookshelves.prev_num,
-        links=[],
+        )
+
+    pagination = _paginate(bookshelves, page, per_page, "bookshelves_by_user")
+    return _paginated_response(
+        pagination,
+        bookshelf_pagination_model,
+        "bookshelves_by_user",
+        user_id=user_id,
     )
-    response_data = marshal(pagination, bookshelf_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "bookshelves")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "bookshelves")
-    response.headers["Total-Count"] = bookshelves.pages
-    return response
 
 
 def process_create_bookshelf_book_relationship(bookshelf_id, book_id):
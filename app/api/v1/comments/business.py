@@ -1,4 +1,3 @@
-from sqlalchemy import or_
 from flask_pyjwt import current_token
 from app.models import (
     User,
@@ -9,20 +8,33 @@ from app.models import (
     CommentVoteType,
     Rating,
 )
+from app.models.comments import VOTE_COUNTERS
+from app.services.identity_cache import find_identity
+from app.services.popularity_events import record_popularity_event
 from flask_restx import abort, marshal
 from http import HTTPStatus
-from app.utils.pagination import _pagination_nav_links, _pagination_nav_header_links
+from app.utils.pagination import (
+    _paginate,
+    _paginated_response,
+    decode_cursor,
+    encode_cursor,
+)
 from flask import jsonify, url_for
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import joinedload
 from app.api.v1.comments.dto import (
     comment_model,
     comment_pagination_model,
 )
 from app import db
 
+# Loader option fetching each comment's author and profile in the same query
+COMMENT_AUTHOR_LOADER = joinedload(Comment.user).joinedload(User.profile)
+
 
 def process_user_comment_post(content, book_id, parent_id, comment_type, rating):
     public_id = current_token.sub["public_id"]
-    user: User = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
 
     if not content:
         abort(HTTPStatus.BAD_REQUEST, "Comment content is required")
@@ -50,22 +62,23 @@ def process_user_comment_post(content, book_id, parent_id, comment_type, rating)
         book: Book = Book.get_by_id(book_id)
         if not book:
             abort(HTTPStatus.NOT_FOUND, "Book not found")
-    else:
-        if rating:
-            exrating = Rating.query.filter_by(user_id=user.id).first()
-            if exrating:
-                exrating.rating = rating
-                db.session.commit()
-            else:
-                new_rating = Rating(user_id=user.id, rating=rating, book_id=book_id)
-                db.session.add(new_rating)
-                db.session.commit()
 
     if parent_id:
         parent_comment: Comment = Comment.get_by_id(parent_id)
         if not parent_comment:
             abort(HTTPStatus.NOT_FOUND, "Parent comment not found")
 
+    # The rating, the comment and the book aggregates commit together
+    if book_id and rating:
+        exrating = Rating.query.filter_by(user_id=user.id, book_id=book_id).first()
+        if exrating:
+            Book.adjust_aggregates(book_id, rating_sum=rating - exrating.rating)
+            exrating.rating = rating
+        else:
+            new_rating = Rating(user_id=user.id, rating=rating, book_id=book_id)
+            db.session.add(new_rating)
+            Book.adjust_aggregates(book_id, rating_sum=rating, rating_count=1)
+
     comment = Comment(
         content=content,
         user_id=user.id,
@@ -76,7 +89,15 @@ def process_user_comment_post(content, book_id, parent_id, comment_type, rating)
     )
 
     db.session.add(comment)
+    if parent_id:
+        Comment.adjust_counters(parent_id, reply_count=1)
+    if comment_type == CommentType.REVIEW:
+        Book.adjust_aggregates(book_id, review_count=1)
+    else:
+        Book.adjust_aggregates(book_id, comment_count=1)
     db.session.commit()
+    if comment_type == CommentType.REVIEW:
+        record_popularity_event(book_id, "review")
 
     comment_data = marshal(comment, comment_model)
     response = {
@@ -106,7 +127,12 @@ def process_retrieve_user_comments(
     if comment_type == CommentType.REPLY and not parent_id:
         abort(HTTPStatus.BAD_REQUEST, "Parent comment ID is required for replies")
 
-    user_id = User.find_by_public_id(public_id).id if public_id else None
+    user_id = None
+    if public_id:
+        user = find_identity(public_id)
+        if not user:
+            abort(HTTPStatus.NOT_FOUND, "User not found")
+        user_id = user.id
 
     query_filter = {
         "parent_id": parent_id,
@@ -114,34 +140,26 @@ def process_retrieve_user_comments(
         "book_id": book_id,
         "type": comment_type,
     }
-    query = Comment.query.filter_by(
-        **{k: v for k, v in query_filter.items() if v}
-    ).order_by(Comment.created_at.desc())
-
-    comments_pagination = query.paginate(page=page, per_page=per_page)
-    pagination = dict(
-        page=comments_pagination.page,
-        items_per_page=comments_pagination.per_page,
-        total_pages=comments_pagination.pages,
-        total_items=comments_pagination.total,
-        items=comments_pagination.items,
-        has_next=comments_pagination.has_next,
-        has_prev=comments_pagination.has_prev,
-        next_num=comments_pagination.next_num,
-        prev_num=comments_pagination.prev_num,
-        links=[],
+    query = (
+        Comment.query.options(COMMENT_AUTHOR_LOADER)
+        .filter_by(**{k: v for k, v in query_filter.items() if v})
+        .order_by(Comment.created_at.desc())
     )
-    response_data = marshal(pagination, comment_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "comments")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "comments")
-    response.headers["Total-Count"] = comments_pagination.total
 
-    return response
+    pagination = _paginate(query, page, per_page, "comments")
+    return _paginated_response(
+        pagination,
+        comment_pagination_model,
+        "comments",
+        public_id=public_id,
+        book_id=book_id,
+        parent_id=parent_id,
+        type=comment_type.lower(),
+    )
 
 
 def process_retrieve_specific_comment(comment_id):
-    comment = Comment.get_by_id(comment_id)
+    comment = db.session.get(Comment, comment_id, options=[COMMENT_AUTHOR_LOADER])
     if not comment:
         abort(HTTPStatus.NOT_FOUND, "Comment not found")
     return comment
@@ -152,6 +170,12 @@ def process_delete_comment(comment_id):
     if not comment:
         abort(HTTPStatus.NOT_FOUND, "Comment not found")
     db.session.delete(comment)
+    if comment.parent_id:
+        Comment.adjust_counters(comment.parent_id, reply_count=-1)
+    if comment.type == CommentType.REVIEW:
+        Book.adjust_aggregates(comment.book_id, review_count=-1)
+    else:
+        Book.adjust_aggregates(comment.book_id, comment_count=-1)
     db.session.commit()
     return {
         "status": "success",
@@ -178,7 +202,7 @@ def process_vote_comment(comment_id, vote_type):
     if not comment:
         abort(HTTPStatus.NOT_FOUND, "Comment not found")
     public_id = current_token.sub["public_id"]
-    user = User.find_by_public_id(public_id)
+    user = find_identity(public_id)
     if not user:
         abort(HTTPStatus.NOT_FOUND, "User not found")
 
@@ -191,18 +215,135 @@ def process_vote_comment(comment_id, vote_type):
     comment_vote = CommentVote.query.filter(
         CommentVote.comment_id == comment_id, CommentVote.user_id == user.id
     ).first()
+    deltas = {}
     if comment_vote:
         if comment_vote.vote == vote_type:
             abort(HTTPStatus.BAD_REQUEST, "User already voted for this comment")
         else:
             db.session.delete(comment_vote)
-            db.session.commit()
+            if comment_vote.vote in VOTE_COUNTERS:
+                deltas[VOTE_COUNTERS[comment_vote.vote]] = -1
 
     comment_vote = CommentVote(comment_id=comment_id, user_id=user.id, vote=vote_type)
     db.session.add(comment_vote)
+    if vote_type in VOTE_COUNTERS:
+        deltas[VOTE_COUNTERS[vote_type]] = 1
+
+    # Swap the vote and both counters in one transaction
+    Comment.adjust_counters(comment_id, **deltas)
     db.session.commit()
+    if vote_type == CommentVoteType.UPVOTE:
+        record_popularity_event(comment.book_id, "upvote")
     return jsonify(
         status="success",
         item=marshal(comment, comment_model),
         message=f"Comment with ID {comment_id} was successfully {vote_type}.",
     )
+
+
+# Function to format a comment id as a fixed-width, sortable path segment
+def _thread_path_segment(id_column, dialect_name):
+    if dialect_name == "postgresql":
+        return func.lpad(func.cast(id_column, db.Text), 12, "0")
+    return func.printf("%012d", id_column)
+
+
+# Function to build the recursive CTE walking a reply tree in path order
+def _thread_cte(root_id, max_depth, after_id, dialect_name):
+    comments = Comment.__table__
+    anchor = select(
+        comments.c.id,
+        literal(0).label("depth"),
+        _thread_path_segment(comments.c.id, dialect_name).label("path"),
+    ).where(comments.c.id == root_id)
+    thread = anchor.cte("thread", recursive=True)
+
+    parent = thread.alias("parent")
+    children = select(
+        comments.c.id,
+        (parent.c.depth + 1).label("depth"),
+        (parent.c.path + "/" + _thread_path_segment(comments.c.id, dialect_name)).label(
+            "path"
+        ),
+    ).where(comments.c.parent_id == parent.c.id, parent.c.depth < max_depth)
+    if after_id:
+        # Resuming a truncated branch skips the replies already returned
+        children = children.where((parent.c.depth > 0) | (comments.c.id > after_id))
+    return thread.union_all(children)
+
+
+# Function to build the cursor expanding the replies of a node after a child
+def _thread_cursor(comment_id, after_id):
+    return encode_cursor({"s": "thread", "id": comment_id, "k": after_id})
+
+
+def process_retrieve_comment_thread(comment_id, depth=5, limit=200, cursor=None):
+    after_id = 0
+    if cursor:
+        position = decode_cursor(cursor)
+        if position.get("s") != "thread" or position["id"] != comment_id:
+            abort(HTTPStatus.BAD_REQUEST, "Cursor does not match this thread")
+        after_id = position.get("k") or 0
+
+    dialect_name = db.session.get_bind().dialect.name
+    thread = _thread_cte(comment_id, depth, after_id, dialect_name)
+
+    # One round trip for the whole slice; fetch one extra row to detect a cut
+    rows = (
+        db.session.query(Comment, thread.c.depth)
+        .join(thread, thread.c.id == Comment.id)
+        .options(COMMENT_AUTHOR_LOADER)
+        .order_by(thread.c.path)
+        .limit(limit + 1)
+        .all()
+    )
+    if not rows:
+        abort(HTTPStatus.NOT_FOUND, "Comment not found")
+    truncated = len(rows) > limit
+    first_omitted = rows[limit][0] if truncated else None
+    rows = rows[:limit]
+
+    # Rows arrive in path order, so every parent precedes its replies
+    nodes = {}
+    last_child_ids = {}
+    for comment, node_depth in rows:
+        node = marshal(comment, comment_model)
+        node["depth"] = node_depth
+        node["replies"] = []
+        node["next_cursor"] = None
+        node["expand"] = None
+        nodes[comment.id] = (comment, node)
+        if node_depth > 0:
+            nodes[comment.parent_id][1]["replies"].append(node)
+            last_child_ids[comment.parent_id] = comment.id
+
+    # The node limit cuts the branches leading to the first row left out
+    cut_ids = set()
+    parent_id = first_omitted.parent_id if first_omitted else None
+    while parent_id in nodes:
+        cut_ids.add(parent_id)
+        parent_id = nodes[parent_id][0].parent_id if parent_id != comment_id else None
+
+    # Branches cut by the depth or node limit get a cursor to load the rest
+    for node_id, (comment, node) in nodes.items():
+        # A resumed root has replies before the cursor that aren't in the list
+        if node_id == comment_id and after_id:
+            missing_replies = node_id in cut_ids
+        else:
+            missing_replies = len(node["replies"]) < comment.reply_count
+        if missing_replies and (node["depth"] == depth or node_id in cut_ids):
+            next_cursor = _thread_cursor(node_id, last_child_ids.get(node_id, 0))
+            node["next_cursor"] = next_cursor
+            node["expand"] = url_for(
+                "api.comment_thread",
+                comment_id=node_id,
+                cursor=next_cursor,
+                depth=depth,
+                limit=limit,
+            )
+
+    return jsonify(
+        status="success",
+        truncated=truncated,
+        item=nodes[comment_id][1],
+    )
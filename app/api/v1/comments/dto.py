@@ -1,7 +1,7 @@
 from flask_restx import Model
 from flask_restx.fields import String, Integer, Boolean, Float, Nested, List
 from flask_restx.reqparse import RequestParser
-from flask_restx.inputs import positive
+from flask_restx.inputs import int_range, positive
 from app.api.v1.user.dto import short_profile_model
 
 comment_model = Model(
@@ -76,3 +76,16 @@ vote_comment_req_parse = RequestParser(bundle_errors=True)
 vote_comment_req_parse.add_argument(
     "vote_type", type=str, choices=["upvote", "downvote"], default="upvote"
 )
+
+# Bounds of a single thread request; deeper or larger threads are expanded lazily
+THREAD_MAX_DEPTH = 20
+THREAD_MAX_NODES = 1000
+
+comment_thread_reqparse = RequestParser(bundle_errors=True)
+comment_thread_reqparse.add_argument(
+    "depth", type=int_range(1, THREAD_MAX_DEPTH), default=5, required=False
+)
+comment_thread_reqparse.add_argument(
+    "limit", type=int_range(1, THREAD_MAX_NODES), default=200, required=False
+)
+comment_thread_reqparse.add_argument("cursor", type=str, required=False)
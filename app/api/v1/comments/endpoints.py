@@ -8,6 +8,7 @@ from app.api.v1.comments.business import (
     process_update_comment,
     process_retrieve_specific_comment,
     process_vote_comment,
+    process_retrieve_comment_thread,
 )
 from http import HTTPStatus
 from app.api.v1.comments.dto import (
@@ -17,6 +18,7 @@ from app.api.v1.comments.dto import (
     comment_pagination_model,
     pagination_links_model,
     vote_comment_req_parse,
+    comment_thread_reqparse,
 )
 
 comments_ns = Namespace(name="comments", validate=True)
@@ -86,3 +88,19 @@ class CommentVote(Resource):
         args = vote_comment_req_parse.parse_args()
         vote_type = args.get("vote_type")
         return process_vote_comment(comment_id, vote_type)
+
+
+@comments_ns.route("/<int:comment_id>/thread", endpoint="comment_thread")
+class CommentThread(Resource):
+    @comments_ns.expect(comment_thread_reqparse)
+    @comments_ns.response(int(HTTPStatus.OK), "Reply tree of the comment.")
+    @comments_ns.response(int(HTTPStatus.NOT_FOUND), "Comment not found.")
+    def get(self, comment_id):
+        # Retrieve a comment with its nested replies
+        args = comment_thread_reqparse.parse_args()
+        return process_retrieve_comment_thread(
+            comment_id,
+            depth=args.get("depth"),
+            limit=args.get("limit"),
+            cursor=args.get("cursor"),
+        )
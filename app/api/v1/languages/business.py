@@ -1,11 +1,13 @@
 from app.models import Book, Language
 from flask_restx import abort, marshal
 from http import HTTPStatus
-from flask import jsonify, url_for
+from flask import url_for
 from app.api.v1.books.dto import book_pagination_model
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from app.utils.pagination import _paginate, _paginated_response
 from .dto import langauge_model, languages_pagination_model
 from app import db
+from app.models.languages import book_languages_association
+from app.utils.functions import linked_book_ids
 
 
 def process_create_language(code, name):
@@ -70,14 +72,10 @@ def process_get_language(language_id):
 
 
 def process_get_languages(page=1, per_page=10):
-    languages = Language.query.all()
+    languages = Language.query.order_by(Language.id)
 
-    pagination = dict(
-        items=languages,
-        links=[],
-    )
-    response_data = marshal(pagination, languages_pagination_model)
-    return response_data
+    pagination = _paginate(languages, page, per_page, "languages")
+    return _paginated_response(pagination, languages_pagination_model, "languages")
 
 
 def process_create_language_book(language_id, book_id):
@@ -117,32 +115,13 @@ def process_get_language_books(language_id, page=1, per_page=10):
     language = Language.query.filter(Language.id == language_id).first()
     if not language:
         abort(HTTPStatus.NOT_FOUND, "Language not found")
-    books = Book.query.filter(Book.languages.any(Language.id == language.id)).paginate(
-        page=page,
-        per_page=per_page,
-    )
-
-    pagination = dict(
-        page=books.page,
-        items_per_page=books.per_page,
-        total_pages=books.pages,
-        total_items=books.total,
-        items=books.items,
-        has_next=books.has_next,
-        has_prev=books.has_prev,
-        next_num=books.next_num,
-        prev_num=books.prev_num,
-        links=[],
-    )
-    response_data = marshal(pagination, book_pagination_model)
-    response_data["links"] = _pagination_nav_links(
-        pagination,
-        "language_books",
-        language_id=language_id,
-    )
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(
-        pagination, "language_books", language_id=language_id
+    books = Book.query.filter(
+        Book.id.in_(
+            linked_book_ids(book_languages_association, "language_id", language.id)
+        )
+    ).order_by(Book.id)
+
+    pagination = _paginate(books, page, per_page, "language_books")
+    return _paginated_response(
+        pagination, book_pagination_model, "language_books", language_id=language_id
     )
-    response.headers["Total-Count"] = books.pages
-    return response
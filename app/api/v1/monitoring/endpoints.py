@@ -0,0 +1,70 @@
+from http import HTTPStatus
+from flask_restx import Namespace, Resource
+from flask_pyjwt import require_token
+from app import db
+from app.services.db_pool import pool_status, reset_pool_telemetry
+from app.services.mail_outbox import outbox_status
+from app.services.read_replicas import replica_monitor
+
+monitoring_ns = Namespace(name="monitoring", validate=True)
+
+
+@monitoring_ns.route("/db-pool", endpoint="db_pool")
+class DatabasePool(Resource):
+
+    @require_token(scope={"is_admin": True})
+    @monitoring_ns.doc(security="Bearer")
+    @monitoring_ns.response(int(HTTPStatus.OK), "Connection pool state and telemetry.")
+    @monitoring_ns.response(
+        int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired."
+    )
+    def get(self):
+        """
+        Report connection pool usage: checkout waits, connections in use and overflow.
+        """
+        return {"status": "success", "pools": pool_status(db.engines)}
+
+    @require_token(scope={"is_admin": True})
+    @monitoring_ns.doc(security="Bearer")
+    @monitoring_ns.response(int(HTTPStatus.OK), "Connection pool telemetry reset.")
+    @monitoring_ns.response(
+        int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired."
+    )
+    def delete(self):
+        """
+        Reset the connection pool telemetry to start a new measurement window.
+        """
+        reset_pool_telemetry(db.engines)
+        return {"status": "success", "pools": pool_status(db.engines)}
+
+
+@monitoring_ns.route("/replicas", endpoint="read_replicas")
+class ReadReplicas(Resource):
+
+    @require_token(scope={"is_admin": True})
+    @monitoring_ns.doc(security="Bearer")
+    @monitoring_ns.response(int(HTTPStatus.OK), "Read replica health and lag.")
+    @monitoring_ns.response(
+        int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired."
+    )
+    def get(self):
+        """
+        Report the last health check and replication lag of each read replica.
+        """
+        return {"status": "success", "replicas": replica_monitor.status}
+
+
+@monitoring_ns.route("/mail-outbox", endpoint="mail_outbox")
+class MailOutbox(Resource):
+
+    @require_token(scope={"is_admin": True})
+    @monitoring_ns.doc(security="Bearer")
+    @monitoring_ns.response(int(HTTPStatus.OK), "Mail outbox backlog.")
+    @monitoring_ns.response(
+        int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired."
+    )
+    def get(self):
+        """
+        Report the outbox emails per status and when the oldest pending one was due.
+        """
+        return {"status": "success", "outbox": outbox_status()}
@@ -1,11 +1,13 @@
 from app.models import Book, Publisher
 from flask_restx import abort, marshal
 from http import HTTPStatus
-from flask import jsonify, url_for
+from flask import url_for
 from app.api.v1.books.dto import book_pagination_model
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from app.utils.pagination import _paginate, _paginated_response
 from .dto import publisher_model, publishers_pagination_model
 from app import db
+from app.models.publishers import book_publishers_association
+from app.utils.functions import linked_book_ids
 
 
 def process_create_publisher(name):
@@ -69,29 +71,10 @@ def process_get_publisher(publisher_id):
 
 
 def process_get_publishers(page=1, per_page=10):
-    publishers = Publisher.query.paginate(
-        page=page,
-        per_page=per_page,
-    )
+    publishers = Publisher.query.order_by(Publisher.id)
 
-    pagination = dict(
-        page=publishers.page,
-        items_per_page=publishers.per_page,
-        total_pages=publishers.pages,
-        total_items=publishers.total,
-        items=publishers.items,
-        has_next=publishers.has_next,
-        has_prev=publishers.has_prev,
-        next_num=publishers.next_num,
-        prev_num=publishers.prev_num,
-        links=[],
-    )
-    response_data = marshal(pagination, publishers_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "publishers")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "publishers")
-    response.headers["Total-Count"] = publishers.pages
-    return response
+    pagination = _paginate(publishers, page, per_page, "publishers")
+    return _paginated_response(pagination, publishers_pagination_model, "publishers")
 
 
 def process_create_publisher_book(publisher_id, book_id):
@@ -132,31 +115,12 @@ def process_get_publisher_books(publisher_id, page=1, per_page=10):
     if not publisher:
         abort(HTTPStatus.NOT_FOUND, "Publisher not found")
     books = Book.query.filter(
-        Book.publishers.any(Publisher.id == publisher.id)
-    ).paginate(
-        page=page,
-        per_page=per_page,
-    )
+        Book.id.in_(
+            linked_book_ids(book_publishers_association, "publisher_id", publisher.name)
+        )
+    ).order_by(Book.id)
 
-    pagination = dict(
-        page=books.page,
-        items_per_page=books.per_page,
-        total_pages=books.pages,
-        total_items=books.total,
-        items=books.items,
-        has_next=books.has_next,
-        has_prev=books.has_prev,
-        next_num=books.next_num,
-        prev_num=books.prev_num,
-        links=[],
-    )
-    response_data = marshal(pagination, book_pagination_model)
-    response_data["links"] = _pagination_nav_links(
-        pagination, "publisher_books", publisher_id=publisher_id
-    )
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(
-        pagination, "publisher_books", publisher_id=publisher_id
+    pagination = _paginate(books, page, per_page, "publisher_books")
+    return _paginated_response(
+        pagination, book_pagination_model, "publisher_books", publisher_id=publisher_id
     )
-    response.headers["Total-Count"] = books.pages
-    return response
@@ -2,9 +2,9 @@ import datetime
 from app.models import Book, Resource
 from flask_restx import abort, marshal
 from http import HTTPStatus
-from flask import jsonify, url_for
+from flask import url_for
 
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from app.utils.pagination import _paginate, _paginated_response
 from .dto import resource_model, resources_pagination_model
 from app import db
 from app.utils.functions import add_resource_type
@@ -27,6 +27,8 @@ def process_create_resource(book_id, data):
     data["modified"] = modified
     resource = Resource(**data)
     db.session.add(resource)
+    if resource.is_image:
+        book.refresh_cover_image()
     db.session.commit()
     resource_data = marshal(resource, resource_model)
     response = {
@@ -43,7 +45,10 @@ def process_create_resource(book_id, data):
 def process_delete_resource(resource_id):
     resource = Resource.query.filter_by(id=resource_id).first()
     if resource:
+        book = resource.book
         db.session.delete(resource)
+        if book is not None and resource.is_image:
+            book.refresh_cover_image()
         db.session.commit()
         return {"status": "success", "message": "Resource deleted successfully"}
     else:
@@ -54,6 +59,8 @@ def process_update_resource(resource_id, data):
     resource = Resource.query.filter(Resource.id == resource_id).first()
     if not resource:
         abort(HTTPStatus.NOT_FOUND, "Resource not found")
+    was_image = resource.is_image
+    previous_book_id = resource.book_id
 
     for key, value in data.items():
         if value is not None and key not in ["id"]:
@@ -65,6 +72,13 @@ def process_update_resource(resource_id, data):
                 value = modified
             setattr(resource, key, value)
 
+    # A changed URL, type or book can change which image is the cover of the
+    # book the resource belonged to and of the one it belongs to now
+    if was_image or resource.is_image:
+        for book_id in {previous_book_id, resource.book_id} - {None}:
+            book = db.session.get(Book, book_id)
+            if book is not None:
+                book.refresh_cover_image()
     db.session.commit()
     resource_data = marshal(resource, resource_model)
     response = {
@@ -89,30 +103,9 @@ def process_get_resources(book_id, page=1, per_page=10):
     book = Book.query.filter(Book.id == book_id).first()
     if not book:
         abort(HTTPStatus.NOT_FOUND, "Book not found")
-    resources = Resource.query.filter(Resource.book_id == book_id).paginate(
-        page=page,
-        per_page=per_page,
-    )
+    resources = Resource.query.filter(Resource.book_id == book_id).order_by(Resource.id)
 
-    pagination = dict(
-        page=resources.page,
-        items_per_page=resources.per_page,
-        total_pages=resources.pages,
-        total_items=resources.total,
-        items=resources.items,
-        has_next=resources.has_next,
-        has_prev=resources.has_prev,
-        next_num=resources.next_num,
-        prev_num=resources.prev_num,
-        links=[],
-    )
-    response_data = marshal(pagination, resources_pagination_model)
-    response_data["links"] = _pagination_nav_links(
-        pagination, "resources", book_id=book_id
-    )
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(
-        pagination, "resources", book_id=book_id
+    pagination = _paginate(resources, page, per_page, "resources")
+    return _paginated_response(
+        pagination, resources_pagination_model, "resources", book_id=book_id
     )
-    response.headers["Total-Count"] = resources.pages
-    return response
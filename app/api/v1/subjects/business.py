@@ -1,10 +1,15 @@
 from app.models import Subject, User, Book
 from app import db
-from flask import jsonify, url_for
+from flask import url_for
 from flask_restx import marshal, abort
 from http import HTTPStatus
 from sqlalchemy import desc
-from app.utils.pagination import _pagination_nav_header_links, _pagination_nav_links
+from app.utils.pagination import (
+    _paginate,
+    _paginate_ranked_ids,
+    _paginated_response,
+)
+from app.services.inverted_index import search_catalog
 from .dto import subject_model, subject_pagination_model
 
 
@@ -33,44 +38,25 @@ def process_get_subject(subject_id):
 
 
 def process_get_subjects(page=1, per_page=10, q=None):
+    # Name searches can be answered from the in-memory index
+    ranked_ids = search_catalog("subjects", q)
+    if ranked_ids is not None:
+        pagination = _paginate_ranked_ids(ranked_ids, Subject, page, per_page)
+        return _paginated_response(
+            pagination, subject_pagination_model, "subjects", q=q
+        )
+
     filter_conditions = []
 
     if q:
         filter_conditions.append(Subject.name.ilike(f"%{q}%"))
 
-    if filter_conditions:
-        subjects = (
-            Subject.query.order_by(desc(Subject.score))
-            .filter(*filter_conditions)
-            .paginate(
-                page=page,
-                per_page=per_page,
-            )
-        )
-    else:
-        subjects = Subject.query.order_by(desc(Subject.score)).paginate(
-            page=page,
-            per_page=per_page,
-        )
+    subjects = Subject.query.order_by(desc(Subject.score)).filter(*filter_conditions)
 
-    pagination = dict(
-        page=subjects.page,
-        items_per_page=subjects.per_page,
-        total_pages=subjects.pages,
-        total_items=subjects.total,
-        items=subjects.items,
-        has_next=subjects.has_next,
-        has_prev=subjects.has_prev,
-        next_num=subjects.next_num,
-        prev_num=subjects.prev_num,
-        links=[],
+    pagination = _paginate(subjects, page, per_page, "subjects")
+    return _paginated_response(
+        pagination, subject_pagination_model, "subjects", q=q or None
     )
-    response_data = marshal(pagination, subject_pagination_model)
-    response_data["links"] = _pagination_nav_links(pagination, "subjects")
-    response = jsonify(response_data)
-    response.headers["Link"] = _pagination_nav_header_links(pagination, "subjects")
-    response.headers["Total-Count"] = subjects.pages
-    return response
 
 
 def process_delete_subject(subject_id):
@@ -1,7 +1,8 @@
 from http import HTTPStatus
+from flask import current_app
 from flask_restx import Namespace, Resource
 from flask_pyjwt import require_token
-from app.models import BlacklistedToken
+from app.services.token_sweeper import token_sweeper
 
 token_ns = Namespace(name="tokens", validate=True)
 
@@ -11,12 +12,30 @@ class ProfileRoute(Resource):
 
     @require_token(scope={"is_admin": True})
     @token_ns.doc(security="Bearer")
-    @token_ns.response(int(HTTPStatus.OK), "Token is currently valid.")
-    @token_ns.response(int(HTTPStatus.BAD_REQUEST), "Validation error.")
+    @token_ns.response(int(HTTPStatus.OK), "Status of the expired token purge.")
+    @token_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
+    def get(self):
+        """
+        Report on the background purge of expired tokens.
+        """
+        return {"status": "success", "sweep": token_sweeper.status}
+
+    @require_token(scope={"is_admin": True})
+    @token_ns.doc(security="Bearer")
+    @token_ns.response(int(HTTPStatus.ACCEPTED), "Purge of expired tokens started.")
     @token_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
     def delete(self):
         """
-        Clear all tokens from the database.
+        Start purging expired tokens from the database in the background.
         """
-        BlacklistedToken.delete_expired()
-        return {"status": "success", "message": "Tokens cleared successfully."}
+        # Passing the real app object lets the sweeper outlive this request
+        started = token_sweeper.trigger(current_app._get_current_object())
+        message = (
+            "Purge of expired tokens started."
+            if started
+            else "A purge of expired tokens is already running."
+        )
+        return (
+            {"status": "success", "message": message, "sweep": token_sweeper.status},
+            HTTPStatus.ACCEPTED,
+        )
@@ -0,0 +1,191 @@
+"""Maintenance CLI commands, available through ``flask <group> <command>``."""
+
+import click
+from flask.cli import AppGroup
+
+search_cli = AppGroup("search", help="Full-text search maintenance.")
+catalog_cli = AppGroup("catalog", help="Catalog data maintenance.")
+perf_cli = AppGroup("perf", help="Performance checks.")
+recommendations_cli = AppGroup("recommendations", help="Recommendation maintenance.")
+mail_cli = AppGroup("mail", help="Mail outbox.")
+
+
+@search_cli.command("reindex")
+@click.option("--batch-size", default=500, show_default=True, type=int)
+def reindex_command(batch_size):
+    """Rebuild the full-text search document of every book."""
+    from app.services.full_text_search import reindex_books
+
+    total = reindex_books(batch_size=batch_size)
+    click.echo(f"Reindexed {total} books.")
+
+
+@catalog_cli.command("backfill-covers")
+@click.option("--batch-size", default=1000, show_default=True, type=int)
+def backfill_covers_command(batch_size):
+    """Fill resources.mime_type and books.cover_image_url for existing rows."""
+    from app.services.cover_images import backfill_cover_images, backfill_mime_types
+
+    resources = backfill_mime_types(batch_size=batch_size)
+    click.echo(f"Normalized the MIME type of {resources} resources.")
+    books = backfill_cover_images(batch_size=batch_size)
+    click.echo(f"Resolved the cover image of {books} books.")
+
+
+@catalog_cli.command("reconcile-aggregates")
+@click.option("--batch-size", default=1000, show_default=True, type=int)
+def reconcile_aggregates_command(batch_size):
+    """Recompute book engagement aggregates and comment counters that drifted."""
+    from app.services.book_aggregates import (
+        reconcile_book_aggregates,
+        reconcile_comment_counters,
+    )
+
+    checked, fixed = reconcile_book_aggregates(batch_size=batch_size)
+    click.echo(f"Checked {checked} books, fixed {fixed}.")
+    checked, fixed = reconcile_comment_counters(batch_size=batch_size)
+    click.echo(f"Checked {checked} comments, fixed {fixed}.")
+
+
+@catalog_cli.command("recompute-popularity")
+@click.option("--batch-size", default=5000, show_default=True, type=int)
+def recompute_popularity_command(batch_size):
+    """Recompute the popularity score of every book."""
+    from app.services.popular_books_engine import preprocess_popularity_data
+
+    scored, changed = preprocess_popularity_data(batch_size=batch_size)
+    click.echo(f"Scored {scored} books, updated {changed}.")
+
+
+@catalog_cli.command("build-similar")
+@click.option("--full", is_flag=True, help="Tokenize every book again.")
+@click.option("--max-df", default=0.1, show_default=True, type=float)
+def build_similar_command(full, max_df):
+    """Index the content of the books changed since the last build."""
+    from flask import current_app
+    from app.services.similar_books import build_similar_books
+
+    indexed, tokenized = build_similar_books(
+        current_app.config["SIMILAR_BOOKS_PATH"], full=full, max_df=max_df
+    )
+    click.echo(f"Indexed {indexed} books, tokenized {tokenized}.")
+
+
+@recommendations_cli.command("precompute")
+@click.option("--active-days", default=7, show_default=True, type=int)
+@click.option("--batch-size", default=100, show_default=True, type=int)
+def precompute_recommendations_command(active_days, batch_size):
+    """Store the recommendation lists of users who logged in recently."""
+    from app.services.recommendation_cache import precompute_recommendations
+
+    computed = precompute_recommendations(
+        active_days=active_days, batch_size=batch_size
+    )
+    click.echo(f"Computed recommendations for {computed} users.")
+
+
+@recommendations_cli.command("build-also-read")
+@click.option("--top-k", default=50, show_default=True, type=int)
+@click.option(
+    "--measure",
+    default="cosine",
+    show_default=True,
+    type=click.Choice(["cosine", "jaccard"]),
+)
+@click.option("--max-user-books", default=500, show_default=True, type=int)
+def build_also_read_command(top_k, measure, max_user_books):
+    """Rebuild the book neighbours from bookmark co-occurrence."""
+    from flask import current_app
+    from app.services.also_read import build_also_read
+
+    books, entries = build_also_read(
+        current_app.config["ALSO_READ_PATH"],
+        top_k=top_k,
+        measure=measure,
+        max_user_books=max_user_books,
+    )
+    click.echo(f"Stored {entries} neighbours for {books} books.")
+
+
+@mail_cli.command("send-outbox")
+@click.option("--batch-size", default=50, show_default=True, type=int)
+def send_outbox_command(batch_size):
+    """Send every due email in the mail outbox now."""
+    from app.services.mail_outbox import outbox_status, process_outbox
+
+    claimed = 0
+    while True:
+        batch = process_outbox(batch_size=batch_size)
+        if not batch:
+            break
+        claimed += batch
+    counts = outbox_status()["counts"]
+    click.echo(
+        f"Processed {claimed} emails; {counts['pending']} pending, "
+        f"{counts['failed']} failed."
+    )
+
+
+@perf_cli.command("explain")
+@click.option("--min-rows", default=10000, show_default=True, type=int)
+@click.option("--verbose", is_flag=True, help="Print the offending statements.")
+def explain_command(min_rows, verbose):
+    """Fail when a read endpoint sequentially scans a table of min-rows or more."""
+    from flask import current_app
+    from app.services.query_plans import check_query_plans
+
+    results = check_query_plans(current_app._get_current_object(), min_rows)
+    failures = 0
+    for path, status, statement_count, offending in results:
+        state = "FAIL" if offending else "ok"
+        click.echo(f"{state:4} {status} {path} ({statement_count} queries)")
+        for table, rows, statement in offending:
+            click.echo(f"     seq scan on {table} (~{rows} rows)")
+            if verbose:
+                click.echo(f"       {' '.join(statement.split())}")
+        failures += bool(offending)
+    if failures:
+        raise click.ClickException(
+            f"{failures} endpoint(s) scan tables with {min_rows} rows or more."
+        )
+    click.echo(f"No sequential scans on tables with {min_rows} rows or more.")
+
+
+@perf_cli.command("bench-login")
+@click.option("--duration", default=10.0, show_default=True, type=float)
+@click.option("--logins", default=16, show_default=True, help="Login clients.")
+@click.option("--readers", default=4, show_default=True, help="/books clients.")
+@click.option("--workers", default=None, type=int, help="Password hashing processes.")
+def bench_login_command(duration, logins, readers, workers):
+    """Compare login throughput and /books latency with and without the pool."""
+    from flask import current_app
+    from app.services.login_benchmark import run_login_benchmark
+
+    results = run_login_benchmark(
+        current_app._get_current_object(),
+        duration=duration,
+        logins=logins,
+        readers=readers,
+        workers=workers,
+    )
+
+    def ms(value):
+        return f"{value:.1f}ms" if value is not None else "-"
+
+    for mode, stats in results.items():
+        click.echo(
+            f"{mode:6} ({stats['hash_workers']} hash processes): "
+            f"{stats['logins_per_second']:.1f} logins/s, "
+            f"{stats['logins_rejected']} rejected, {stats['login_errors']} errors; "
+            f"/books p50 {ms(stats['book_p50_ms'])} p95 {ms(stats['book_p95_ms'])} "
+            f"max {ms(stats['book_max_ms'])} over {stats['book_reads']} reads"
+        )
+
+
+# Function to register the CLI command groups with the application
+def register_commands(app):
+    app.cli.add_command(search_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(perf_cli)
+    app.cli.add_command(recommendations_cli)
+    app.cli.add_command(mail_cli)
@@ -48,11 +48,24 @@ POSTSQL_PROD = (
 MY_DOMAIN = os.environ.get("MY_DOMAIN")
 
 
+# Function to read an optional integer setting from the environment
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
 class Config:
     """Base configuration."""
 
     # Bcrypt log rounds
     BCRYPT_LOG_ROUNDS = 4
+    # Password hashing pool: bcrypt processes (0 hashes on the request
+    # thread), operations admitted at once (default twice the processes),
+    # seconds to wait for a result and Retry-After seconds when saturated
+    PASSWORD_HASH_WORKERS = _env_int("PASSWORD_HASH_WORKERS", 0)
+    PASSWORD_HASH_QUEUE_SIZE = _env_int("PASSWORD_HASH_QUEUE_SIZE")
+    PASSWORD_HASH_TIMEOUT = 10
+    PASSWORD_HASH_RETRY_AFTER = 2
 
     # Token expiration settings
     TOKEN_EXPIRE_HOURS = 0
@@ -67,6 +80,123 @@ class Config:
     RESTX_MASK_SWAGGER = False
     JSON_SORT_KEYS = False
 
+    # Pagination count strategy: "exact", "estimated", "cached" or "none"
+    PAGINATION_COUNT_STRATEGY = "exact"
+    # Per-endpoint overrides for the large book listings
+    PAGINATION_COUNT_STRATEGIES = {
+        "books": "cached",
+        "popular_books": "estimated",
+        "language_books": "cached",
+        "publisher_books": "cached",
+    }
+    # Seconds a "cached" count is reused for the same filter set
+    PAGINATION_COUNT_CACHE_TTL = 60
+
+    # Where `q` searches run: "database" or "memory" (in-process inverted index)
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "database")
+
+    # Start the background threads (popularity flusher, mail workers, token
+    # sweeper) with the first request served; CLI commands calling endpoints
+    # in-process turn it off
+    BACKGROUND_WORKERS = True
+
+    # Trending scores: seconds between flushes of the buffered engagement
+    # events, failed flushes before a book's events are dropped, hours for an
+    # event's weight to halve and weight per event type
+    POPULARITY_FLUSH_INTERVAL = 10
+    POPULARITY_FLUSH_MAX_ATTEMPTS = 5
+    TRENDING_HALF_LIFE_HOURS = 24
+    POPULARITY_EVENT_WEIGHTS = {"download": 1, "upvote": 2, "bookmark": 3, "review": 5}
+
+    # Recommendations: books ranked per user and seconds the in-memory book x
+    # feature matrix is reused before it is rebuilt
+    RECOMMENDATION_LIMIT = 200
+    RECOMMENDATION_MATRIX_TTL = 300
+    # Seconds a user's stored recommendation list is served before recomputing
+    RECOMMENDATION_CACHE_TTL = 3600
+    # Also-read neighbours: directory of the bookmark co-occurrence index built
+    # by `flask recommendations build-also-read`, seconds between checks for a
+    # new build and weight of neighbour similarity in user recommendations
+    ALSO_READ_PATH = os.environ.get(
+        "ALSO_READ_PATH", str(HERE.parent / "instance" / "also_read")
+    )
+    ALSO_READ_RELOAD_INTERVAL = 30
+    RECOMMENDATION_ALSO_READ_WEIGHT = 5
+    # Similar books: directory of the content similarity index built by
+    # `flask catalog build-similar`, seconds between checks for a new build
+    # and books returned per lookup
+    SIMILAR_BOOKS_PATH = os.environ.get(
+        "SIMILAR_BOOKS_PATH", str(HERE.parent / "instance" / "similar_books")
+    )
+    SIMILAR_BOOKS_RELOAD_INTERVAL = 30
+    SIMILAR_BOOKS_LIMIT = 50
+
+    # Per-process token blacklist cache: seconds between picking up new rows,
+    # Bloom filter false positive rate and width of the expiry buckets
+    TOKEN_BLACKLIST_REFRESH_INTERVAL = 5
+    TOKEN_BLACKLIST_ERROR_RATE = 0.001
+    TOKEN_BLACKLIST_BUCKET_SECONDS = 3600
+
+    # Per-process cache of users resolved from token subjects: seconds an
+    # entry is trusted and maximum number of entries
+    USER_IDENTITY_CACHE_TTL = 30
+    USER_IDENTITY_CACHE_SIZE = 4096
+
+    # Per-process cache of verified tokens, kept until they expire: maximum
+    # number of entries (0 disables it)
+    JWT_TOKEN_CACHE_SIZE = 4096
+
+    # Background purge of expired blacklisted tokens: seconds between sweeps
+    # (0 disables the schedule), rows per batch and seconds between batches
+    TOKEN_SWEEP_INTERVAL = 3600
+    TOKEN_SWEEP_BATCH_SIZE = 1000
+    TOKEN_SWEEP_PAUSE = 0.1
+
+    # Request threads per process (waitress-serve --threads); the database
+    # connection pool is sized from it
+    WAITRESS_THREADS = _env_int("WAITRESS_THREADS", 4)
+
+    # Connection pool: persistent connections (None = one per waitress
+    # thread), extra connections opened under bursts (None = a quarter of the
+    # threads, at least 2, for the background workers), seconds a checkout
+    # waits before failing, seconds before a connection is replaced and
+    # whether connections are tested before use
+    DB_POOL_SIZE = _env_int("DB_POOL_SIZE")
+    DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT = 10
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+
+    # PostgreSQL session settings: statement_timeout in milliseconds of the
+    # transactions run by HTTP requests (0 = no limit; migrations and CLI
+    # commands are not limited) and the application_name shown in
+    # pg_stat_activity
+    DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 15000)
+    DB_APPLICATION_NAME = "pico-library-api"
+
+    # Read replicas (comma separated DATABASE_REPLICA_URLS) serving GET
+    # requests: seconds between health checks, replication lag in seconds
+    # beyond which a replica is skipped, what to do when every replica is
+    # behind ("primary" or "least_stale") and seconds a client keeps reading
+    # from the primary after it wrote
+    rh = os.environ.get("DATABASE_REPLICA_URLS")
+    DB_REPLICA_URIS = rh.split(",") if rh else []
+    DB_REPLICA_CHECK_INTERVAL = 5
+    DB_REPLICA_MAX_LAG = 10
+    DB_REPLICA_STALE_FALLBACK = "primary"
+    DB_READ_YOUR_WRITES_SECONDS = 15
+
+    # Mail outbox: sender threads per process, emails claimed per SMTP
+    # connection, seconds between polls when idle, seconds a claim lasts,
+    # first and longest retry delay in seconds and attempts before giving up
+    MAIL_OUTBOX_WORKERS = _env_int("MAIL_OUTBOX_WORKERS", 2)
+    MAIL_OUTBOX_BATCH_SIZE = 50
+    MAIL_OUTBOX_POLL_INTERVAL = 5
+    MAIL_OUTBOX_CLAIM_SECONDS = 300
+    MAIL_OUTBOX_RETRY_DELAY = 30
+    MAIL_OUTBOX_RETRY_MAX_DELAY = 3600
+    MAIL_OUTBOX_MAX_ATTEMPTS = 8
+
     ah = os.environ.get("CORS_ORIGINS")
     CORS_ORIGINS = ah.split(",") if ah else []
 
@@ -77,7 +207,11 @@ class TestingConfig(Config):
     TESTING = True
     JWT_AUTHMAXAGE = 5
     JWT_REFRESHMAXAGE = 10
+    TOKEN_SWEEP_INTERVAL = 0
+    MAIL_OUTBOX_WORKERS = _env_int("MAIL_OUTBOX_WORKERS", 0)
     SQLALCHEMY_DATABASE_URI = POSTSQL_TEST
+    DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 2)
+    DB_APPLICATION_NAME = "pico-library-api-test"
     PICO_LIB_APP = os.environ.get("PICO_LIB_APP", "http://localhost:3000/")
 
 
@@ -85,14 +219,21 @@ class DevelopmentConfig(Config):
     """Development configuration."""
 
     BCRYPT_LOG_ROUNDS = 13
+    # Half the cores hash passwords, the rest stay free for request threads
+    PASSWORD_HASH_WORKERS = _env_int(
+        "PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)
+    )
     JWT_AUTHMAXAGE = 60 * 5
     JWT_REFRESHMAXAGE = 3600
     SQLALCHEMY_DATABASE_URI = POSTSQL_TEST
     SECRET_KEY = os.getenv("SECRET_KEY")
+    # Leave room for ad-hoc profiling queries
+    DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 60000)
+    DB_APPLICATION_NAME = "pico-library-api-dev"
 
-    MAIL_SERVER = "smtp.gmail.com"
-    MAIL_PORT = 465
-    MAIL_USE_SSL = True
+    MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+    MAIL_PORT = _env_int("MAIL_PORT", 465)
+    MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "true").lower() == "true"
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
 
@@ -103,15 +244,22 @@ class ProductionConfig(Config):
     """Production configuration."""
 
     BCRYPT_LOG_ROUNDS = 13
+    # Half the cores hash passwords, the rest stay free for request threads
+    PASSWORD_HASH_WORKERS = _env_int(
+        "PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)
+    )
     JWT_AUTHMAXAGE = 60 * 5
     JWT_REFRESHMAXAGE = 60 * 60 * 24 * 50
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", POSTSQL_PROD)
     PRESERVE_CONTEXT_ON_EXCEPTION = True
     SECRET_KEY = os.getenv("SECRET_KEY")
+    WAITRESS_THREADS = _env_int("WAITRESS_THREADS", 8)
+    # Managed databases close idle connections after a few minutes
+    DB_POOL_RECYCLE = 300
 
-    MAIL_SERVER = "smtp.gmail.com"
-    MAIL_PORT = 465
-    MAIL_USE_SSL = True
+    MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+    MAIL_PORT = _env_int("MAIL_PORT", 465)
+    MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "true").lower() == "true"
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
 
@@ -4,13 +4,15 @@ from .books import Book
 from .bookshelves import Bookshelf
 from .comments import Comment, CommentType, CommentVote, CommentVoteType
 from .languages import Language
+from .mail_outbox import MailStatus, OutboxEmail
 from .profile import Profile, UserGender
 from .publishers import Publisher
 from .ratings import Rating
-from .resources import Resource, ResourceType
+from .resources import IMAGE_MIME_TYPES, Resource, ResourceType
 from .subjects import Subject
 from .users import User
 from .token_blacklist import BlacklistedToken
+from .user_recommendations import UserRecommendation
 
 __all__ = [
     "Agent",
@@ -24,14 +26,18 @@ __all__ = [
     "CommentVote",
     "CommentVoteType",
     "Language",
+    "MailStatus",
+    "OutboxEmail",
     "Profile",
     "Publisher",
     "Rating",
+    "IMAGE_MIME_TYPES",
     "Resource",
     "ResourceType",
     "Subject",
     "User",
     "UserGender",
     "BlacklistedToken",
+    "UserRecommendation",
 ]
 __version__ = "1.0.0"
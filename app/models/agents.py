@@ -22,6 +22,7 @@ book_agents_association = db.Table(
     db.Column("book_id", db.Integer, db.ForeignKey("books.id", ondelete="CASCADE")),
     db.Column("agent_id", db.Integer, db.ForeignKey("agents.id", ondelete="CASCADE")),
     db.PrimaryKeyConstraint("book_id", "agent_id"),
+    db.Index("ix_book_agents_agent_id_book_id", "agent_id", "book_id"),
 )
 
 
@@ -45,7 +46,10 @@ class Agent(db.Model):
     def agent_books(self):
         from app.models.books import Book
 
-        return Book.query.filter(Book.agents.any(Agent.id == self.id)).limit(5).all()
+        book_ids = db.select(book_agents_association.c.book_id).where(
+            book_agents_association.c.agent_id == self.id
+        )
+        return Book.query.filter(Book.id.in_(book_ids)).limit(5).all()
 
     @hybrid_property
     def agent_type(self):
@@ -32,7 +32,9 @@ class Bookmark(db.Model):
     __tablename__ = "bookmarks"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
-    book_id = db.Column(db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"))
+    book_id = db.Column(
+        db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"), index=True
+    )
     status = db.Column(
         db.Enum(BookmarkStatus), nullable=False, default=BookmarkStatus.UNREAD
     )
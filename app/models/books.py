@@ -1,6 +1,9 @@
 from app import db
 
+from sqlalchemy import DDL, case, event, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred
 from .bookshelves import book_bookshelves_association
 from .agents import book_agents_association
 from .languages import book_languages_association
@@ -25,11 +28,42 @@ class Book(db.Model):
     format = db.Column(db.String)
     title = db.Column(db.String)
     description = db.Column(db.Text)
-    downloads = db.Column(db.Integer, default=0)
+    downloads = db.Column(db.Integer, default=0, index=True)
     license = db.Column(db.String)
-    popularity_score = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=utc_now)
+    popularity_score = db.Column(db.Integer, default=0, index=True)
+    created_at = db.Column(db.DateTime, default=utc_now, index=True)
     updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
+    # URL of the first image resource, maintained by refresh_cover_image
+    cover_image_url = db.Column(db.String, nullable=True)
+    # Engagement aggregates, maintained by adjust_aggregates and reconciled
+    # by `flask catalog reconcile-aggregates`
+    rating_sum = db.Column(db.Float, default=0, server_default="0", nullable=False)
+    rating_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    review_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    # Comments of every type other than reviews
+    comment_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    bookmark_count = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
+    # Time-decayed engagement score, maintained by app.services.popularity_events;
+    # NULL until the book's first event, ranked below every score
+    trending_score = db.Column(db.Float, nullable=True)
+    # Weighted full-text document, maintained by app.services.full_text_search
+    search_vector = deferred(
+        db.Column(TSVECTOR().with_variant(db.Text, "sqlite"), nullable=True)
+    )
+
+    __table_args__ = (
+        db.Index(
+            "ix_books_search_vector", search_vector, postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        # Matches ORDER BY trending_score DESC NULLS LAST; SQLite can't declare
+        # the NULL order in an index but already sorts NULL last when descending
+        db.Index("ix_books_trending_score", trending_score.desc().nulls_last()).ddl_if(
+            dialect="postgresql"
+        ),
+        db.Index("ix_books_trending_score", trending_score).ddl_if(dialect="sqlite"),
+    )
 
     bookshelves = db.relationship(
         "Bookshelf", secondary=book_bookshelves_association, back_populates="books"
@@ -53,25 +87,41 @@ class Book(db.Model):
 
     @hybrid_property
     def image(self):
-        from app.models.resources import Resource
-        from sqlalchemy import or_
-
-        image_resource = Resource.query.filter(
-            Resource.book_id == self.id,
-            or_(
-                Resource.type_name.ilike("%\image/jpeg%"),
-                Resource.type_name.ilike("%\image/png%"),
-            ),
-        ).first()
-        return image_resource.url if image_resource else None
+        return self.cover_image_url
+
+    def refresh_cover_image(self):
+        """
+        Points cover_image_url at the book's first image resource
+        """
+        from app.models.resources import IMAGE_MIME_TYPES, Resource
+
+        # New books need an id before their resources can be looked up
+        if self.id is None:
+            db.session.flush()
+        image_resource = (
+            Resource.query.filter(
+                Resource.book_id == self.id,
+                Resource.mime_type.in_(IMAGE_MIME_TYPES),
+            )
+            .order_by(Resource.id)
+            .first()
+        )
+        self.cover_image_url = image_resource.url if image_resource else None
 
     @hybrid_property
     def average_rating(self):
-        ratings = self.ratings
-        if ratings:
-            return sum(rating.rating for rating in ratings) / len(ratings)
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
 
+    @average_rating.expression
+    def average_rating(cls):
+        # Literal constants keep the SQL identical to ix_books_average_rating_id
+        return case(
+            (cls.rating_count > literal_column("0"), cls.rating_sum / cls.rating_count),
+            else_=literal_column("0.0"),
+        )
+
     @hybrid_property
     def reviews(self):
         from .comments import Comment, CommentType
@@ -96,5 +146,54 @@ class Book(db.Model):
     def get_by_id(cls, id):
         return cls.query.filter(cls.id == id).first()
 
+    @classmethod
+    def adjust_aggregates(cls, book_id, **deltas):
+        """
+        Atomically adds deltas to aggregate columns, e.g. rating_count=1
+        :param book_id: int
+        """
+        if not book_id or not deltas:
+            return
+        values = {
+            getattr(cls, name): getattr(cls, name) + delta
+            for name, delta in deltas.items()
+        }
+        # Counters are not an edit of the book itself
+        values[cls.updated_at] = cls.updated_at
+        cls.query.filter(cls.id == book_id).update(values, synchronize_session=False)
+
     def __repr__(self):
         return f"<Book {self.title}>"
+
+
+# Function to count a change of a book's subjects or agents as an edit of the
+# book; only the association table is written otherwise, and the incremental
+# similar books build selects changed books by updated_at
+def _touch_book(target, value, initiator):
+    target.updated_at = utc_now()
+
+
+for _collection in (Book.subjects, Book.agents):
+    event.listen(_collection, "append", _touch_book)
+    event.listen(_collection, "remove", _touch_book)
+
+
+# FTS5 shadow table holding the search documents when running on SQLite
+event.listen(
+    Book.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+        "title, agents, subjects, bookshelves, description, "
+        "tokenize = 'porter unicode61')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Book.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect="sqlite"),
+)
+
+
+# Serves the rating sort and its keyset cursor without a sort step
+db.Index("ix_books_average_rating_id", Book.average_rating, Book.id)
@@ -16,6 +16,7 @@ book_bookshelves_association = db.Table(
         "bookshelf_id", db.Integer, db.ForeignKey("bookshelves.id", ondelete="CASCADE")
     ),
     db.PrimaryKeyConstraint("book_id", "bookshelf_id"),
+    db.Index("ix_book_bookshelves_bookshelf_id_book_id", "bookshelf_id", "book_id"),
 )
 
 
@@ -26,6 +27,7 @@ user_bookshelves_association = db.Table(
         "bookshelf_id", db.Integer, db.ForeignKey("bookshelves.id", ondelete="CASCADE")
     ),
     db.PrimaryKeyConstraint("user_id", "bookshelf_id"),
+    db.Index("ix_user_bookshelves_bookshelf_id_user_id", "bookshelf_id", "user_id"),
 )
 
 
@@ -37,7 +39,9 @@ class Bookshelf(db.Model):
     __tablename__ = "bookshelves"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String, unique=True, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
     score = db.Column(db.Integer, default=0)
     cover_image = db.Column(db.String)
     description = db.Column(db.String)
@@ -19,6 +19,13 @@ class CommentVoteType(enum.Enum):
     NONE = "none"
 
 
+# Comment counter column each vote type is tallied in
+VOTE_COUNTERS = {
+    CommentVoteType.UPVOTE: "upvote_count",
+    CommentVoteType.DOWNVOTE: "downvote_count",
+}
+
+
 class CommentType(enum.Enum):
     COMMENT = "comment"
     REPLY = "reply"
@@ -36,7 +43,13 @@ class CommentVote(db.Model):
     created_at = db.Column(db.DateTime, default=utc_now)
     updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
     comment_id = db.Column(db.Integer, db.ForeignKey("comments.id", ondelete="CASCADE"))
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+
+    __table_args__ = (
+        db.Index("ix_comment_votes_comment_id_user_id", "comment_id", "user_id"),
+    )
 
     comment = db.relationship("Comment", back_populates="comment_votes")
     user = db.relationship("User", back_populates="comment_votes")
@@ -67,9 +80,26 @@ class Comment(db.Model):
     updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
     type = db.Column(db.Enum(CommentType), nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"))
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
-    parent_id = db.Column(db.Integer, db.ForeignKey("comments.id", ondelete="CASCADE"))
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    parent_id = db.Column(
+        db.Integer, db.ForeignKey("comments.id", ondelete="CASCADE"), index=True
+    )
     rating = db.Column(db.Float, nullable=True)
+    # Counters maintained by adjust_counters instead of loading collections
+    upvote_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    downvote_count = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
+    reply_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+
+    # Book listings filter by book and type, newest first
+    __table_args__ = (
+        db.Index(
+            "ix_comments_book_id_type_created_at", "book_id", "type", "created_at"
+        ),
+    )
 
     book = db.relationship("Book", back_populates="comments")
     user = db.relationship("User", back_populates="comments")
@@ -83,7 +113,7 @@ class Comment(db.Model):
 
     @hybrid_property
     def number_of_replies(self):
-        return len(self.replies)
+        return self.reply_count
 
     @hybrid_property
     def user_profile(self):
@@ -91,19 +121,11 @@ class Comment(db.Model):
 
     @hybrid_property
     def upvotes(self):
-        return len(
-            [vote for vote in self.comment_votes if vote.vote == CommentVoteType.UPVOTE]
-        )
+        return self.upvote_count
 
     @hybrid_property
     def downvotes(self):
-        return len(
-            [
-                vote
-                for vote in self.comment_votes
-                if vote.vote == CommentVoteType.DOWNVOTE
-            ]
-        )
+        return self.downvote_count
 
     @hybrid_property
     def created_at_str(self):
@@ -119,5 +141,21 @@ class Comment(db.Model):
     def get_by_id(cls, comment_id):
         return cls.query.filter(cls.id == comment_id).first()
 
+    @classmethod
+    def adjust_counters(cls, comment_id, **deltas):
+        """
+        Atomically adds deltas to counter columns, e.g. upvote_count=1
+        :param comment_id: int
+        """
+        if not comment_id or not deltas:
+            return
+        values = {
+            getattr(cls, name): getattr(cls, name) + delta
+            for name, delta in deltas.items()
+        }
+        # Votes and replies are not an edit of the comment itself
+        values[cls.updated_at] = cls.updated_at
+        cls.query.filter(cls.id == comment_id).update(values, synchronize_session=False)
+
     def __repr__(self):
         return f"<Comment {self.id}>"
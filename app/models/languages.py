@@ -8,6 +8,7 @@ book_languages_association = db.Table(
         "language_id", db.Integer, db.ForeignKey("languages.id", ondelete="CASCADE")
     ),
     db.PrimaryKeyConstraint("book_id", "language_id"),
+    db.Index("ix_book_languages_language_id_book_id", "language_id", "book_id"),
 )
 
 
@@ -0,0 +1,43 @@
+from app import db
+from app.utils.datetime_util import utc_now
+
+import enum
+
+
+class MailStatus(enum.Enum):
+    """
+    Delivery status of an outbox email
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxEmail(db.Model):
+    """
+    Email waiting in the outbox for the mail workers
+    """
+
+    __tablename__ = "mail_outbox"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    subject = db.Column(db.String, nullable=False)
+    sender = db.Column(db.String, nullable=True)
+    recipients = db.Column(db.JSON, nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    html = db.Column(db.Text, nullable=True)
+    status = db.Column(db.Enum(MailStatus), nullable=False, default=MailStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When a pending email is due, or when the claim of a sending one lapses
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=utc_now)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_mail_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<OutboxEmail {self.id} {self.status.value}>"
@@ -9,6 +9,7 @@ book_publishers_association = db.Table(
         "publisher_id", db.String, db.ForeignKey("publishers.name", ondelete="CASCADE")
     ),
     db.PrimaryKeyConstraint("book_id", "publisher_id"),
+    db.Index("ix_book_publishers_publisher_id_book_id", "publisher_id", "book_id"),
 )
 
 
@@ -22,7 +22,9 @@ class Rating(db.Model):
     created_at = db.Column(db.DateTime, default=utc_now)
     rating = db.Column(db.Float)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
-    book_id = db.Column(db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"))
+    book_id = db.Column(
+        db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"), index=True
+    )
 
     user = db.relationship("User", back_populates="ratings")
     book = db.relationship("Book", back_populates="ratings")
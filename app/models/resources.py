@@ -10,6 +10,17 @@ from app.utils.datetime_util import (
 )
 
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
+
+# MIME types that can serve as a book cover
+IMAGE_MIME_TYPES = ("image/jpeg", "image/png")
+
+
+# Function to reduce a resource type such as "Image/JPEG; q=1" to "image/jpeg"
+def normalize_mime_type(type_name):
+    if not type_name:
+        return None
+    return type_name.split(";", 1)[0].strip().lower() or None
 
 
 class ResourceType(db.Model):
@@ -32,13 +43,33 @@ class Resource(db.Model):
     type_name = db.Column(
         db.String, db.ForeignKey("resource_type.name", ondelete="CASCADE")
     )
-    book_id = db.Column(db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"))
+    book_id = db.Column(
+        db.Integer, db.ForeignKey("books.id", ondelete="CASCADE"), index=True
+    )
+    # Normalized form of type_name, kept in sync by the validators below
+    mime_type = db.Column(db.String, index=True)
 
     type = db.relationship("ResourceType", back_populates="resources")
     book = db.relationship("Book", back_populates="resources")
 
     __table_args__ = (db.UniqueConstraint("url", "type_name"),)
 
+    @validates("type_name")
+    def validate_type_name(self, key, type_name):
+        self.mime_type = normalize_mime_type(type_name)
+        return type_name
+
+    @validates("type")
+    def validate_type(self, key, resource_type):
+        self.mime_type = normalize_mime_type(
+            resource_type.name if resource_type else None
+        )
+        return resource_type
+
+    @hybrid_property
+    def is_image(self):
+        return self.mime_type in IMAGE_MIME_TYPES
+
     @hybrid_property
     def type_str(self):
         return self.type.name
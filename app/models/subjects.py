@@ -7,6 +7,7 @@ book_subjects_association = db.Table(
         "subject_id", db.Integer, db.ForeignKey("subjects.id", ondelete="CASCADE")
     ),
     db.PrimaryKeyConstraint("book_id", "subject_id"),
+    db.Index("ix_book_subjects_subject_id_book_id", "subject_id", "book_id"),
 )
 
 user_subjects_association = db.Table(
@@ -16,6 +17,7 @@ user_subjects_association = db.Table(
         "subject_id", db.Integer, db.ForeignKey("subjects.id", ondelete="CASCADE")
     ),
     db.PrimaryKeyConstraint("user_id", "subject_id"),
+    db.Index("ix_user_subjects_subject_id_user_id", "subject_id", "user_id"),
 )
 
 
@@ -4,33 +4,56 @@ from datetime import timezone
 
 from app import db
 from app.utils.datetime_util import utc_now, dtaware_fromtimestamp
+from app.utils.token_cache import token_digest
 from datetime import datetime
 
 
 class BlacklistedToken(db.Model):
-    """BlacklistedToken Model for storing JWT tokens."""
+    """BlacklistedToken Model for storing JWT token digests."""
 
     __tablename__ = "token_blacklist"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    token = db.Column(db.String(500), unique=True, nullable=False)
+    # Hex SHA-256 of the signed token; tokens themselves are never stored
+    token_digest = db.Column(db.String(64), unique=True, nullable=False)
     blacklisted_on = db.Column(db.DateTime, default=utc_now)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
     def __init__(self, token, expires_at):
-        self.token = token
+        self.token_digest = self.digest(token)
         self.expires_at = dtaware_fromtimestamp(expires_at, use_tz=timezone.utc)
 
     def __repr__(self):
-        return f"<BlacklistToken token={self.token}>"
+        return f"<BlacklistToken token_digest={self.token_digest}>"
+
+    @staticmethod
+    def digest(token):
+        return token_digest(token)
 
     @classmethod
     def check_blacklist(cls, token):
-        exists = cls.query.filter_by(token=token).first()
+        return cls.check_digest(cls.digest(token))
+
+    @classmethod
+    def check_digest(cls, token_digest):
+        exists = db.session.query(cls.id).filter_by(token_digest=token_digest).first()
         return True if exists else False
 
     @classmethod
-    def delete_expired(cls):
-        cls.query.filter(cls.expires_at < datetime.now()).delete()
+    def delete_expired(cls, batch_size=1000):
+        """
+        Deletes one batch of expired tokens, oldest first, in its own transaction
+        :return: number of rows deleted
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expired_ids = (
+            db.select(cls.id)
+            .where(cls.expires_at < now)
+            .order_by(cls.expires_at)
+            .limit(batch_size)
+        )
+        result = db.session.execute(
+            db.delete(cls).where(cls.id.in_(expired_ids.scalar_subquery()))
+        )
         db.session.commit()
-        return True
+        return result.rowcount
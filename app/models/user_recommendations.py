@@ -0,0 +1,20 @@
+from app import db
+from app.utils.datetime_util import utc_now
+
+
+class UserRecommendation(db.Model):
+    """
+    Ranked recommendation ids cached per user and language
+    """
+
+    __tablename__ = "user_recommendations"
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Language code the list was filtered by, "" for every language
+    language = db.Column(db.String(16), primary_key=True, default="")
+    book_ids = db.Column(db.JSON, nullable=False)
+    computed_at = db.Column(db.DateTime, default=utc_now, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<UserRecommendation {self.user_id} {self.language!r}>"
@@ -1,5 +1,4 @@
-from app import db, bcrypt, auth_manager
-from flask import current_app
+from app import db, auth_manager
 from sqlalchemy.ext.hybrid import hybrid_property
 from uuid import uuid4
 from datetime import timezone
@@ -14,6 +13,7 @@ from app.utils.datetime_util import (
 
 from app.models.token_blacklist import BlacklistedToken
 from flask_pyjwt import JWT
+from app.utils.password_hashing import check_password, hash_password
 
 
 class User(db.Model):
@@ -23,7 +23,7 @@ class User(db.Model):
 
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String)
+    email = db.Column(db.String, unique=True, index=True)
     is_admin = db.Column(db.Boolean, default=False)
     password_hash = db.Column(db.String)
     created_at = db.Column(db.DateTime, default=utc_now, nullable=False)
@@ -46,7 +46,9 @@ class User(db.Model):
         back_populates="users",
     )
 
-    public_id = db.Column(db.String, default=lambda: str(uuid4()))
+    public_id = db.Column(
+        db.String, default=lambda: str(uuid4()), unique=True, index=True
+    )
 
     @hybrid_property
     def created_at_str(self):
@@ -68,12 +70,11 @@ class User(db.Model):
 
     @password.setter
     def password(self, password):
-        log_rounds = current_app.config.get("BCRYPT_LOG_ROUNDS")
-        hash_bytes = bcrypt.generate_password_hash(password, log_rounds)
-        self.password_hash = hash_bytes.decode("utf-8")
+        # bcrypt runs in the password hashing pool when one is configured
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return check_password(self.password_hash, password)
 
     @staticmethod
     def find_by_email(email):
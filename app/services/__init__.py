@@ -21,10 +21,10 @@ def calculate_review_score(book: Book):
     
     # Calculate total score and total votes based on reviews
     for review in reviews:
-        total_score += review.rating * (
-            review.upvotes() - review.downvotes()
+        total_score += (review.rating or 0) * (
+            review.upvote_count - review.downvote_count
         )  # Consider both rating and votes
-        total_votes += review.upvotes() + review.downvotes()
+        total_votes += review.upvote_count + review.downvote_count
 
     if total_votes > 0:
         return total_score / total_votes  # Calculate average score per vote
@@ -65,7 +65,7 @@ def calculate_score(user: User, book: Book):
         score += bookshelf.score
 
     # Incorporate other factors into the score calculation, such as average rating
-    if book.rating:
-        score += book.rating
+    if book.average_rating:
+        score += book.average_rating
 
     return score
@@ -0,0 +1,206 @@
+"""Item-to-item neighbours from bookmark co-occurrence.
+
+``flask recommendations build-also-read`` counts, for every pair of books,
+the users who bookmarked both, normalizes the counts with cosine
+(``c / sqrt(n_a * n_b)``) or Jaccard (``c / (n_a + n_b - c)``) similarity
+and keeps the ``top_k`` best neighbours of each book. The result is written
+as a CSR matrix of ``.npy`` files: ``indptr`` delimits each book's slice of
+``indices`` (neighbour book ids) and ``scores``, and ``rows`` maps a book id
+straight to its row. Requests memory-map the files, so a lookup is one
+array index plus a slice of at most ``top_k`` entries and every worker
+process shares the same pages.
+
+Builds are stored under ``ALSO_READ_PATH`` with ``app.services.array_store``
+and running processes pick up a new one within ``ALSO_READ_RELOAD_INTERVAL``
+seconds.
+"""
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.models import Book, Bookmark
+from app.services.array_store import ArrayStoreCache, save_arrays
+
+# Similarity measures of two books bookmarked by c common users out of n_a, n_b
+SIMILARITY_MEASURES = ("cosine", "jaccard")
+
+# Pair keys counted before they are merged into the running totals
+_PAIR_BUFFER_SIZE = 5_000_000
+
+
+# Function to load the bookmarks as (user ids, book rows), most recent first
+def _bookmark_rows(book_ids):
+    user_ids = []
+    bookmarked = []
+    result = db.session.execute(
+        select(Bookmark.user_id, Bookmark.book_id)
+        .where(Bookmark.user_id.is_not(None), Bookmark.book_id.is_not(None))
+        .order_by(Bookmark.user_id, Bookmark.created_at.desc(), Bookmark.id.desc())
+        .execution_options(yield_per=50000)
+    )
+    for partition in result.partitions():
+        user_ids.append(np.array([row[0] for row in partition], dtype=np.int64))
+        bookmarked.append(np.array([row[1] for row in partition], dtype=np.int64))
+    if not user_ids or not len(book_ids):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    user_ids = np.concatenate(user_ids)
+    bookmarked = np.concatenate(bookmarked)
+    rows = np.minimum(np.searchsorted(book_ids, bookmarked), len(book_ids) - 1)
+    # Books added or deleted since the id list was read are skipped
+    found = book_ids[rows] == bookmarked
+    return user_ids[found], rows[found]
+
+
+# Function to add pair keys to the running (keys, counts) totals
+def _merge_pairs(totals, keys):
+    keys = np.concatenate([totals[0], *keys])
+    weights = np.concatenate(
+        [totals[1], np.ones(len(keys) - len(totals[0]), np.float64)]
+    )
+    merged, inverse = np.unique(keys, return_inverse=True)
+    return merged, np.bincount(inverse, weights=weights, minlength=len(merged))
+
+
+# Function to count the users who bookmarked each pair of books
+def _co_occurrences(user_ids, rows, n_books, max_user_books):
+    """
+    Returns (first rows, second rows, counts) of every pair with first < second.
+    """
+    totals = (np.empty(0, np.int64), np.empty(0, np.float64))
+    pending = []
+    pending_size = 0
+    starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+    ends = np.r_[starts[1:], len(user_ids)]
+    for start, end in zip(starts, ends):
+        # Only the latest bookmarks of very active users are paired
+        user_rows = np.sort(rows[start : min(end, start + max_user_books)])
+        if len(user_rows) < 2:
+            continue
+        first, second = np.triu_indices(len(user_rows), 1)
+        pending.append(user_rows[first] * n_books + user_rows[second])
+        pending_size += len(first)
+        if pending_size >= _PAIR_BUFFER_SIZE:
+            totals = _merge_pairs(totals, pending)
+            pending, pending_size = [], 0
+    if pending:
+        totals = _merge_pairs(totals, pending)
+    keys, counts = totals
+    return keys // n_books, keys % n_books, counts
+
+
+# Function to keep the top_k best scored neighbours of every row as CSR arrays
+def _top_k_csr(sources, targets, scores, target_ids, n_books, top_k):
+    order = np.lexsort((target_ids, -scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    row_starts = np.searchsorted(sources, np.arange(n_books))
+    rank = np.arange(len(sources)) - row_starts[sources]
+    keep = rank < top_k
+    sources, targets, scores = sources[keep], targets[keep], scores[keep]
+    indptr = np.zeros(n_books + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_books), out=indptr[1:])
+    return indptr, targets, scores
+
+
+# Function to compute the neighbour matrix of every bookmarked book
+def compute_also_read(top_k=50, measure="cosine", max_user_books=500):
+    """
+    Returns a dict of the CSR arrays written by build_also_read.
+    """
+    if measure not in SIMILARITY_MEASURES:
+        raise ValueError(f"Unknown similarity measure: {measure}")
+    book_ids = np.array(
+        db.session.scalars(select(Book.id).order_by(Book.id)).all(), dtype=np.int64
+    )
+    n_books = len(book_ids)
+    user_ids, rows = _bookmark_rows(book_ids)
+    first, second, counts = _co_occurrences(
+        user_ids, rows, max(n_books, 1), max_user_books
+    )
+
+    degrees = np.bincount(rows, minlength=n_books).astype(np.float64)
+    if measure == "cosine":
+        similarity = counts / np.sqrt(degrees[first] * degrees[second])
+    else:
+        similarity = counts / (degrees[first] + degrees[second] - counts)
+
+    # Both directions of every pair compete for each book's top_k
+    sources = np.concatenate([first, second])
+    targets = np.concatenate([second, first])
+    similarity = np.concatenate([similarity, similarity])
+    indptr, targets, similarity = _top_k_csr(
+        sources, targets, similarity, book_ids[targets], n_books, top_k
+    )
+
+    lookup = np.full(int(book_ids[-1]) + 1 if n_books else 0, -1, dtype=np.int32)
+    lookup[book_ids] = np.arange(n_books, dtype=np.int32)
+    return dict(
+        book_ids=book_ids,
+        rows=lookup,
+        indptr=indptr,
+        indices=book_ids[targets],
+        scores=similarity.astype(np.float32),
+    )
+
+
+# Function to build the neighbour matrix and make it the current one
+def build_also_read(path, top_k=50, measure="cosine", max_user_books=500):
+    """
+    Returns (books with neighbours, neighbour entries stored).
+    """
+    arrays = compute_also_read(
+        top_k=top_k, measure=measure, max_user_books=max_user_books
+    )
+    save_arrays(path, arrays)
+    with_neighbours = int(np.count_nonzero(np.diff(arrays["indptr"])))
+    return with_neighbours, len(arrays["indices"])
+
+
+class AlsoReadIndex:
+    """
+    Memory-mapped CSR matrix of the neighbours of every book
+    """
+
+    def __init__(self, version, arrays):
+        self.version = version
+        self.book_ids = arrays["book_ids"]
+        self.rows = arrays["rows"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.scores = arrays["scores"]
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def neighbours(self, book_id, limit=None):
+        """
+        Returns (neighbour ids, scores) of a book, most similar first.
+        """
+        if book_id < 0 or book_id >= len(self.rows) or self.rows[book_id] < 0:
+            return self.indices[:0], self.scores[:0]
+        row = self.rows[book_id]
+        start, end = self.indptr[row], self.indptr[row + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.indices[start:end], self.scores[start:end]
+
+
+also_read_cache = ArrayStoreCache(AlsoReadIndex, "Also-read index")
+
+
+# Function to get the current neighbour index, or None before the first build
+def also_read_index():
+    config = current_app.config
+    return also_read_cache.get(
+        config["ALSO_READ_PATH"], config.get("ALSO_READ_RELOAD_INTERVAL", 30)
+    )
+
+
+# Function to list the ids of the books most often bookmarked with a book
+def also_read_ids(book_id):
+    index = also_read_index()
+    if index is None:
+        return []
+    neighbour_ids, _ = index.neighbours(book_id)
+    return neighbour_ids.tolist()
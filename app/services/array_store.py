@@ -0,0 +1,116 @@
+"""Versioned directories of memory-mapped NumPy arrays.
+
+Batch jobs write each build as ``.npy`` files in a new directory under the
+store path and then switch the ``CURRENT`` file to it atomically. Readers
+memory-map the arrays read-only, so every worker process shares the same
+pages, and look for a newer build at most once per reload interval.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Name of the file holding the directory of the current build
+CURRENT_FILE = "CURRENT"
+
+
+# Function to read which build directory is current
+def current_version(path):
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# Function to write a build and make it the current one
+def save_arrays(path, arrays):
+    """
+    Returns the version of the new build.
+    """
+    os.makedirs(path, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d%H%M%S-"), dir=path)
+    version = os.path.basename(directory)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    pointer = os.path.join(path, CURRENT_FILE)
+    previous = current_version(path)
+    with open(f"{pointer}.tmp", "w") as file:
+        file.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    # Keep the previous build for processes that have not switched yet
+    for entry in os.listdir(path):
+        entry_path = os.path.join(path, entry)
+        if entry not in (version, previous) and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+    return version
+
+
+# Function to memory-map the arrays of a build, the current one by default
+def load_arrays(path, version=None):
+    """
+    Returns a dict of read-only arrays, or None when nothing was built yet.
+    """
+    version = version or current_version(path)
+    if version is None:
+        return None
+    directory = os.path.join(path, version)
+    return {
+        entry[: -len(".npy")]: np.load(os.path.join(directory, entry), mmap_mode="r")
+        for entry in os.listdir(directory)
+        if entry.endswith(".npy")
+    }
+
+
+class ArrayStoreCache:
+    """
+    Holds the index loaded from the current build and switches to new builds
+    """
+
+    def __init__(self, factory, name):
+        # factory(version, arrays) returns the index object
+        self._factory = factory
+        self._name = name
+        self._index = None
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _due(self, now, interval):
+        return self._checked_at is None or now - self._checked_at >= interval
+
+    def get(self, path, interval):
+        now = time.monotonic()
+        if not self._due(now, interval):
+            return self._index
+        with self._lock:
+            if not self._due(now, interval):
+                return self._index
+            self._checked_at = now
+            version = current_version(path)
+            if version != self._version:
+                try:
+                    arrays = load_arrays(path, version) if version else None
+                    self._index = (
+                        self._factory(version, arrays) if arrays is not None else None
+                    )
+                    self._version = version
+                    logger.info("%s %s loaded", self._name, version)
+                except (OSError, ValueError, KeyError):
+                    logger.exception("Loading %s %s failed", self._name, version)
+        return self._index
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._version = None
+            self._checked_at = None
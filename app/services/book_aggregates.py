@@ -0,0 +1,103 @@
+"""Reconciliation of the engagement aggregates stored on books and comments."""
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import (
+    Book,
+    Bookmark,
+    Comment,
+    CommentType,
+    CommentVote,
+    CommentVoteType,
+    Rating,
+)
+
+# Books checked per statement
+RECONCILE_BATCH_SIZE = 1000
+
+
+# Function to build the true value of every aggregate column for a book row
+def _aggregate_expressions(books):
+    def count(model, *conditions):
+        return (
+            select(func.count(model.id))
+            .where(model.book_id == books.c.id, *conditions)
+            .scalar_subquery()
+        )
+
+    return {
+        "rating_sum": select(func.coalesce(func.sum(Rating.rating), 0.0))
+        .where(Rating.book_id == books.c.id)
+        .scalar_subquery(),
+        "rating_count": count(Rating),
+        "review_count": count(Comment, Comment.type == CommentType.REVIEW),
+        "comment_count": count(Comment, Comment.type != CommentType.REVIEW),
+        "bookmark_count": count(Bookmark),
+    }
+
+
+# Function to rewrite drifted aggregate columns of a table in id batches
+def _reconcile(table, expressions, touched_column, batch_size):
+    last_id = 0
+    checked = 0
+    fixed = 0
+    while True:
+        row_ids = (
+            db.session.execute(
+                select(table.c.id)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not row_ids:
+            break
+
+        # Only rows that drifted are rewritten; the edit timestamp stays
+        drifted = or_(
+            *(table.c[name] != expression for name, expression in expressions.items())
+        )
+        result = db.session.execute(
+            update(table)
+            .where(table.c.id.in_(row_ids), drifted)
+            .values(**expressions, **{touched_column: table.c[touched_column]})
+        )
+        db.session.commit()
+        last_id = row_ids[-1]
+        checked += len(row_ids)
+        fixed += result.rowcount
+    return checked, fixed
+
+
+# Function to recompute drifted book aggregates in id batches
+def reconcile_book_aggregates(batch_size=RECONCILE_BATCH_SIZE):
+    books = Book.__table__
+    return _reconcile(books, _aggregate_expressions(books), "updated_at", batch_size)
+
+
+# Function to recompute drifted comment vote and reply counters in id batches
+def reconcile_comment_counters(batch_size=RECONCILE_BATCH_SIZE):
+    comments = Comment.__table__
+    replies = aliased(Comment)
+
+    def votes(vote_type):
+        return (
+            select(func.count(CommentVote.id))
+            .where(
+                CommentVote.comment_id == comments.c.id, CommentVote.vote == vote_type
+            )
+            .scalar_subquery()
+        )
+
+    expressions = {
+        "upvote_count": votes(CommentVoteType.UPVOTE),
+        "downvote_count": votes(CommentVoteType.DOWNVOTE),
+        "reply_count": select(func.count(replies.id))
+        .where(replies.parent_id == comments.c.id)
+        .scalar_subquery(),
+    }
+    return _reconcile(comments, expressions, "updated_at", batch_size)
@@ -0,0 +1,96 @@
+"""Batched backfill of resources.mime_type and books.cover_image_url."""
+
+from sqlalchemy import bindparam, func, select, update
+
+from app import db
+from app.models import Book, Resource
+from app.models.resources import IMAGE_MIME_TYPES, normalize_mime_type
+
+# Rows read and written per statement
+BACKFILL_BATCH_SIZE = 1000
+
+
+# Function to fill resources.mime_type from type_name in id batches
+def backfill_mime_types(batch_size=BACKFILL_BATCH_SIZE):
+    resources = Resource.__table__
+    statement = (
+        update(resources).where(resources.c.id == bindparam("resource_id"))
+        # Leave the modification timestamp alone
+        .values(mime_type=bindparam("new_mime_type"), modified=resources.c.modified)
+    )
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(resources.c.id, resources.c.type_name)
+            .where(resources.c.id > last_id)
+            .order_by(resources.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(
+            statement,
+            [
+                {"resource_id": row_id, "new_mime_type": normalize_mime_type(type_name)}
+                for row_id, type_name in rows
+            ],
+        )
+        db.session.commit()
+        last_id = rows[-1].id
+        total += len(rows)
+    return total
+
+
+# Function to fill books.cover_image_url from the first image resource in id batches
+def backfill_cover_images(batch_size=BACKFILL_BATCH_SIZE):
+    books = Book.__table__
+    statement = (
+        update(books).where(books.c.id == bindparam("book_id"))
+        # Leave updated_at alone; the book itself did not change
+        .values(cover_image_url=bindparam("url"), updated_at=books.c.updated_at)
+    )
+    last_id = 0
+    total = 0
+    while True:
+        book_ids = (
+            db.session.execute(
+                select(books.c.id)
+                .where(books.c.id > last_id)
+                .order_by(books.c.id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not book_ids:
+            break
+
+        # Pick the first image resource of each book in the batch
+        ranked = (
+            select(
+                Resource.book_id,
+                Resource.url,
+                func.row_number()
+                .over(partition_by=Resource.book_id, order_by=Resource.id)
+                .label("position"),
+            )
+            .where(
+                Resource.book_id.in_(book_ids),
+                Resource.mime_type.in_(IMAGE_MIME_TYPES),
+            )
+            .subquery()
+        )
+        urls = dict(
+            db.session.execute(
+                select(ranked.c.book_id, ranked.c.url).where(ranked.c.position == 1)
+            ).all()
+        )
+        db.session.execute(
+            statement,
+            [{"book_id": book_id, "url": urls.get(book_id)} for book_id in book_ids],
+        )
+        db.session.commit()
+        last_id = book_ids[-1]
+        total += len(book_ids)
+    return total
@@ -0,0 +1,218 @@
+"""Database connection pool settings and telemetry.
+
+Builds ``SQLALCHEMY_ENGINE_OPTIONS`` from the ``DB_*`` settings so the pool
+matches the number of waitress threads, and swaps in a QueuePool that
+records how long checkouts wait, how many connections are in use and when
+the pool has to open overflow connections. The numbers are exposed on
+``GET /api/v1/monitoring/db-pool`` to size nodes from real traffic.
+
+On PostgreSQL the transactions of HTTP requests run with
+``DB_STATEMENT_TIMEOUT_MS`` as their ``statement_timeout``. Migrations, CLI
+batch jobs and background workers use the same engine without it.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (milliseconds) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolTelemetry:
+    """
+    Thread-safe counters for one connection pool
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.peak_in_use = 0
+            self.overflow_events = 0
+            self.timeouts = 0
+
+    def record_checkout(self, waited, in_use):
+        bucket = bisect_left(WAIT_BUCKETS_MS, waited * 1000)
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.wait_histogram[bucket] += 1
+            self.peak_in_use = max(self.peak_in_use, in_use)
+
+    def record_overflow(self):
+        with self._lock:
+            self.overflow_events += 1
+
+    def record_timeout(self, waited):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in WAIT_BUCKETS_MS]
+            labels.append(f">{WAIT_BUCKETS_MS[-1]}ms")
+            return dict(
+                since=self.started_at,
+                checkouts=self.checkouts,
+                wait_avg_ms=(
+                    round(self.wait_total / self.checkouts * 1000, 3)
+                    if self.checkouts
+                    else 0.0
+                ),
+                wait_max_ms=round(self.wait_max * 1000, 3),
+                wait_histogram=dict(zip(labels, self.wait_histogram)),
+                peak_in_use=self.peak_in_use,
+                overflow_events=self.overflow_events,
+                timeouts=self.timeouts,
+            )
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that reports checkout waits and overflow use to PoolTelemetry
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+        self._checkout_depth = threading.local()
+
+    def recreate(self):
+        # Keep the counters when the pool is replaced after a disconnect
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+    def _inc_overflow(self):
+        opened = super()._inc_overflow()
+        # _overflow counts up from -pool_size; above zero the pool is past its size
+        if opened and self._overflow > 0:
+            self.telemetry.record_overflow()
+        return opened
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself when it loses a race for
+        # a slot; only the outermost call of a checkout is measured
+        if getattr(self._checkout_depth, "active", False):
+            return super()._do_get()
+        self._checkout_depth.active = True
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            waited = time.perf_counter() - started
+            self.telemetry.record_timeout(waited)
+            logger.warning(
+                "Connection pool exhausted after %.2fs (size %d, overflow %d)",
+                waited,
+                self.size(),
+                self.overflow(),
+            )
+            raise
+        finally:
+            self._checkout_depth.active = False
+        self.telemetry.record_checkout(time.perf_counter() - started, self.checkedout())
+        return record
+
+
+# Function to build the engine options for a database URI from the DB_* settings
+def engine_options(config, uri):
+    url = make_url(uri)
+    # In-memory SQLite is pinned to a single StaticPool connection
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    threads = config.get("WAITRESS_THREADS", 4)
+    pool_size = config.get("DB_POOL_SIZE") or threads
+    max_overflow = config.get("DB_MAX_OVERFLOW")
+    if max_overflow is None:
+        max_overflow = max(2, threads // 4)
+
+    options = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config.get("DB_POOL_TIMEOUT", 10),
+        pool_recycle=config.get("DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=config.get("DB_POOL_PRE_PING", True),
+    )
+    if url.get_backend_name() == "postgresql":
+        connect_args = {}
+        if config.get("DB_APPLICATION_NAME"):
+            connect_args["application_name"] = config["DB_APPLICATION_NAME"]
+        options["connect_args"] = connect_args
+    return options
+
+
+# Function to fill SQLALCHEMY_ENGINE_OPTIONS before the engine is created
+def configure_engine_options(app):
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri:
+        return
+    # Options set explicitly in the config win over the derived ones
+    options = engine_options(app.config, uri)
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def _after_begin(session, transaction, connection):
+    # Only requests are limited; SET LOCAL ends with the transaction
+    if not has_request_context() or connection.dialect.name != "postgresql":
+        return
+    timeout = current_app.config.get("DB_STATEMENT_TIMEOUT_MS")
+    if timeout:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+# Function to apply the statement timeout to the transactions of requests
+def init_statement_timeout(app):
+    if not event.contains(Session, "after_begin", _after_begin):
+        event.listen(Session, "after_begin", _after_begin)
+
+
+# Function to report the state and telemetry of every engine's pool
+def pool_status(engines):
+    status = {}
+    for name, engine in engines.items():
+        pool = engine.pool
+        entry = dict(pool=type(pool).__name__)
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        telemetry = getattr(pool, "telemetry", None)
+        if telemetry is not None:
+            entry["telemetry"] = telemetry.snapshot()
+        status[name or "default"] = entry
+    return status
+
+
+# Function to restart the telemetry window of every engine's pool
+def reset_pool_telemetry(engines):
+    for engine in engines.values():
+        telemetry = getattr(engine.pool, "telemetry", None)
+        if telemetry is not None:
+            telemetry.reset()
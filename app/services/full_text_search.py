@@ -0,0 +1,288 @@
+"""Full-text search over books.
+
+PostgreSQL keeps a weighted tsvector in ``books.search_vector`` (GIN indexed),
+SQLite keeps an FTS5 shadow table ``books_fts``. Both are refreshed from a
+session ``after_flush`` hook whenever a book or one of the names it is
+searchable by changes.
+"""
+
+import re
+
+from sqlalchemy import (
+    event,
+    func,
+    inspect,
+    literal,
+    literal_column,
+    select,
+    table,
+    column,
+    update,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Agent, Book, Bookshelf, Subject
+from app.models.agents import book_agents_association
+from app.models.bookshelves import book_bookshelves_association
+from app.models.subjects import book_subjects_association
+
+# Text search configuration used to stem documents and queries
+TEXT_SEARCH_CONFIG = "english"
+
+# Weight of each part of the document; A ranks highest, D lowest
+DOCUMENT_WEIGHTS = {
+    "title": "A",
+    "agents": "B",
+    "subjects": "C",
+    "bookshelves": "C",
+    "description": "D",
+}
+
+# Parts of the document each `criteria` option searches
+CRITERIA_FIELDS = {
+    "title": ("title",),
+    "author": ("agents",),
+    "subject": ("subjects",),
+    "shelf": ("bookshelves",),
+    "all": ("title", "agents", "subjects", "bookshelves", "description"),
+}
+
+# Book attributes that feed the document
+BOOK_DOCUMENT_ATTRIBUTES = ("title", "description", "agents", "subjects", "bookshelves")
+
+# FTS5 shadow table used on SQLite (see app.models.books); rowid is the book id
+FTS5_COLUMNS = ("title", "agents", "subjects", "bookshelves", "description")
+books_fts = table("books_fts", column("rowid"), *(column(c) for c in FTS5_COLUMNS))
+
+# bm25 column weights matching the tsvector weight classes
+FTS5_RANK_WEIGHTS = {"A": 10.0, "B": 4.0, "C": 2.0, "D": 1.0}
+
+# Number of books refreshed per statement by reindex_books
+REINDEX_BATCH_SIZE = 500
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+# Function to split a user query into searchable tokens
+def _tokenize(q):
+    return _TOKEN_RE.findall((q or "").lower())
+
+
+# Function to build a correlated subquery joining the names linked to a book
+def _linked_names(model, association, key, dialect_name):
+    names = model.name
+    if dialect_name == "postgresql":
+        aggregate = func.string_agg(names, " ")
+    else:
+        aggregate = func.group_concat(names, " ")
+    return (
+        select(aggregate)
+        .select_from(association.join(model, association.c[key] == model.id))
+        .where(association.c.book_id == Book.__table__.c.id)
+        .scalar_subquery()
+    )
+
+
+# Function to build the expressions for each part of the document
+def _document_parts(dialect_name):
+    books = Book.__table__
+    return {
+        "title": books.c.title,
+        "agents": _linked_names(
+            Agent, book_agents_association, "agent_id", dialect_name
+        ),
+        "subjects": _linked_names(
+            Subject, book_subjects_association, "subject_id", dialect_name
+        ),
+        "bookshelves": _linked_names(
+            Bookshelf, book_bookshelves_association, "bookshelf_id", dialect_name
+        ),
+        "description": books.c.description,
+    }
+
+
+# Function to build the weighted tsvector expression for a book row
+def _search_vector_expression():
+    config = literal(TEXT_SEARCH_CONFIG, type_=REGCONFIG)
+    vector = None
+    for name, expression in _document_parts("postgresql").items():
+        part = func.setweight(
+            func.to_tsvector(config, func.coalesce(expression, "")),
+            DOCUMENT_WEIGHTS[name],
+        )
+        vector = part if vector is None else vector.op("||")(part)
+    return vector
+
+
+# Function to rebuild the search document of the given books
+def refresh_book_documents(connection, book_ids):
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    books = Book.__table__
+    dialect_name = connection.dialect.name
+
+    if dialect_name == "postgresql":
+        # Keep updated_at untouched; only the derived column changes
+        statement = (
+            update(books)
+            .where(books.c.id.in_(book_ids))
+            .values(
+                search_vector=_search_vector_expression(),
+                updated_at=books.c.updated_at,
+            )
+        )
+        connection.execute(statement)
+    elif dialect_name == "sqlite":
+        connection.execute(books_fts.delete().where(books_fts.c.rowid.in_(book_ids)))
+        parts = _document_parts(dialect_name)
+        connection.execute(
+            books_fts.insert().from_select(
+                ["rowid", *FTS5_COLUMNS],
+                select(books.c.id, *(parts[c] for c in FTS5_COLUMNS)).where(
+                    books.c.id.in_(book_ids)
+                ),
+            )
+        )
+
+
+# Function to drop deleted books from the SQLite shadow table
+def _remove_book_documents(connection, book_ids):
+    if book_ids and connection.dialect.name == "sqlite":
+        connection.execute(books_fts.delete().where(books_fts.c.rowid.in_(book_ids)))
+
+
+# Function to rebuild the search documents of every book in batches
+def reindex_books(batch_size=REINDEX_BATCH_SIZE):
+    books = Book.__table__
+    last_id = 0
+    total = 0
+    while True:
+        book_ids = (
+            db.session.execute(
+                select(books.c.id)
+                .where(books.c.id > last_id)
+                .order_by(books.c.id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not book_ids:
+            break
+        refresh_book_documents(db.session.connection(), book_ids)
+        db.session.commit()
+        last_id = book_ids[-1]
+        total += len(book_ids)
+    return total
+
+
+# Function to tell whether any of the given attributes changed in this flush
+def _attributes_changed(obj, names):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+# Function to collect the books whose search document is stale after a flush
+def _stale_book_ids(session):
+    stale_ids, deleted_ids = set(), set()
+    renamed = {Agent: set(), Subject: set(), Bookshelf: set()}
+
+    for obj in session.new:
+        if isinstance(obj, Book):
+            stale_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Book):
+            if _attributes_changed(obj, BOOK_DOCUMENT_ATTRIBUTES):
+                stale_ids.add(obj.id)
+        elif type(obj) in renamed and _attributes_changed(obj, ("name",)):
+            renamed[type(obj)].add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            deleted_ids.add(obj.id)
+
+    # A renamed agent, subject or shelf changes the document of its books
+    links = (
+        (Agent, book_agents_association, "agent_id"),
+        (Subject, book_subjects_association, "subject_id"),
+        (Bookshelf, book_bookshelves_association, "bookshelf_id"),
+    )
+    for model, association, key in links:
+        if renamed[model]:
+            linked = select(association.c.book_id).where(
+                association.c[key].in_(renamed[model])
+            )
+            stale_ids.update(session.connection().execute(linked).scalars())
+    return stale_ids - deleted_ids, deleted_ids
+
+
+def _after_flush(session, flush_context):
+    stale_ids, deleted_ids = _stale_book_ids(session)
+    if stale_ids or deleted_ids:
+        connection = session.connection()
+        _remove_book_documents(connection, deleted_ids)
+        refresh_book_documents(connection, stale_ids)
+
+
+# Function to build the FTS5 MATCH expression for a query
+def _fts5_match(tokens, fields):
+    terms = " AND ".join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(fields)}}} : ({terms})"
+
+
+# Function to build the tsquery text for a query, restricted to weights
+def _tsquery_text(tokens, fields):
+    weights = "".join(sorted({DOCUMENT_WEIGHTS[field] for field in fields}))
+    return " & ".join(f"{token}:*{weights}" for token in tokens)
+
+
+# Function to filter a Book query by full-text search and rank it by relevance
+def search_books(query, q, criteria="title", rank=True):
+    tokens = _tokenize(q)
+    if not tokens:
+        return query
+    fields = CRITERIA_FIELDS.get(criteria or "title", CRITERIA_FIELDS["title"])
+    dialect_name = query.session.get_bind().dialect.name
+
+    if dialect_name == "postgresql":
+        tsquery = func.to_tsquery(
+            literal(TEXT_SEARCH_CONFIG, type_=REGCONFIG), _tsquery_text(tokens, fields)
+        )
+        query = query.filter(Book.search_vector.op("@@")(tsquery))
+        if rank:
+            # The id keeps books with equal ranks in the same order on every page
+            query = query.order_by(
+                func.ts_rank_cd(Book.search_vector, tsquery).desc(), Book.id
+            )
+        return query
+
+    if dialect_name == "sqlite":
+        fts = literal_column("books_fts")
+        # bm25 scores are negative; the best match has the lowest score
+        matches = (
+            select(
+                books_fts.c.rowid.label("book_id"),
+                func.bm25(
+                    fts, *(FTS5_RANK_WEIGHTS[DOCUMENT_WEIGHTS[c]] for c in FTS5_COLUMNS)
+                ).label("rank"),
+            )
+            .where(fts.op("MATCH")(_fts5_match(tokens, fields)))
+            .subquery()
+        )
+        query = query.join(matches, matches.c.book_id == Book.id)
+        if rank:
+            query = query.order_by(matches.c.rank.asc(), Book.id)
+        return query
+
+    # Other backends fall back to substring matching on the title
+    for token in tokens:
+        query = query.filter(Book.title.ilike(f"%{token}%"))
+    return query
+
+
+# Function to keep the search documents in sync with the session
+def init_full_text_search(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
@@ -0,0 +1,103 @@
+"""Cache of user identities resolved from token subjects.
+
+Authenticated requests usually only need the numeric id (and sometimes the
+admin / confirmed flags) of the user behind ``current_token``. Lookups go
+through a request-scoped map first, then a small per-process LRU whose
+entries live for ``USER_IDENTITY_CACHE_TTL`` seconds, and only then the
+database. Entries are dropped as soon as the user row changes in this
+process; other processes see the change once the TTL runs out.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import User
+
+# Lightweight view of a user row, enough for ownership and permission checks
+UserIdentity = namedtuple(
+    "UserIdentity", ["id", "public_id", "is_admin", "is_email_confirmed"]
+)
+
+_identities = OrderedDict()
+_identities_lock = threading.Lock()
+
+# Session.info key holding public ids to invalidate again after commit
+_PENDING_KEY = "identity_cache_pending"
+
+
+# Function to drop a user from the per-process and request-scoped caches
+def invalidate_identity(public_id):
+    with _identities_lock:
+        _identities.pop(public_id, None)
+    if has_app_context():
+        g.get("user_identities", {}).pop(public_id, None)
+
+
+# Function to resolve a public id to a UserIdentity, or None if there is none
+def find_identity(public_id):
+    if not public_id:
+        return None
+    request_identities = g.setdefault("user_identities", {})
+    identity = request_identities.get(public_id)
+    if identity is not None:
+        return identity
+
+    now = time.monotonic()
+    with _identities_lock:
+        entry = _identities.get(public_id)
+        if entry and entry[1] > now:
+            _identities.move_to_end(public_id)
+            request_identities[public_id] = entry[0]
+            return entry[0]
+
+    row = db.session.execute(
+        select(User.id, User.public_id, User.is_admin, User.is_email_confirmed).where(
+            User.public_id == public_id
+        )
+    ).first()
+    if row is None:
+        return None
+    identity = UserIdentity(*row)
+
+    ttl = current_app.config.get("USER_IDENTITY_CACHE_TTL", 30)
+    max_entries = current_app.config.get("USER_IDENTITY_CACHE_SIZE", 4096)
+    with _identities_lock:
+        _identities[public_id] = (identity, now + ttl)
+        _identities.move_to_end(public_id)
+        while len(_identities) > max_entries:
+            _identities.popitem(last=False)
+    request_identities[public_id] = identity
+    return identity
+
+
+def _on_user_change(mapper, connection, target):
+    # Drop the entry right away, and again once the change is visible to others
+    invalidate_identity(target.public_id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.public_id)
+
+
+def _after_commit(session):
+    for public_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_identity(public_id)
+
+
+def _after_rollback(session, previous_transaction):
+    for public_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_identity(public_id)
+
+
+# Function to keep cached identities in step with user updates
+def init_identity_cache(app):
+    if not event.contains(User, "after_update", _on_user_change):
+        event.listen(User, "after_update", _on_user_change)
+        event.listen(User, "after_delete", _on_user_change)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,335 @@
+"""In-process inverted index over catalog names.
+
+Keeps one index per entity (book titles, agent, subject and public
+bookshelf names) so list endpoints can resolve ``q`` without a database
+round trip and only hydrate the requested page of ids.
+
+Enabled with ``SEARCH_BACKEND = "memory"``. The index is built in a
+background thread at startup; until it is ready callers fall back to the
+database. Changes are picked up from mapper events and applied once the
+transaction that made them commits.
+"""
+
+import logging
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import merge
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.models import Agent, Book, Bookshelf, Subject
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Rows fetched per round trip while building the index
+BUILD_BATCH_SIZE = 1000
+
+# Session.info key holding index changes waiting for commit
+_PENDING_KEY = "inverted_index_pending"
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+# Function to split text into index terms
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+# Function to intersect two sorted posting lists
+def intersect_postings(left, right):
+    if len(left) > len(right):
+        left, right = right, left
+    result = array("i")
+    lo = 0
+    for doc_id in left:
+        # Gallop through the longer list instead of walking it
+        lo = bisect_left(right, doc_id, lo)
+        if lo == len(right):
+            break
+        if right[lo] == doc_id:
+            result.append(doc_id)
+    return result
+
+
+# Function to merge several sorted posting lists into one without duplicates
+def union_postings(postings):
+    result = array("i")
+    for doc_id in merge(*postings):
+        if not result or result[-1] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+class InvertedIndex:
+    """
+    Inverted index with sorted array('i') posting lists and BM25 ranking
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._frequencies = {}
+        self._documents = {}
+        self._lengths = {}
+        self._total_length = 0
+        self._sorted_terms = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        if not counts:
+            return
+        for term, count in counts.items():
+            postings = self._postings.setdefault(term, array("i"))
+            frequencies = self._frequencies.setdefault(term, array("i"))
+            position = bisect_left(postings, doc_id)
+            postings.insert(position, doc_id)
+            frequencies.insert(position, count)
+        self._documents[doc_id] = counts
+        self._lengths[doc_id] = sum(counts.values())
+        self._total_length += self._lengths[doc_id]
+        self._sorted_terms = None
+
+    def remove(self, doc_id):
+        counts = self._documents.pop(doc_id, None)
+        if counts is None:
+            return
+        for term in counts:
+            postings = self._postings[term]
+            position = bisect_left(postings, doc_id)
+            del postings[position]
+            del self._frequencies[term][position]
+            if not postings:
+                del self._postings[term]
+                del self._frequencies[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        self._sorted_terms = None
+
+    def _expand_prefix(self, prefix):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = []
+        position = bisect_left(self._sorted_terms, prefix)
+        while position < len(self._sorted_terms):
+            term = self._sorted_terms[position]
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+            position += 1
+        return terms
+
+    def _bm25(self, term, doc_ids, scores, average_length):
+        postings = self._postings[term]
+        frequencies = self._frequencies[term]
+        document_count = len(self._documents)
+        idf = math.log(
+            1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5)
+        )
+        lo = 0
+        for doc_id in doc_ids:
+            lo = bisect_left(postings, doc_id, lo)
+            if lo == len(postings) or postings[lo] != doc_id:
+                continue
+            frequency = frequencies[lo]
+            length = self._lengths[doc_id]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    def search(self, q):
+        """
+        Returns the ids of documents containing every word of q, best first.
+        The last word also matches as a prefix.
+        """
+        tokens = tokenize(q)
+        if not tokens or not self._documents:
+            return []
+
+        # Every word must match; the one being typed matches any completion
+        groups = [[token] for token in tokens[:-1]]
+        groups.append(self._expand_prefix(tokens[-1]))
+        candidates = None
+        for terms in groups:
+            postings = [self._postings[t] for t in terms if t in self._postings]
+            if not postings:
+                return []
+            matches = postings[0] if len(postings) == 1 else union_postings(postings)
+            candidates = (
+                matches
+                if candidates is None
+                else intersect_postings(candidates, matches)
+            )
+            if not candidates:
+                return []
+
+        scores = dict.fromkeys(candidates, 0.0)
+        average_length = self._total_length / len(self._documents)
+        for term in {term for terms in groups for term in terms}:
+            if term in self._postings:
+                self._bm25(term, candidates, scores, average_length)
+        return sorted(candidates, key=lambda doc_id: (-scores[doc_id], doc_id))
+
+
+# Entities kept in the index: model, indexed attribute, optional SQL filter
+# and matching Python predicate for rows that should be searchable
+INDEXED_ENTITIES = {
+    "books": (Book, "title", None, None),
+    "agents": (Agent, "name", None, None),
+    "subjects": (Subject, "name", None, None),
+    "bookshelves": (
+        Bookshelf,
+        "name",
+        lambda: Bookshelf.is_public == True,
+        lambda bookshelf: bool(bookshelf.is_public),
+    ),
+}
+
+
+class CatalogIndex:
+    """
+    Thread-safe set of inverted indexes, one per catalog entity
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indexes = {}
+        self._ready = False
+        self._backlog = None
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def build(self):
+        """
+        Builds every index from a streaming scan, then swaps it in.
+        """
+        with self._lock:
+            # Changes committed while the scan runs are replayed afterwards
+            self._backlog = []
+
+        indexes = {}
+        for entity, (model, attribute, where, _) in INDEXED_ENTITIES.items():
+            index = InvertedIndex()
+            # Scanning in id order turns every posting insert into an append
+            statement = select(model.id, getattr(model, attribute)).order_by(model.id)
+            if where is not None:
+                statement = statement.where(where())
+            rows = db.session.execute(
+                statement.execution_options(yield_per=BUILD_BATCH_SIZE)
+            )
+            for doc_id, text in rows:
+                index.add(doc_id, text)
+            indexes[entity] = index
+        db.session.remove()
+
+        with self._lock:
+            self._indexes = indexes
+            for changes in self._backlog:
+                self._apply(changes)
+            self._backlog = None
+            self._ready = True
+        logger.info(
+            "Inverted index built: %s",
+            ", ".join(f"{name}={len(index)}" for name, index in indexes.items()),
+        )
+
+    def search(self, entity, q):
+        """
+        Returns ranked ids for q, or None while the index is not ready.
+        """
+        with self._lock:
+            if not self._ready:
+                return None
+            return self._indexes[entity].search(q)
+
+    def apply(self, changes):
+        with self._lock:
+            if self._backlog is not None:
+                self._backlog.append(changes)
+            if self._ready:
+                self._apply(changes)
+
+    def _apply(self, changes):
+        for entity, doc_id, text in changes:
+            index = self._indexes[entity]
+            if text is None:
+                index.remove(doc_id)
+            else:
+                index.add(doc_id, text)
+
+
+catalog_index = CatalogIndex()
+
+
+# Function to queue an index change until the session commits
+def _queue_change(target, entity, deleted=False):
+    session = object_session(target)
+    if session is None:
+        return
+    _, attribute, _, include = INDEXED_ENTITIES[entity]
+    if deleted or (include is not None and not include(target)):
+        text = None
+    else:
+        text = getattr(target, attribute)
+    session.info.setdefault(_PENDING_KEY, []).append((entity, target.id, text))
+
+
+def _listen_for_changes(entity, model):
+    def on_write(mapper, connection, target):
+        _queue_change(target, entity)
+
+    def on_delete(mapper, connection, target):
+        _queue_change(target, entity, deleted=True)
+
+    event.listen(model, "after_insert", on_write)
+    event.listen(model, "after_update", on_write)
+    event.listen(model, "after_delete", on_delete)
+
+
+def _after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        catalog_index.apply(changes)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# Function to build the index in the background and keep it current
+def init_inverted_index(app):
+    if app.config.get("SEARCH_BACKEND", "database") != "memory":
+        return
+    if not event.contains(Session, "after_commit", _after_commit):
+        for entity, (model, _, _, _) in INDEXED_ENTITIES.items():
+            _listen_for_changes(entity, model)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
+
+    def build():
+        with app.app_context():
+            try:
+                catalog_index.build()
+            except Exception:
+                logger.exception("Building the inverted index failed")
+
+    threading.Thread(target=build, name="inverted-index-build", daemon=True).start()
+
+
+# Function to look up ranked ids for q, or None when the index can't answer
+def search_catalog(entity, q):
+    if not q:
+        return None
+    return catalog_index.search(entity, q)
@@ -0,0 +1,147 @@
+"""Login throughput versus catalog latency benchmark.
+
+Serves the app with waitress (``WAITRESS_THREADS`` threads) on a local port.
+For a fixed duration, ``logins`` clients post logins as fast as they can
+while ``readers`` clients read ``/api/v1/books/`` and record every response
+time. The run is done once with bcrypt on the request threads and once with
+the password hashing pool, on the same machine and database, so the two can
+be compared directly.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from app import db
+from app.models import User
+from app.utils.password_hashing import password_hasher
+
+# Account the benchmark logs in with; removed when it finishes
+BENCH_EMAIL = "bench-login@pico-library.invalid"
+BENCH_PASSWORD = "bench-login-password"
+
+
+# Function to get the value below which a fraction of the sorted values fall
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+# Function to send one request and return its status code
+def _request(url, data=None):
+    try:
+        with urlopen(Request(url, data=data), timeout=60) as response:
+            response.read()
+            return response.status
+    except HTTPError as error:
+        return error.code
+    except (URLError, OSError):
+        return None
+
+
+# Function to run logins and catalog reads against a server for a while
+def _run_round(base_url, duration, logins, readers):
+    stop = threading.Event()
+    lock = threading.Lock()
+    login_codes = Counter()
+    read_times = []
+    read_errors = Counter()
+    login_body = urlencode({"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+    def log_in():
+        while not stop.is_set():
+            status = _request(f"{base_url}/api/v1/auth/login", login_body.encode())
+            with lock:
+                login_codes[status] += 1
+
+    def read_books():
+        while not stop.is_set():
+            started = time.perf_counter()
+            status = _request(f"{base_url}/api/v1/books/?per_page=10")
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if status == 200:
+                    read_times.append(elapsed)
+                else:
+                    read_errors[status] += 1
+
+    clients = [threading.Thread(target=log_in) for _ in range(logins)]
+    clients += [threading.Thread(target=read_books) for _ in range(readers)]
+    for client in clients:
+        client.start()
+    time.sleep(duration)
+    stop.set()
+    for client in clients:
+        client.join()
+
+    read_times.sort()
+    return dict(
+        logins_per_second=login_codes[200] / duration,
+        logins_rejected=login_codes[503],
+        login_errors=sum(
+            count for code, count in login_codes.items() if code not in (200, 503)
+        ),
+        book_reads=len(read_times),
+        book_read_errors=sum(read_errors.values()),
+        book_p50_ms=_percentile(read_times, 0.5),
+        book_p95_ms=_percentile(read_times, 0.95),
+        book_max_ms=read_times[-1] if read_times else None,
+    )
+
+
+# Function to create the benchmark account with the configured hashing
+def _create_bench_user():
+    User.query.filter_by(email=BENCH_EMAIL).delete()
+    user = User(email=BENCH_EMAIL, password=BENCH_PASSWORD)
+    user.is_email_confirmed = True
+    db.session.add(user)
+    db.session.commit()
+
+
+# Function to compare logins with bcrypt on the request threads and in the pool
+def run_login_benchmark(app, duration=10, logins=16, readers=4, workers=None):
+    """
+    Returns {"inline": stats, "pool": stats}.
+    """
+    from waitress import create_server
+
+    configured_workers = app.config.get("PASSWORD_HASH_WORKERS")
+    pool_workers = workers or configured_workers or max(1, (os.cpu_count() or 2) // 2)
+    _create_bench_user()
+    results = {}
+    try:
+        for mode, mode_workers in (("inline", 0), ("pool", pool_workers)):
+            app.config["PASSWORD_HASH_WORKERS"] = mode_workers
+            password_hasher.shutdown()
+            server = create_server(
+                app,
+                host="127.0.0.1",
+                port=0,
+                threads=app.config.get("WAITRESS_THREADS", 4),
+            )
+            base_url = f"http://127.0.0.1:{server.effective_port}"
+            thread = threading.Thread(target=server.run, daemon=True)
+            thread.start()
+            try:
+                # Starts the pool processes before the clock runs
+                _request(
+                    f"{base_url}/api/v1/auth/login",
+                    urlencode({"email": BENCH_EMAIL, "password": "warm-up"}).encode(),
+                )
+                results[mode] = _run_round(base_url, duration, logins, readers)
+                results[mode]["hash_workers"] = mode_workers
+            finally:
+                # Let the request threads finish before the sockets close
+                server.task_dispatcher.shutdown()
+                server.close()
+    finally:
+        app.config["PASSWORD_HASH_WORKERS"] = configured_workers
+        password_hasher.shutdown()
+        User.query.filter_by(email=BENCH_EMAIL).delete()
+        db.session.commit()
+    return results
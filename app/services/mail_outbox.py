@@ -0,0 +1,287 @@
+"""Transactional email through a database outbox.
+
+Request handlers add emails to ``mail_outbox`` in their own transaction and
+return without talking to the mail server. ``MAIL_OUTBOX_WORKERS``
+background threads per process claim due rows with
+``FOR UPDATE SKIP LOCKED``, so any number of threads and processes share the
+outbox without sending an email twice, and send each claimed batch over a
+single SMTP connection from ``mail.connect()``. The threads start with the
+first request the app serves, so CLI commands such as ``flask db upgrade``
+and ``flask mail send-outbox`` run without them.
+
+A claim marks rows as sending for ``MAIL_OUTBOX_CLAIM_SECONDS``; rows of a
+worker that dies before recording the outcome become due again after that.
+Failed sends are retried with exponential backoff from
+``MAIL_OUTBOX_RETRY_DELAY`` up to ``MAIL_OUTBOX_RETRY_MAX_DELAY`` seconds and
+marked failed after ``MAIL_OUTBOX_MAX_ATTEMPTS`` attempts.
+"""
+
+import logging
+import smtplib
+import threading
+from datetime import timedelta
+
+from flask import current_app
+from flask_mail import BadHeaderError, Message
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from app import db, mail
+from app.models import MailStatus, OutboxEmail
+from app.utils.datetime_util import utc_now
+
+logger = logging.getLogger(__name__)
+
+# Session flag telling the workers to look at the outbox after the commit
+_QUEUED_KEY = "mail_outbox_queued"
+
+# Errors that concern one message; anything else means the connection is gone
+_MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+    BadHeaderError,
+    AssertionError,
+    ValueError,
+)
+
+
+# Function to get the current UTC time in the naive form the columns store
+def _utc_now_naive():
+    return utc_now().replace(tzinfo=None)
+
+
+# Function to add an email to the outbox; it is sent once the caller commits
+def enqueue_email(subject, recipients, body=None, html=None, sender=None):
+    email = OutboxEmail(
+        subject=subject,
+        sender=sender or current_app.config.get("MAIL_USERNAME"),
+        recipients=list(recipients),
+        body=body,
+        html=html,
+        status=MailStatus.PENDING,
+        attempts=0,
+        next_attempt_at=utc_now(),
+    )
+    db.session.add(email)
+    db.session.info[_QUEUED_KEY] = True
+    return email
+
+
+# Function to claim the due emails no other worker holds
+def claim_emails(batch_size, claim_seconds):
+    """
+    Returns the claimed emails as dicts, in the order they became due.
+    """
+    now = _utc_now_naive()
+    rows = db.session.scalars(
+        select(OutboxEmail)
+        .where(
+            OutboxEmail.status.in_((MailStatus.PENDING, MailStatus.SENDING)),
+            OutboxEmail.next_attempt_at <= now,
+        )
+        .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    claimed = []
+    for row in rows:
+        row.status = MailStatus.SENDING
+        row.attempts += 1
+        row.next_attempt_at = now + timedelta(seconds=claim_seconds)
+        claimed.append(
+            dict(
+                id=row.id,
+                subject=row.subject,
+                sender=row.sender,
+                recipients=row.recipients,
+                body=row.body,
+                html=row.html,
+                attempts=row.attempts,
+            )
+        )
+    # The row locks end here; the claim itself keeps other workers away
+    db.session.commit()
+    return claimed
+
+
+# Function to send emails over one SMTP connection
+def send_emails(emails):
+    """
+    Returns (ids of the emails sent, [(email, error) of the failed ones]).
+    """
+    sent_ids = []
+    failures = []
+    try:
+        with mail.connect() as connection:
+            for position, email in enumerate(emails):
+                try:
+                    connection.send(
+                        Message(
+                            email["subject"],
+                            recipients=email["recipients"],
+                            body=email["body"],
+                            html=email["html"],
+                            sender=email["sender"],
+                        )
+                    )
+                except _MESSAGE_ERRORS as error:
+                    failures.append((email, error))
+                else:
+                    sent_ids.append(email["id"])
+    except Exception as error:
+        # Connecting failed or the connection broke; the rest is retried
+        done = set(sent_ids) | {email["id"] for email, _ in failures}
+        failures.extend((email, error) for email in emails if email["id"] not in done)
+    return sent_ids, failures
+
+
+# Function to compute the delay before an email's next attempt
+def _retry_delay(attempts, config):
+    delay = config.get("MAIL_OUTBOX_RETRY_DELAY", 30) * 2 ** max(attempts - 1, 0)
+    return min(delay, config.get("MAIL_OUTBOX_RETRY_MAX_DELAY", 3600))
+
+
+# Function to store the outcome of a batch
+def _record_results(sent_ids, failures):
+    config = current_app.config
+    max_attempts = config.get("MAIL_OUTBOX_MAX_ATTEMPTS", 8)
+    now = _utc_now_naive()
+    if sent_ids:
+        db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(sent_ids))
+            .values(status=MailStatus.SENT, sent_at=now, last_error=None)
+        )
+    for email, error in failures:
+        given_up = email["attempts"] >= max_attempts
+        db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id == email["id"])
+            .values(
+                status=MailStatus.FAILED if given_up else MailStatus.PENDING,
+                next_attempt_at=now
+                + timedelta(seconds=_retry_delay(email["attempts"], config)),
+                last_error=f"{type(error).__name__}: {error}"[:1000],
+            )
+        )
+        logger.warning(
+            "Sending outbox email %s failed (attempt %s%s): %s",
+            email["id"],
+            email["attempts"],
+            ", giving up" if given_up else "",
+            error,
+        )
+    db.session.commit()
+
+
+# Function to claim, send and record one batch of due emails
+def process_outbox(batch_size=None):
+    """
+    Returns the number of emails claimed.
+    """
+    config = current_app.config
+    emails = claim_emails(
+        batch_size or config.get("MAIL_OUTBOX_BATCH_SIZE", 50),
+        config.get("MAIL_OUTBOX_CLAIM_SECONDS", 300),
+    )
+    if emails:
+        sent_ids, failures = send_emails(emails)
+        _record_results(sent_ids, failures)
+    return len(emails)
+
+
+# Function to count the outbox emails per status
+def outbox_status():
+    counts = dict(
+        db.session.execute(
+            select(OutboxEmail.status, func.count(OutboxEmail.id)).group_by(
+                OutboxEmail.status
+            )
+        ).all()
+    )
+    oldest_due = db.session.scalar(
+        select(func.min(OutboxEmail.next_attempt_at)).where(
+            OutboxEmail.status == MailStatus.PENDING
+        )
+    )
+    return dict(
+        counts={status.value: counts.get(status, 0) for status in MailStatus},
+        oldest_pending_due_at=oldest_due.isoformat() if oldest_due else None,
+        workers=mail_outbox_workers.alive,
+    )
+
+
+class MailOutboxWorkers:
+    """
+    Background threads draining the mail outbox
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self._app = None
+
+    @property
+    def alive(self):
+        with self._lock:
+            return sum(thread.is_alive() for thread in self._threads)
+
+    def start(self, app):
+        with self._lock:
+            self._app = app
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for number in range(
+                len(self._threads), app.config.get("MAIL_OUTBOX_WORKERS", 2)
+            ):
+                thread = threading.Thread(
+                    target=self._run, name=f"mail-outbox-{number + 1}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            with self._app.app_context():
+                try:
+                    claimed = process_outbox()
+                except Exception:
+                    logger.exception("Processing the mail outbox failed")
+                    claimed = 0
+                finally:
+                    db.session.remove()
+            if not claimed:
+                # New emails wake the workers up before the next poll
+                self._wake.wait(
+                    timeout=self._app.config.get("MAIL_OUTBOX_POLL_INTERVAL", 5)
+                )
+                self._wake.clear()
+
+
+mail_outbox_workers = MailOutboxWorkers()
+
+
+def _after_commit(session):
+    if session.info.pop(_QUEUED_KEY, False):
+        mail_outbox_workers.notify()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_QUEUED_KEY, None)
+
+
+# Function to wake the mail workers when emails are queued
+def init_mail_outbox(app):
+    if not event.contains(Session, "after_commit", _after_commit):
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
+
+
+# Function to start the mail workers of an app serving requests
+def start_mail_outbox_workers(app):
+    if app.config.get("MAIL_OUTBOX_WORKERS", 2):
+        mail_outbox_workers.start(app)
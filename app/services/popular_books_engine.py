@@ -1,24 +1,143 @@
-from app.services import (
-    calculate_score,
-    calculate_review_score,
-    calculate_popularity_score,
-)
-from app.models import Book
-from tqdm import tqdm
-
-# Function to preprocess popularity data for books
-def preprocess_popularity_data():
-    # Retrieve all books from the database
-    books = Book.query.all()
-    
-    # Iterate over each book
-    for i in tqdm(range(len(books))):
-        book = books[i]
-        
-        # Calculate the score for the book
-        score = calculate_score(None, book)  # Example score calculation
-        score += calculate_review_score(book)  # Incorporate review score
-        score += calculate_popularity_score(book)  # Incorporate popularity score
-        
-        # Set the calculated popularity score for the book
-        book.popularity_score = score
+"""Batch recomputation of ``books.popularity_score``.
+
+Scores every book with the same formula as the per-book helpers in
+``app.services`` (subject and bookshelf scores, average rating, vote-weighted
+review rating, normalized bookmarks and downloads), but reads the inputs
+with a few grouped aggregates per id batch and writes the changed scores
+back with one executemany UPDATE per batch.
+
+The formula runs in Python rather than in an ``UPDATE ... FROM``. SQLite and
+PostgreSQL both have ``ln()``, but SQL ``ROUND`` rounds halves away from zero
+while Python's ``round`` rounds them to even, so scores computed in SQL would
+drift from the per-book helpers. Scoring in Python also lets the batch skip
+books whose score did not change.
+"""
+
+from math import log1p
+
+from sqlalchemy import bindparam, func, select, update
+
+from app import db
+from app.models import Book, Bookmark, Bookshelf, Comment, CommentType, Subject
+from app.models.bookshelves import book_bookshelves_association
+from app.models.subjects import book_subjects_association
+
+# Books scored per batch
+POPULARITY_BATCH_SIZE = 5000
+
+
+# Function to sum a per-book aggregate over the books of an id range
+def _grouped(statement, book_id, first_id, last_id):
+    rows = db.session.execute(
+        statement.where(book_id.between(first_id, last_id)).group_by(book_id)
+    )
+    return {row[0]: row[1:] for row in rows}
+
+
+# Function to compute the popularity score of a book from its aggregates
+def popularity_score(
+    downloads,
+    bookmark_count,
+    average_rating,
+    subject_score,
+    bookshelf_score,
+    review_weighted,
+    review_votes,
+    max_reads,
+    max_downloads,
+):
+    score = (subject_score or 0) + (bookshelf_score or 0) + (average_rating or 0)
+    if review_votes:
+        score += review_weighted / review_votes
+    normalized_reads = log1p(max(bookmark_count or 0, 1)) / log1p(max_reads)
+    normalized_downloads = log1p(downloads or 0) / log1p(max_downloads)
+    score += ((5 * normalized_reads) + (5 * normalized_downloads)) * 10
+    return round(score)
+
+
+# Function to recompute the popularity score of every book in id batches
+def preprocess_popularity_data(batch_size=POPULARITY_BATCH_SIZE):
+    """
+    Returns (books scored, books whose score changed).
+    """
+    books = Book.__table__
+    max_reads = max(db.session.scalar(select(func.count(Bookmark.id))), 1)
+    max_downloads = max(
+        db.session.scalar(select(func.coalesce(func.max(Book.downloads), 0))), 1
+    )
+
+    subject_scores = select(
+        book_subjects_association.c.book_id,
+        func.sum(func.coalesce(Subject.score, 0)),
+    ).join(Subject, Subject.id == book_subjects_association.c.subject_id)
+    bookshelf_scores = select(
+        book_bookshelves_association.c.book_id,
+        func.sum(func.coalesce(Bookshelf.score, 0)),
+    ).join(Bookshelf, Bookshelf.id == book_bookshelves_association.c.bookshelf_id)
+    review_votes = select(
+        Comment.book_id,
+        func.sum(
+            func.coalesce(Comment.rating, 0)
+            * (Comment.upvote_count - Comment.downvote_count)
+        ),
+        func.sum(Comment.upvote_count + Comment.downvote_count),
+    ).where(Comment.type == CommentType.REVIEW)
+
+    # The edit timestamp is left alone: a new score is not an edit of the book
+    write_scores = (
+        update(books)
+        .where(books.c.id == bindparam("book_id"))
+        .values(popularity_score=bindparam("score"), updated_at=books.c.updated_at)
+    )
+
+    last_id = 0
+    scored = 0
+    changed = 0
+    while True:
+        rows = db.session.execute(
+            select(
+                Book.id,
+                Book.downloads,
+                Book.bookmark_count,
+                Book.average_rating,
+                Book.popularity_score,
+            )
+            .where(Book.id > last_id)
+            .order_by(Book.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        first_id, last_id = rows[0].id, rows[-1].id
+
+        subjects = _grouped(
+            subject_scores, book_subjects_association.c.book_id, first_id, last_id
+        )
+        bookshelves = _grouped(
+            bookshelf_scores, book_bookshelves_association.c.book_id, first_id, last_id
+        )
+        reviews = _grouped(review_votes, Comment.book_id, first_id, last_id)
+
+        updates = []
+        for row in rows:
+            review_weighted, votes = reviews.get(row.id, (0, 0))
+            score = popularity_score(
+                row.downloads,
+                row.bookmark_count,
+                row.average_rating,
+                subjects.get(row.id, (0,))[0],
+                bookshelves.get(row.id, (0,))[0],
+                review_weighted,
+                votes,
+                max_reads,
+                max_downloads,
+            )
+            if score != row.popularity_score:
+                updates.append({"book_id": row.id, "score": score})
+
+        if updates:
+            db.session.execute(write_scores, updates)
+        db.session.commit()
+        scored += len(rows)
+        changed += len(updates)
+    return scored, changed
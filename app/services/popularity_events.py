@@ -0,0 +1,227 @@
+"""Event-driven trending scores for books.
+
+Downloads, new bookmarks, reviews and upvotes record a weighted event in
+an in-process buffer instead of touching the database. A background thread
+flushes the buffer every ``POPULARITY_FLUSH_INTERVAL`` seconds with one
+executemany UPDATE that adds the coalesced events of each book. The thread
+starts with the first request the app serves, so CLI commands never run
+it. When a flush fails the books are retried one by one, and the events of
+a book are dropped after ``POPULARITY_FLUSH_MAX_ATTEMPTS`` failed flushes.
+
+``books.trending_score`` decays exponentially with a half-life of
+``TRENDING_HALF_LIFE_HOURS``. It is stored as the log of the decayed score
+scaled to ``TRENDING_EPOCH``, so adding an event never rewrites other rows
+and ordering by the column ranks books by their current decayed score.
+Books without events keep NULL, the log of a zero score. Scores are added
+in log space with the exponent of their gap capped, so a gap too large for
+``exp()`` (PostgreSQL raises on underflow) just keeps the larger score.
+Changing the half-life rescales new events only; stored scores keep their
+old scale until fresh events outweigh them.
+"""
+
+import atexit
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import Float, bindparam, case, func, update
+
+from app import db
+from app.models import Book
+
+logger = logging.getLogger(__name__)
+
+# Reference time of the stored trending scores
+TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+# Largest gap between two log scores passed to exp(); e**-700 is still a
+# normal double, and the smaller score adds nothing measurable beyond it
+MAX_LOG_GAP = 700
+
+
+# Function to add two scores kept as logarithms without leaving log space
+def _log_add(a, b):
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+class PopularityBuffer:
+    """
+    Coalesces popularity events per book until the next flush
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        # Failed flushes per book since its events last applied
+        self._failures = {}
+        self._thread = None
+        self._app = None
+        self._exit_hook = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def record(self, book_id, event, now=None):
+        """
+        Adds an event ("download", "bookmark", ...) for a book at time now.
+        """
+        if not book_id or self._app is None:
+            return
+        config = self._app.config
+        weight = config.get("POPULARITY_EVENT_WEIGHTS", {}).get(event, 1)
+        if weight <= 0:
+            return
+        half_life = config.get("TRENDING_HALF_LIFE_HOURS", 24) * 3600
+        now = time.time() if now is None else now
+        log_weight = math.log(weight) + (now - TRENDING_EPOCH) * math.log(2) / half_life
+        self._merge({book_id: [log_weight, int(event == "download")]})
+
+    def _merge(self, events):
+        with self._lock:
+            for book_id, (log_weight, downloads) in events.items():
+                entry = self._pending.get(book_id)
+                if entry is None:
+                    self._pending[book_id] = [log_weight, downloads]
+                else:
+                    entry[0] = _log_add(entry[0], log_weight)
+                    entry[1] += downloads
+
+    def flush(self):
+        """
+        Applies the buffered events; returns the number of books updated.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        books = Book.__table__
+        current = books.c.trending_score
+        delta = bindparam("log_weight", type_=Float)
+        # log(e**a + e**b) = max(a, b) + log(1 + e**-|a - b|)
+        higher = case((current >= delta, current), else_=delta)
+        gap = func.abs(current - delta)
+        gap = case((gap < MAX_LOG_GAP, gap), else_=MAX_LOG_GAP)
+        statement = (
+            update(books)
+            .where(books.c.id == bindparam("book_id"))
+            .values(
+                trending_score=case(
+                    (current.is_(None), delta),
+                    else_=higher + func.ln(1 + func.exp(-gap)),
+                ),
+                downloads=func.coalesce(books.c.downloads, 0)
+                + bindparam("download_count"),
+                # Engagement is not an edit of the book
+                updated_at=books.c.updated_at,
+            )
+        )
+        rows = [
+            {"book_id": book_id, "log_weight": log_weight, "download_count": count}
+            for book_id, (log_weight, count) in pending.items()
+        ]
+        try:
+            self._apply(statement, rows)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Applying popularity events failed, retrying per book")
+            # Find the books that fail on their own and keep only those
+            failed = {}
+            for row in rows:
+                try:
+                    self._apply(statement, [row])
+                except Exception:
+                    db.session.rollback()
+                    failed[row["book_id"]] = pending[row["book_id"]]
+            self._retry_later(failed)
+            return len(pending) - len(failed)
+        finally:
+            db.session.remove()
+        return len(pending)
+
+    def _apply(self, statement, rows):
+        db.session.execute(statement, rows)
+        db.session.commit()
+        with self._lock:
+            for row in rows:
+                self._failures.pop(row["book_id"], None)
+
+    def _retry_later(self, failed):
+        # Events that keep failing (say, a constraint violation) are dropped
+        # after POPULARITY_FLUSH_MAX_ATTEMPTS flushes instead of forever
+        max_attempts = current_app.config.get("POPULARITY_FLUSH_MAX_ATTEMPTS", 5)
+        retry, dropped = {}, []
+        with self._lock:
+            for book_id, entry in failed.items():
+                attempts = self._failures.get(book_id, 0) + 1
+                if attempts >= max_attempts:
+                    self._failures.pop(book_id, None)
+                    dropped.append(book_id)
+                else:
+                    self._failures[book_id] = attempts
+                    retry[book_id] = entry
+        self._merge(retry)
+        if dropped:
+            logger.error(
+                "Dropped the popularity events of books %s after %d failed flushes",
+                sorted(dropped),
+                max_attempts,
+            )
+
+    def init_app(self, app):
+        with self._lock:
+            self._app = app
+
+    def start(self, app):
+        with self._lock:
+            self._app = app
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="popularity-flusher", daemon=True
+                )
+                self._thread.start()
+            if not self._exit_hook:
+                # Apply what is still buffered when the process stops
+                atexit.register(self._flush_at_exit)
+                self._exit_hook = True
+
+    def _run(self):
+        while True:
+            time.sleep(self._app.config.get("POPULARITY_FLUSH_INTERVAL", 10))
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Applying popularity events failed")
+
+    def _flush_at_exit(self):
+        if self._app is None:
+            return
+        with self._app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Applying popularity events at exit failed")
+
+
+popularity_buffer = PopularityBuffer()
+
+
+# Function to record an engagement event ("download", "bookmark", ...) for a book
+def record_popularity_event(book_id, event):
+    popularity_buffer.record(book_id, event)
+
+
+# Function to buffer the popularity events recorded by the app
+def init_popularity_events(app):
+    popularity_buffer.init_app(app)
+
+
+# Function to start flushing popularity events in the background
+def start_popularity_flusher(app):
+    popularity_buffer.start(app)
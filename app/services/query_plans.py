@@ -0,0 +1,206 @@
+"""Query plan regression checks for the read endpoints.
+
+Replays the ``process_get_*`` endpoints through the Flask test client,
+captures every SELECT they issue and runs EXPLAIN on it against the
+configured database. Run it against a database seeded with
+production-sized data: on small tables a sequential scan is the right plan,
+so only scans of tables with at least ``min_rows`` rows are reported.
+"""
+
+import json
+import re
+
+from sqlalchemy import event, func, select
+
+from app import db
+from app.models import (
+    Agent,
+    Book,
+    Bookshelf,
+    Comment,
+    Language,
+    Publisher,
+    Subject,
+    User,
+)
+
+# Endpoints checked by `flask perf explain`; placeholders are filled with
+# ids of existing rows. Entries marked True need a bearer token.
+PLAN_TARGETS = [
+    ("/api/v1/books/", False),
+    ("/api/v1/books/?sort=popularity&order=desc", False),
+    ("/api/v1/books/?sort=downloads&order=desc", False),
+    ("/api/v1/books/?sort=created_at&order=desc", False),
+    ("/api/v1/books/?sort=rating&order=desc&cursor=", False),
+    ("/api/v1/books/{book_id}", False),
+    ("/api/v1/books/popular", False),
+    ("/api/v1/agents/", False),
+    ("/api/v1/agents/{agent_id}", False),
+    ("/api/v1/agents/popular", False),
+    ("/api/v1/subjects/", False),
+    ("/api/v1/subjects/{subject_id}", False),
+    ("/api/v1/bookshelves/", False),
+    ("/api/v1/bookshelves/{bookshelf_id}", False),
+    ("/api/v1/comments/?type=review&book_id={book_id}", False),
+    ("/api/v1/comments/?type=comment&book_id={book_id}", False),
+    ("/api/v1/comments/?type=reply&parent_id={comment_id}", False),
+    ("/api/v1/comments/{comment_id}", False),
+    ("/api/v1/comments/{comment_id}/thread", False),
+    ("/api/v1/resources/{book_id}", False),
+    ("/api/v1/languages/", False),
+    ("/api/v1/languages/{language_id}", False),
+    ("/api/v1/languages/{language_id}/books", False),
+    ("/api/v1/publishers/", False),
+    ("/api/v1/publishers/{publisher_id}", False),
+    ("/api/v1/publishers/{publisher_id}/books", False),
+    ("/api/v1/bookmarks/books", True),
+    ("/api/v1/bookmarks/{book_id}", True),
+    ("/api/v1/user/profile", True),
+]
+
+_SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)(.*)$")
+_ALIAS_RE = re.compile(r"\b(\w+) AS (\w+)\b", re.IGNORECASE)
+
+
+# Function to pick ids of existing rows for the endpoint placeholders
+def _sample_ids():
+    samples = {}
+    for key, model in (
+        ("book_id", Book),
+        ("agent_id", Agent),
+        ("subject_id", Subject),
+        ("bookshelf_id", Bookshelf),
+        ("language_id", Language),
+        ("publisher_id", Publisher),
+    ):
+        samples[key] = db.session.scalar(select(func.min(model.id))) or 0
+    # Prefer the most discussed comment and book so the plans see real fan-out
+    comment = db.session.scalars(
+        select(Comment).order_by(Comment.reply_count.desc()).limit(1)
+    ).first()
+    samples["comment_id"] = comment.id if comment else 0
+    if comment and comment.book_id:
+        samples["book_id"] = comment.book_id
+    return samples
+
+
+# Function to run a request and return the SELECT statements it issued
+def capture_statements(client, path, headers=None):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if not many and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(path, headers=headers or {})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+    return response.status_code, statements
+
+
+# Function to list the relations a PostgreSQL plan reads with a Seq Scan
+def _postgresql_seq_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {statement}", parameters
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    tables = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            tables.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return tables
+
+
+# Function to list the tables a SQLite plan scans without an index
+def _sqlite_seq_scans(connection, statement, parameters):
+    rows = connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).all()
+    aliases = {alias: table for table, alias in _ALIAS_RE.findall(statement)}
+    sorted_in_memory = any("TEMP B-TREE FOR ORDER BY" in row[-1] for row in rows)
+    tables = []
+    for row in rows:
+        match = _SQLITE_SCAN_RE.match(row[-1])
+        # Index and virtual table scans are not sequential table reads
+        if not match or "INDEX" in match.group(2):
+            continue
+        name = match.group(1)
+        # Walking the rowid in ORDER BY id ... LIMIT order is a primary key scan
+        rowid_order = re.search(
+            rf"ORDER BY {re.escape(name)}\.id( ASC| DESC)?\s+LIMIT", statement
+        )
+        if rowid_order and not sorted_in_memory:
+            continue
+        tables.append(aliases.get(name, name))
+    return tables
+
+
+# Function to estimate the row count of a table
+def _table_rows(connection, table, cache):
+    if table not in cache:
+        if connection.dialect.name == "postgresql":
+            rows = connection.exec_driver_sql(
+                "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%(name)s)",
+                {"name": table},
+            ).scalar()
+        else:
+            table_names = db.metadata.tables
+            rows = (
+                connection.execute(
+                    select(func.count()).select_from(table_names[table])
+                ).scalar()
+                if table in table_names
+                else None
+            )
+        cache[table] = rows or 0
+    return cache[table]
+
+
+# Function to EXPLAIN every endpoint and collect sequential scans of big tables
+def check_query_plans(app, min_rows=10000):
+    """
+    Returns (path, status, statement count, [(table, rows, statement)]) per
+    endpoint; an endpoint passes when its list of offending scans is empty.
+    """
+    samples = _sample_ids()
+    user = db.session.scalars(select(User).order_by(User.id).limit(1)).first()
+    headers = (
+        {"Authorization": f"Bearer {user.generate_auth_token().signed}"}
+        if user
+        else None
+    )
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        seq_scans = _postgresql_seq_scans
+    elif connection.dialect.name == "sqlite":
+        seq_scans = _sqlite_seq_scans
+    else:
+        raise RuntimeError(f"EXPLAIN is not supported on {connection.dialect.name}")
+
+    # The probe requests must not start the background threads
+    app.config["BACKGROUND_WORKERS"] = False
+    client = app.test_client()
+    row_counts = {}
+    results = []
+    for template, needs_token in PLAN_TARGETS:
+        if needs_token and headers is None:
+            continue
+        path = template.format(**samples)
+        status, statements = capture_statements(
+            client, path, headers if needs_token else None
+        )
+        offending = []
+        for statement, parameters in statements:
+            for table in seq_scans(connection, statement, parameters):
+                rows = _table_rows(connection, table, row_counts)
+                if rows >= min_rows:
+                    offending.append((table, int(rows), statement))
+        results.append((path, status, len(statements), offending))
+    db.session.rollback()
+    return results
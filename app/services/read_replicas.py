@@ -0,0 +1,219 @@
+"""Read replica routing for read-only requests.
+
+Replica databases listed in ``DATABASE_REPLICA_URLS`` are registered as
+``replica_<n>`` binds. A background monitor checks each one every
+``DB_REPLICA_CHECK_INTERVAL`` seconds and measures its replication lag;
+GET and HEAD requests are pinned to one healthy replica whose lag is within
+``DB_REPLICA_MAX_LAG`` and ``RoutingSession`` sends their plain reads there.
+
+Clients that wrote recently keep reading from the primary for
+``DB_READ_YOUR_WRITES_SECONDS``, tracked per bearer token in this process
+and with a cookie across processes.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request
+from sqlalchemy import text
+
+from app import db
+from app.models import BlacklistedToken
+from app.services.db_pool import engine_options
+
+logger = logging.getLogger(__name__)
+
+# Cookie holding the time until which the client reads from the primary
+READ_YOUR_WRITES_COOKIE = "pico_primary_until"
+
+# Requests that may be served from a replica
+READ_METHODS = ("GET", "HEAD")
+
+# Replication lag of a PostgreSQL standby in seconds; 0 on a primary or a
+# standby that has replayed everything it received
+_POSTGRESQL_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# Per-process map of bearer token digests to primary-read deadlines
+_recent_writers = OrderedDict()
+_recent_writers_lock = threading.Lock()
+_RECENT_WRITERS_MAX_ENTRIES = 10000
+
+
+# Function to measure the replication lag of a database in seconds
+def _replication_lag(connection):
+    if connection.dialect.name == "postgresql":
+        return float(connection.execute(_POSTGRESQL_LAG).scalar() or 0)
+    # Other databases have no standby to measure; reaching them is enough
+    connection.execute(text("SELECT 1"))
+    return 0.0
+
+
+class ReplicaMonitor:
+    """
+    Tracks replica health and lag and picks a replica per request
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+        self._turn = 0
+        self._thread = None
+
+    @property
+    def status(self):
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._status.items()}
+
+    def check(self, engines):
+        for key, engine in engines.items():
+            entry = dict(healthy=False, lag=None, error=None, checked_at=time.time())
+            try:
+                with engine.connect() as connection:
+                    entry["lag"] = _replication_lag(connection)
+                entry["healthy"] = True
+            except Exception as error:
+                entry["error"] = str(error)
+                logger.warning("Read replica %s failed its health check", key)
+            with self._lock:
+                self._status[key] = entry
+
+    def choose(self, max_lag, fallback="primary"):
+        """
+        Returns the bind key of a fresh replica, round robin, or None to read
+        from the primary. With fallback "least_stale" the least lagging
+        healthy replica is used when every replica is behind max_lag.
+        """
+        with self._lock:
+            healthy = sorted(
+                (entry["lag"], key)
+                for key, entry in self._status.items()
+                if entry["healthy"]
+            )
+            if not healthy:
+                return None
+            fresh = [key for lag, key in healthy if lag <= max_lag]
+            if not fresh:
+                return healthy[0][1] if fallback == "least_stale" else None
+            self._turn = (self._turn + 1) % len(fresh)
+            return fresh[self._turn]
+
+    def start(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with app.app_context():
+            engines = {key: db.engines[key] for key in replica_keys(app)}
+        interval = app.config.get("DB_REPLICA_CHECK_INTERVAL", 5)
+
+        def run():
+            while True:
+                self.check(engines)
+                time.sleep(interval)
+
+        self._thread = threading.Thread(
+            target=run, name="read-replica-monitor", daemon=True
+        )
+        self._thread.start()
+
+
+replica_monitor = ReplicaMonitor()
+
+
+# Function to list the bind keys of the configured replicas
+def replica_keys(app):
+    return [
+        f"replica_{number}"
+        for number in range(1, len(app.config.get("DB_REPLICA_URIS", [])) + 1)
+    ]
+
+
+# Function to register the replicas as binds before the engines are created
+def configure_replica_binds(app):
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for key, uri in zip(replica_keys(app), app.config.get("DB_REPLICA_URIS", [])):
+        binds[key] = dict(url=uri, **engine_options(app.config, uri))
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+
+# Function to identify the client by its bearer token
+def _writer_key():
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header[:7].lower() == "bearer " and auth_header[7:]:
+        return BlacklistedToken.digest(auth_header[7:])
+    return None
+
+
+# Function to tell whether the client wrote within the read-your-writes window
+def _wrote_recently(now):
+    try:
+        if float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    key = _writer_key()
+    if key is None:
+        return False
+    with _recent_writers_lock:
+        until = _recent_writers.get(key)
+        if until is not None and until <= now:
+            del _recent_writers[key]
+            until = None
+    return until is not None
+
+
+# Function to remember that the client wrote and read from the primary for a while
+def _record_write(response, now, window):
+    until = now + window
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        f"{until:.3f}",
+        max_age=int(window) + 1,
+        httponly=True,
+        samesite="Lax",
+    )
+    key = _writer_key()
+    if key is None:
+        return
+    with _recent_writers_lock:
+        _recent_writers[key] = until
+        _recent_writers.move_to_end(key)
+        while len(_recent_writers) > _RECENT_WRITERS_MAX_ENTRIES:
+            _recent_writers.popitem(last=False)
+
+
+# Decorator for read-only handlers that must see the primary's latest data
+def use_primary(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_replica = None
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+# Function to route read-only requests to replicas and track client writes
+def init_read_replicas(app):
+    if not app.config.get("DB_REPLICA_URIS"):
+        return
+    max_lag = app.config.get("DB_REPLICA_MAX_LAG", 10)
+    fallback = app.config.get("DB_REPLICA_STALE_FALLBACK", "primary")
+    window = app.config.get("DB_READ_YOUR_WRITES_SECONDS", 15)
+
+    @app.before_request
+    def route_reads():
+        if request.method in READ_METHODS and not _wrote_recently(time.time()):
+            g.db_replica = replica_monitor.choose(max_lag, fallback)
+
+    @app.after_request
+    def track_writes(response):
+        if g.get("db_wrote"):
+            _record_write(response, time.time(), window)
+        return response
+
+    replica_monitor.start(app)
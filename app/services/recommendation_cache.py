@@ -0,0 +1,141 @@
+"""Cached recommendation lists.
+
+The ranked ids of a user's recommendations are stored in
+``user_recommendations`` once and every page slices the stored list. Rows
+expire after ``RECOMMENDATION_CACHE_TTL`` seconds and are deleted in the
+same transaction as anything that changes the user's ranking: bookmarking
+or unbookmarking a book, rating one, or following or unfollowing a subject
+or bookshelf. ``flask recommendations precompute`` fills the table for users
+who logged in recently so their first request is already cached.
+"""
+
+import logging
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Bookmark, Rating, User, UserRecommendation
+from app.services.recommendation_engine import recommend_book_ids
+from app.utils.datetime_util import utc_now
+
+logger = logging.getLogger(__name__)
+
+# User relationships whose changes reorder that user's recommendations
+_INTEREST_ATTRIBUTES = ("subjects", "bookshelves")
+
+
+# Function to get the current UTC time in the naive form the columns store
+def _utc_now_naive():
+    return utc_now().replace(tzinfo=None)
+
+
+# Function to tell whether a cached list was computed within the TTL
+def _is_fresh(row, now):
+    ttl = current_app.config.get("RECOMMENDATION_CACHE_TTL", 3600)
+    return row.computed_at > now - timedelta(seconds=ttl)
+
+
+# Function to compute and store the recommendation list of a user
+def refresh_recommendations(user_id, language=""):
+    book_ids = recommend_book_ids(user_id, language or None)
+    db.session.merge(
+        UserRecommendation(
+            user_id=user_id,
+            language=language,
+            book_ids=book_ids,
+            computed_at=utc_now(),
+        )
+    )
+    return book_ids
+
+
+# Function to return the ranked recommendation ids of a user from the cache
+def cached_recommendation_ids(user_id, lan=None):
+    language = "" if not lan or lan == "all" else lan
+    row = db.session.get(UserRecommendation, (user_id, language))
+    if row is not None and _is_fresh(row, _utc_now_naive()):
+        return row.book_ids
+
+    book_ids = refresh_recommendations(user_id, language)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored the same list first
+        db.session.rollback()
+    return book_ids
+
+
+# Function to precompute the lists of users who logged in recently
+def precompute_recommendations(active_days=7, batch_size=100):
+    """
+    Returns the number of users whose list was computed.
+    """
+    now = _utc_now_naive()
+    since = now - timedelta(days=active_days)
+    last_id = 0
+    computed = 0
+    while True:
+        user_ids = db.session.scalars(
+            select(User.id)
+            .where(User.last_logged_in >= since, User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+        ).all()
+        if not user_ids:
+            break
+        cached = {
+            row.user_id: row
+            for row in db.session.scalars(
+                select(UserRecommendation).where(
+                    UserRecommendation.user_id.in_(user_ids),
+                    UserRecommendation.language == "",
+                )
+            )
+        }
+        for user_id in user_ids:
+            row = cached.get(user_id)
+            if row is None or not _is_fresh(row, now):
+                refresh_recommendations(user_id)
+                computed += 1
+        db.session.commit()
+        last_id = user_ids[-1]
+    return computed
+
+
+# Function to collect the users whose rankings a flush changed
+def _changed_users(session):
+    user_ids = set()
+    for target in (*session.new, *session.deleted):
+        if isinstance(target, (Bookmark, Rating)):
+            user_ids.add(target.user_id)
+    for target in session.dirty:
+        if isinstance(target, Rating) and inspect(target).attrs.rating.history:
+            user_ids.add(target.user_id)
+        elif isinstance(target, User) and any(
+            inspect(target).attrs[name].history.has_changes()
+            for name in _INTEREST_ATTRIBUTES
+        ):
+            user_ids.add(target.id)
+    user_ids.discard(None)
+    return user_ids
+
+
+def _after_flush(session, flush_context):
+    user_ids = _changed_users(session)
+    if user_ids:
+        # Same transaction as the change, so no stale list can outlive it
+        session.connection().execute(
+            delete(UserRecommendation.__table__).where(
+                UserRecommendation.__table__.c.user_id.in_(user_ids)
+            )
+        )
+
+
+# Function to drop cached lists when a user's interests change
+def init_recommendation_cache(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
@@ -1,54 +1,255 @@
-from app.models import (
-    Book,
-    User,
-    Language,
-    Bookmark,
+"""Book recommendations scored with a sparse book x feature matrix.
+
+Features are the subjects and bookshelves books belong to. The incidence
+matrix is kept column-compressed: for every feature, the sorted rows of its
+books. Scoring follows ``calculate_score``: each book gets the scores of its
+features plus its average rating (precomputed once per build as the base
+scores) and one point per feature the user follows. The user's features
+select columns of the matrix, so adding them up is the sparse matrix-vector
+product with the user's 0/1 interest vector, done with a single bincount.
+Books often bookmarked together with the user's bookmarks (the also-read
+neighbours, see ``app.services.also_read``) add their similarity times
+``RECOMMENDATION_ALSO_READ_WEIGHT``. The best unread books are then picked
+with argpartition.
+
+The matrix is rebuilt from a few streaming queries every
+``RECOMMENDATION_MATRIX_TTL`` seconds; requests keep using the previous one
+while a rebuild runs.
+"""
+
+import logging
+import threading
+import time
+from itertools import groupby
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Book, Bookmark, Bookshelf, Language, Subject
+from app.models.bookshelves import (
+    book_bookshelves_association,
+    user_bookshelves_association,
 )
-from . import (
-    calculate_score,
-)  # Importing calculate_score function from the same directory
-from sqlalchemy import desc
-
-
-# Function to generate book recommendations for a user
-def generate_recommendations(user: User, page=1, per_page=10, lan=None):
-    # Query unread books for the user, optionally filtered by language
-    if lan:
-        unread_books = (
-            Book.query.filter(~Book.bookmarks.any(Bookmark.user_id == user.id))
-            .order_by(desc(Book.popularity_score))
-            .limit(200)
-            .all()
-        )
-    else:
-        unread_books = (
-            Book.query.filter(
-                ~Book.bookmarks.any(Bookmark.user_id == user.id),
-                Book.languages.any(Language.code == lan),  # Filter by language
+from app.models.languages import book_languages_association
+from app.models.subjects import book_subjects_association, user_subjects_association
+from app.services.also_read import also_read_index
+
+logger = logging.getLogger(__name__)
+
+# Feature kinds: association from books, feature model, association from users
+FEATURE_KINDS = {
+    "subject": (
+        book_subjects_association,
+        "subject_id",
+        Subject,
+        user_subjects_association,
+    ),
+    "bookshelf": (
+        book_bookshelves_association,
+        "bookshelf_id",
+        Bookshelf,
+        user_bookshelves_association,
+    ),
+}
+
+
+class FeatureMatrix:
+    """
+    Column-compressed book x feature incidence matrix with base scores
+    """
+
+    def __init__(self, book_ids, base_scores, popularity, columns, languages):
+        self.book_ids = book_ids
+        self.base_scores = base_scores
+        self.popularity = popularity
+        # (kind, feature id) -> sorted rows of the books having the feature
+        self.columns = columns
+        # language code -> sorted rows of the books in that language
+        self.languages = languages
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def _locate(self, book_ids):
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        rows = np.searchsorted(self.book_ids, book_ids)
+        rows = np.minimum(rows, len(self.book_ids) - 1)
+        return rows, self.book_ids[rows] == book_ids
+
+    def rows_of(self, book_ids):
+        rows, found = self._locate(book_ids)
+        return rows[found]
+
+    def scores(self, features, boosts=None):
+        """
+        Returns the score of every book for a user following features, plus
+        the weights of boosts, a (book ids, weights) pair.
+        """
+        scores = self.base_scores.copy()
+        columns = [self.columns[key] for key in features if key in self.columns]
+        if columns:
+            scores += np.bincount(np.concatenate(columns), minlength=len(scores))
+        if boosts is not None and len(boosts[0]):
+            rows, found = self._locate(boosts[0])
+            scores += np.bincount(
+                rows[found], weights=boosts[1][found], minlength=len(scores)
             )
-            .order_by(desc(Book.popularity_score))
-            .limit(200)
-            .all()
-        )
+        return scores
+
+    def rank(self, features, exclude_ids=(), lan=None, limit=200, boosts=None):
+        """
+        Returns the ids of the best scoring books, best first. Ties go to the
+        more popular book, then the lower id.
+        """
+        if not len(self.book_ids):
+            return []
+        if lan:
+            candidates = np.zeros(len(self.book_ids), dtype=bool)
+            candidates[self.languages.get(lan, [])] = True
+        else:
+            candidates = np.ones(len(self.book_ids), dtype=bool)
+        if len(exclude_ids):
+            candidates[self.rows_of(exclude_ids)] = False
+        rows = np.flatnonzero(candidates)
+        if not len(rows) or limit <= 0:
+            return []
 
-    # Calculate scores for candidate books
-    scores = {}
-    for book in unread_books:
-        score = calculate_score(user, book)
-        scores[book] = score
+        scores = self.scores(features, boosts)[rows]
+        if limit < len(rows):
+            # Only the top `limit` candidates are sorted
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((self.book_ids[rows], -self.popularity[rows], -scores))
+        return self.book_ids[rows[order]].tolist()
+
+
+# Function to build the feature matrix from the database
+def build_feature_matrix():
+    books = db.session.execute(
+        select(
+            Book.id,
+            func.coalesce(Book.average_rating, 0.0),
+            func.coalesce(Book.popularity_score, 0),
+        ).order_by(Book.id)
+    ).all()
+    book_ids = np.fromiter((row[0] for row in books), dtype=np.int64, count=len(books))
+    base_scores = np.fromiter(
+        (row[1] for row in books), dtype=np.float64, count=len(books)
+    )
+    popularity = np.fromiter(
+        (row[2] for row in books), dtype=np.float64, count=len(books)
+    )
+    matrix = FeatureMatrix(book_ids, base_scores, popularity, {}, {})
+    if not len(book_ids):
+        return matrix
+
+    for kind, (association, column, model, _) in FEATURE_KINDS.items():
+        links = db.session.execute(
+            select(
+                association.c[column],
+                association.c.book_id,
+                func.coalesce(model.score, 0),
+            )
+            .join(model, model.id == association.c[column])
+            .order_by(association.c[column], association.c.book_id)
+        ).all()
+        if not links:
+            continue
+        links = np.array(links, dtype=np.float64)
+        feature_ids = links[:, 0].astype(np.int64)
+        rows = np.searchsorted(book_ids, links[:, 1].astype(np.int64))
+        # Every feature a book has adds that feature's score
+        base_scores += np.bincount(rows, weights=links[:, 2], minlength=len(book_ids))
+        features, starts = np.unique(feature_ids, return_index=True)
+        for feature_id, feature_rows in zip(features, np.split(rows, starts[1:])):
+            matrix.columns[(kind, int(feature_id))] = feature_rows
+
+    languages = db.session.execute(
+        select(Language.code, book_languages_association.c.book_id)
+        .join(Language, Language.id == book_languages_association.c.language_id)
+        .order_by(Language.code, book_languages_association.c.book_id)
+    ).all()
+    for code, links in groupby(languages, key=lambda link: link[0]):
+        language_book_ids = np.array([book_id for _, book_id in links], np.int64)
+        matrix.languages[code] = np.searchsorted(book_ids, language_book_ids)
+    return matrix
+
+
+class FeatureMatrixCache:
+    """
+    Holds the current feature matrix and rebuilds it when it gets old
+    """
+
+    def __init__(self):
+        self._matrix = None
+        self._build_lock = threading.Lock()
+
+    def get(self, ttl):
+        matrix = self._matrix
+        if matrix is not None and time.monotonic() - matrix.built_at < ttl:
+            return matrix
+        # The first build blocks; later ones run in one request at a time
+        if not self._build_lock.acquire(blocking=matrix is None):
+            return matrix
+        try:
+            if self._matrix is matrix:
+                self._matrix = build_feature_matrix()
+                logger.info("Recommendation matrix built: %s books", len(self._matrix))
+        finally:
+            self._build_lock.release()
+        return self._matrix
+
+    def clear(self):
+        self._matrix = None
+
+
+feature_matrix_cache = FeatureMatrixCache()
+
+
+# Function to load the features a user follows and the books they bookmarked
+def _user_interests(user_id):
+    features = []
+    for kind, (_, column, _, user_association) in FEATURE_KINDS.items():
+        feature_ids = db.session.scalars(
+            select(user_association.c[column]).where(
+                user_association.c.user_id == user_id
+            )
+        )
+        features.extend((kind, feature_id) for feature_id in feature_ids)
+    bookmarked = db.session.scalars(
+        select(Bookmark.book_id).where(Bookmark.user_id == user_id)
+    ).all()
+    return features, bookmarked
 
-    # Rank candidate books based on scores
-    ranked_books = sorted(scores, key=scores.get, reverse=True)
 
-    # Select books for the specified page
-    start = (page - 1) * per_page
-    end = start + per_page
-    recommendations_page = ranked_books[start:end]
+# Function to weigh the also-read neighbours of the books a user bookmarked
+def _also_read_boosts(bookmarked, config):
+    weight = config.get("RECOMMENDATION_ALSO_READ_WEIGHT", 0)
+    index = also_read_index() if weight and bookmarked else None
+    if index is None:
+        return None
+    neighbours = [index.neighbours(book_id) for book_id in bookmarked]
+    book_ids = np.concatenate([ids for ids, _ in neighbours])
+    weights = np.concatenate([scores for _, scores in neighbours])
+    return book_ids, weights.astype(np.float64) * weight
 
-    # Determine pagination information
-    has_next_page = len(ranked_books) - end > 0
-    has_previous_page = page > 1
-    total_pages = len(ranked_books) // per_page + 1
 
-    # Return recommendations for the specified page along with pagination information
-    return recommendations_page, has_next_page, has_previous_page, total_pages
+# Function to rank the unread books of a user, optionally in one language
+def recommend_book_ids(user_id, lan=None, limit=None):
+    config = current_app.config
+    if limit is None:
+        limit = config.get("RECOMMENDATION_LIMIT", 200)
+    matrix = feature_matrix_cache.get(config.get("RECOMMENDATION_MATRIX_TTL", 300))
+    features, bookmarked = _user_interests(user_id)
+    if lan == "all":
+        lan = None
+    return matrix.rank(
+        features,
+        exclude_ids=bookmarked,
+        lan=lan,
+        limit=limit,
+        boosts=_also_read_boosts(bookmarked, config),
+    )
@@ -0,0 +1,274 @@
+"""Content similarity ("more like this") index for books.
+
+Every book becomes a TF-IDF vector over hashed features: the words of its
+title and description and its subjects and agents, each field with its own
+weight. Vectors are L2 normalized, so the dot product of two books is their
+cosine similarity. ``flask catalog build-similar`` stores two sparse
+matrices with ``app.services.array_store``:
+
+* the book vectors as CSR (``doc_indptr``, ``doc_features``,
+  ``doc_weights``), plus the raw feature counts (``doc_counts``) so the next
+  build only has to tokenize the books changed since this one;
+* the transposed matrix as postings per feature (``post_indptr``,
+  ``post_rows``, ``post_weights``), without features so common that they
+  say nothing about similarity.
+
+A lookup takes the book's strongest features, adds up their postings with
+one bincount and picks the best scores with argpartition, all on the
+memory-mapped arrays.
+"""
+
+import re
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.models import Book
+from app.models.agents import book_agents_association
+from app.models.subjects import book_subjects_association
+from app.services.array_store import ArrayStoreCache, load_arrays, save_arrays
+from app.utils.datetime_util import utc_now
+
+# Size of the hashed feature space
+SIMILAR_BOOKS_FEATURES = 2**20
+
+# Features found in more than this share of the books get no postings
+SIMILAR_BOOKS_MAX_DF = 0.1
+
+# Strongest features of a book used to look up its neighbours
+SIMILAR_BOOKS_QUERY_TERMS = 32
+
+# Weight of one occurrence of a feature, per field
+FIELD_WEIGHTS = {"title": 3.0, "description": 1.0, "subject": 4.0, "agent": 4.0}
+
+# Books tokenized per query batch
+_TOKENIZE_BATCH_SIZE = 1000
+
+_WORD = re.compile(r"[^\W\d_]{2,}")
+
+
+# Function to map a feature name to its hashed feature id
+def _feature_id(name, n_features):
+    return zlib.crc32(name.encode("utf-8")) % n_features
+
+
+# Function to count the weighted hashed features of some books
+def _tokenize(book_ids, n_features):
+    """
+    Returns (book ids, feature ids, counts), one entry per book and feature.
+    """
+    features = {book_id: Counter() for book_id in book_ids}
+    for start in range(0, len(book_ids), _TOKENIZE_BATCH_SIZE):
+        batch = book_ids[start : start + _TOKENIZE_BATCH_SIZE]
+        books = db.session.execute(
+            select(Book.id, Book.title, Book.description).where(Book.id.in_(batch))
+        )
+        for book_id, title, description in books:
+            for field, text in (("title", title), ("description", description)):
+                for word in _WORD.findall((text or "").lower()):
+                    feature = _feature_id(f"w:{word}", n_features)
+                    features[book_id][feature] += FIELD_WEIGHTS[field]
+        for field, association, column in (
+            ("subject", book_subjects_association, "subject_id"),
+            ("agent", book_agents_association, "agent_id"),
+        ):
+            links = db.session.execute(
+                select(association.c.book_id, association.c[column]).where(
+                    association.c.book_id.in_(batch)
+                )
+            )
+            for book_id, linked_id in links:
+                feature = _feature_id(f"{field[0]}:{linked_id}", n_features)
+                features[book_id][feature] += FIELD_WEIGHTS[field]
+
+    entries = [
+        (book_id, feature, count)
+        for book_id, counts in features.items()
+        for feature, count in counts.items()
+    ]
+    if not entries:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    book_col, feature_col, count_col = zip(*entries)
+    return (
+        np.array(book_col, dtype=np.int64),
+        np.array(feature_col, dtype=np.int64),
+        np.array(count_col, dtype=np.float32),
+    )
+
+
+# Function to keep the feature counts of the unchanged books of a build
+def _reuse_counts(previous, keep_ids):
+    lengths = np.diff(previous["doc_indptr"])
+    entry_book_ids = np.repeat(previous["book_ids"], lengths)
+    keep = np.isin(entry_book_ids, keep_ids)
+    return (
+        entry_book_ids[keep],
+        np.asarray(previous["doc_features"])[keep].astype(np.int64),
+        np.asarray(previous["doc_counts"])[keep],
+    )
+
+
+# Function to turn per-book feature counts into the index arrays
+def _index_arrays(book_ids, entry_book_ids, features, counts, n_features, max_df):
+    order = np.lexsort((features, entry_book_ids))
+    entry_book_ids, features, counts = (
+        entry_book_ids[order],
+        features[order],
+        counts[order],
+    )
+    n_books = len(book_ids)
+    rows = np.searchsorted(book_ids, entry_book_ids)
+    doc_indptr = np.zeros(n_books + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_books), out=doc_indptr[1:])
+
+    # Smoothed TF-IDF, normalized to unit length per book
+    df = np.bincount(features, minlength=n_features)
+    idf = np.log((1 + n_books) / (1 + df)) + 1
+    weights = (1 + np.log(counts)) * idf[features]
+    norms = np.sqrt(np.bincount(rows, weights=weights**2, minlength=n_books))
+    weights = weights / np.where(norms > 0, norms, 1)[rows]
+
+    # Features of a single book cannot link two books; very common ones
+    # would make every lookup scan most of the catalog
+    posted = (df[features] > 1) & (df[features] <= max(max_df * n_books, 2))
+    post_order = np.lexsort((rows[posted], features[posted]))
+    post_features = features[posted][post_order]
+    post_indptr = np.zeros(n_features + 1, dtype=np.int64)
+    np.cumsum(np.bincount(post_features, minlength=n_features), out=post_indptr[1:])
+
+    lookup = np.full(int(book_ids[-1]) + 1 if n_books else 0, -1, dtype=np.int32)
+    lookup[book_ids] = np.arange(n_books, dtype=np.int32)
+    return dict(
+        book_ids=book_ids,
+        rows=lookup,
+        doc_indptr=doc_indptr,
+        doc_features=features.astype(np.int32),
+        doc_counts=counts.astype(np.float32),
+        doc_weights=weights.astype(np.float32),
+        post_indptr=post_indptr,
+        post_rows=rows[posted][post_order].astype(np.int32),
+        post_weights=weights[posted][post_order].astype(np.float32),
+    )
+
+
+# Function to build the similarity index, reusing the previous build's counts
+def build_similar_books(
+    path, full=False, n_features=SIMILAR_BOOKS_FEATURES, max_df=SIMILAR_BOOKS_MAX_DF
+):
+    """
+    Returns (books indexed, books tokenized in this build).
+    """
+    started_at = utc_now()
+    book_ids = np.array(
+        db.session.scalars(select(Book.id).order_by(Book.id)).all(), dtype=np.int64
+    )
+
+    previous = None if full else load_arrays(path)
+    if previous is not None and len(previous["post_indptr"]) != n_features + 1:
+        previous = None
+    if previous is not None:
+        since = datetime.fromtimestamp(float(previous["built_at"]), timezone.utc)
+        changed_ids = db.session.scalars(
+            select(Book.id).where(Book.updated_at >= since.replace(tzinfo=None))
+        ).all()
+        keep_ids = np.setdiff1d(
+            np.intersect1d(previous["book_ids"], book_ids), changed_ids
+        )
+        reused = _reuse_counts(previous, keep_ids)
+    else:
+        keep_ids = np.empty(0, np.int64)
+        reused = (np.empty(0, np.int64),) * 2 + (np.empty(0, np.float32),)
+
+    tokenize_ids = np.setdiff1d(book_ids, keep_ids).tolist()
+    tokenized = _tokenize(tokenize_ids, n_features)
+    arrays = _index_arrays(
+        book_ids,
+        *(np.concatenate(parts) for parts in zip(reused, tokenized)),
+        n_features,
+        max_df,
+    )
+    arrays["built_at"] = np.array(started_at.timestamp())
+    save_arrays(path, arrays)
+    return len(book_ids), len(tokenize_ids)
+
+
+class SimilarBooksIndex:
+    """
+    Memory-mapped book vectors and feature postings
+    """
+
+    def __init__(self, version, arrays):
+        self.version = version
+        self.book_ids = arrays["book_ids"]
+        self.rows = arrays["rows"]
+        self.doc_indptr = arrays["doc_indptr"]
+        self.doc_features = arrays["doc_features"]
+        self.doc_weights = arrays["doc_weights"]
+        self.post_indptr = arrays["post_indptr"]
+        self.post_rows = arrays["post_rows"]
+        self.post_weights = arrays["post_weights"]
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def similar(self, book_id, limit, query_terms=SIMILAR_BOOKS_QUERY_TERMS):
+        """
+        Returns the ids of the books most similar to a book, best first. Ties
+        go to the lower id.
+        """
+        if book_id < 0 or book_id >= len(self.rows) or self.rows[book_id] < 0:
+            return []
+        row = self.rows[book_id]
+        start, end = self.doc_indptr[row], self.doc_indptr[row + 1]
+        features = self.doc_features[start:end]
+        weights = self.doc_weights[start:end]
+        if len(features) > query_terms:
+            strongest = np.argpartition(-weights, query_terms - 1)[:query_terms]
+            features, weights = features[strongest], weights[strongest]
+
+        posting_rows = []
+        posting_weights = []
+        for feature, weight in zip(features, weights):
+            first, last = self.post_indptr[feature], self.post_indptr[feature + 1]
+            if first < last:
+                posting_rows.append(self.post_rows[first:last])
+                posting_weights.append(self.post_weights[first:last] * weight)
+        if not posting_rows:
+            return []
+
+        scores = np.bincount(
+            np.concatenate(posting_rows),
+            weights=np.concatenate(posting_weights),
+            minlength=len(self.book_ids),
+        )
+        scores[row] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if limit < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)]
+            candidates = candidates[:limit]
+        order = np.lexsort((self.book_ids[candidates], -scores[candidates]))
+        return self.book_ids[candidates[order]].tolist()
+
+
+similar_books_cache = ArrayStoreCache(SimilarBooksIndex, "Similar books index")
+
+
+# Function to get the current similarity index, or None before the first build
+def similar_books_index():
+    config = current_app.config
+    return similar_books_cache.get(
+        config["SIMILAR_BOOKS_PATH"], config.get("SIMILAR_BOOKS_RELOAD_INTERVAL", 30)
+    )
+
+
+# Function to list the ids of the books whose content is closest to a book
+def similar_book_ids(book_id):
+    index = similar_books_index()
+    if index is None:
+        return []
+    return index.similar(book_id, current_app.config.get("SIMILAR_BOOKS_LIMIT", 50))
@@ -0,0 +1,236 @@
+"""Per-process cache of blacklisted tokens.
+
+Every request carrying a bearer token is checked against the blacklist. To
+keep that off the database, each process holds Bloom filters over the
+SHA-256 digests of blacklisted tokens that have not expired yet. A token the
+filters have never seen is accepted without a query; only a (possibly false)
+positive is confirmed against ``token_blacklist``.
+
+Filters are grouped in buckets by expiry time, so a whole bucket is dropped
+once every token in it has expired. New rows are picked up from an id
+watermark every ``TOKEN_BLACKLIST_REFRESH_INTERVAL`` seconds, and tokens
+blacklisted by this process are added as soon as their transaction commits;
+their entries in the verified token cache are dropped at the same time.
+"""
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+
+from app import auth_manager, db
+from app.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+# Smallest number of digests a new filter is sized for
+BLOOM_MIN_CAPACITY = 1024
+
+# Rows fetched per round trip while loading the blacklist
+LOAD_BATCH_SIZE = 5000
+
+# Rows blacklisted this recently are re-read on every refresh, so ids that
+# committed out of order behind the watermark are not missed
+REFRESH_OVERLAP = timedelta(seconds=30)
+
+# Session.info key holding blacklisted digests waiting for commit
+_PENDING_KEY = "token_blacklist_pending"
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over SHA-256 digests
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.count = 0
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        # The digest is already uniform; split it into two hashes and combine
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:16], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(digest)
+        )
+
+
+class BlacklistFilter:
+    """
+    Bloom filters over blacklisted token digests, bucketed by expiry time
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._buckets = {}
+        self._capacity = BLOOM_MIN_CAPACITY
+        self._watermark = None
+        self._refreshed_at = 0.0
+
+    @property
+    def loaded(self):
+        return self._watermark is not None
+
+    def _settings(self):
+        config = current_app.config
+        return (
+            config.get("TOKEN_BLACKLIST_BUCKET_SECONDS", 3600),
+            config.get("TOKEN_BLACKLIST_ERROR_RATE", 0.001),
+            config.get("TOKEN_BLACKLIST_REFRESH_INTERVAL", 5),
+        )
+
+    def _add(self, digest, expires_at, bucket_seconds, error_rate):
+        # A bucket ends at or after the expiry of every token it holds
+        bucket = math.ceil(_timestamp(expires_at) / bucket_seconds)
+        if bucket * bucket_seconds <= time.time():
+            return
+        filters = self._buckets.setdefault(bucket, [])
+        # Once a filter is full a larger one takes the new digests
+        if not filters or filters[-1].count >= filters[-1].capacity:
+            capacity = filters[-1].capacity * 2 if filters else self._capacity
+            filters.append(BloomFilter(capacity, error_rate))
+        filters[-1].add(bytes.fromhex(digest))
+
+    def add(self, digest, expires_at):
+        bucket_seconds, error_rate, _ = self._settings()
+        with self._lock:
+            self._add(digest, expires_at, bucket_seconds, error_rate)
+
+    def might_contain(self, digest):
+        bucket_seconds, _, _ = self._settings()
+        raw_digest = bytes.fromhex(digest)
+        current = math.floor(time.time() / bucket_seconds)
+        with self._lock:
+            # Buckets whose tokens have all expired can never match again
+            for bucket in [b for b in self._buckets if b <= current]:
+                del self._buckets[bucket]
+            return any(
+                raw_digest in bloom
+                for filters in self._buckets.values()
+                for bloom in filters
+            )
+
+    def refresh(self, force=False):
+        """
+        Loads rows added since the last refresh, at most once per interval.
+        The first call loads every unexpired row and sizes the filters.
+        """
+        bucket_seconds, error_rate, interval = self._settings()
+        if not force and time.monotonic() - self._refreshed_at < interval:
+            return
+        # One thread refreshes; the others keep using the current filters
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh(bucket_seconds, error_rate)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, bucket_seconds, error_rate):
+        tokens = BlacklistedToken.__table__
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        statement = select(tokens.c.id, tokens.c.token_digest, tokens.c.expires_at)
+        statement = statement.where(tokens.c.expires_at > now)
+
+        if self._watermark is None:
+            live = db.session.execute(
+                select(func.count())
+                .select_from(tokens)
+                .where(tokens.c.expires_at > now)
+            ).scalar()
+            with self._lock:
+                self._buckets = {}
+                self._capacity = max(BLOOM_MIN_CAPACITY, live)
+            watermark = 0
+        else:
+            watermark = self._watermark
+            statement = statement.where(
+                or_(
+                    tokens.c.id > watermark,
+                    tokens.c.blacklisted_on >= now - REFRESH_OVERLAP,
+                )
+            )
+
+        rows = db.session.execute(
+            statement.order_by(tokens.c.id).execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        added = 0
+        for row_id, digest, expires_at in rows:
+            with self._lock:
+                self._add(digest, expires_at, bucket_seconds, error_rate)
+            watermark = max(watermark, row_id)
+            added += 1
+
+        self._watermark = watermark
+        self._refreshed_at = time.monotonic()
+        if added:
+            logger.debug("Token blacklist filter refreshed: %s rows", added)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+# Function to read a stored expiry as a UNIX timestamp; naive values are UTC
+def _timestamp(expires_at):
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
+
+
+# Function to tell whether a signed token has been blacklisted
+def is_token_blacklisted(token):
+    blacklist_filter.refresh()
+    digest = BlacklistedToken.digest(token)
+    if not blacklist_filter.might_contain(digest):
+        return False
+    # Positives may be false; the digest index has the final word
+    return BlacklistedToken.check_digest(digest)
+
+
+def _after_insert(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, []).append(
+            (target.token_digest, target.expires_at)
+        )
+
+
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    for digest, expires_at in pending or ():
+        # Verified tokens are not re-checked, so the revoked one must go now
+        auth_manager.invalidate(digest)
+        if blacklist_filter.loaded:
+            blacklist_filter.add(digest, expires_at)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# Function to make tokens blacklisted by this process visible right away
+def init_token_blacklist(app):
+    if not event.contains(BlacklistedToken, "after_insert", _after_insert):
+        event.listen(BlacklistedToken, "after_insert", _after_insert)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,127 @@
+"""Background purge of expired blacklisted tokens.
+
+Expired rows are deleted in bounded batches, each in its own short
+transaction, with a pause in between so the sweep never holds locks for
+long. A sweep runs every ``TOKEN_SWEEP_INTERVAL`` seconds and can also be
+triggered from the admin endpoint, which only reports on its progress. The
+thread starts with the first request the app serves, never for CLI commands.
+"""
+
+import logging
+import threading
+import time
+
+from app import db
+from app.models import BlacklistedToken
+from app.utils.datetime_util import utc_now
+
+logger = logging.getLogger(__name__)
+
+
+class TokenSweeper:
+    """
+    Deletes expired blacklisted tokens in batches on a background thread
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._app = None
+        self._status = dict(
+            running=False,
+            last_started_at=None,
+            last_finished_at=None,
+            last_removed=None,
+            last_batches=None,
+            last_duration=None,
+            last_error=None,
+        )
+
+    @property
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def start(self, app):
+        with self._lock:
+            self._app = app
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="token-sweeper", daemon=True
+                )
+                self._thread.start()
+
+    def trigger(self, app):
+        """
+        Requests a sweep as soon as possible; returns False if one is running.
+        """
+        with self._lock:
+            if self._status["running"]:
+                return False
+        self.start(app)
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            interval = self._app.config.get("TOKEN_SWEEP_INTERVAL", 3600)
+            # Without a schedule the thread only serves triggered sweeps
+            self._wake.wait(timeout=interval or None)
+            self._wake.clear()
+            with self._app.app_context():
+                self.sweep()
+
+    def sweep(self):
+        config = self._app.config
+        batch_size = config.get("TOKEN_SWEEP_BATCH_SIZE", 1000)
+        pause = config.get("TOKEN_SWEEP_PAUSE", 0.1)
+
+        with self._lock:
+            self._status.update(
+                running=True, last_started_at=utc_now().isoformat(), last_error=None
+            )
+        started = time.monotonic()
+        removed = batches = 0
+        error = None
+        try:
+            while True:
+                deleted = BlacklistedToken.delete_expired(batch_size=batch_size)
+                removed += deleted
+                batches += 1
+                if deleted < batch_size:
+                    break
+                # Let other transactions through between batches
+                time.sleep(pause)
+        except Exception as e:
+            logger.exception("Purging expired blacklisted tokens failed")
+            error = str(e)
+        finally:
+            db.session.remove()
+
+        duration = round(time.monotonic() - started, 3)
+        with self._lock:
+            self._status.update(
+                running=False,
+                last_finished_at=utc_now().isoformat(),
+                last_removed=removed,
+                last_batches=batches,
+                last_duration=duration,
+                last_error=error,
+            )
+        logger.info(
+            "Purged %s expired blacklisted tokens in %s batches (%.3fs)",
+            removed,
+            batches,
+            duration,
+        )
+        return removed
+
+
+token_sweeper = TokenSweeper()
+
+
+# Function to start the scheduled sweep of an app serving requests
+def start_token_sweeper(app):
+    if app.config.get("TOKEN_SWEEP_INTERVAL", 3600):
+        token_sweeper.start(app)
@@ -10,6 +10,7 @@ from app.models import (
     Subject,
 )
 from app.models.publishers import Publisher
+from sqlalchemy import select
 
 
 # Function to add a new resource type to the database if it doesn't exist
@@ -22,12 +23,12 @@ def add_resource_type(resource_type):
 
 
 # Function to add new resources to the database
-def add_resources(resources):
+def add_resources(resources, book=None):
     new_resources = []
+    stale_books = set()
     for resource in resources:
         resource_type = resource["type"]
-        if resource_type:
-            new_type = add_resource_type(resource_type)
+        new_type = add_resource_type(resource_type) if resource_type else None
         url = resource["url"]
         size = resource["size"]
 
@@ -39,10 +40,23 @@ def add_resources(resources):
         new_resource = Resource.query.filter(Resource.url == url).first()
         if not new_resource:
             new_resource = Resource(
-                url=url, size=size, type_name=new_type.name, modified=modified
+                url=url,
+                size=size,
+                type_name=new_type.name if new_type else None,
+                modified=modified,
             )
             db.session.add(new_resource)
+        if book is not None:
+            # Moving an image away from another book can change its cover too
+            if new_resource.is_image and new_resource.book not in (None, book):
+                stale_books.add(new_resource.book)
+            new_resource.book = book
         new_resources.append(new_resource)
+
+    if book is not None and any(resource.is_image for resource in new_resources):
+        stale_books.add(book)
+    for stale_book in stale_books:
+        stale_book.refresh_cover_image()
     return new_resources
 
 
@@ -118,3 +132,9 @@ def add_publishers(publishers):
             db.session.add(new_publisher)
         new_publishers.append(new_publisher)
     return new_publishers
+
+
+# Function to select the ids of books linked to a row of an association table,
+# letting the planner start from the association's index instead of books
+def linked_book_ids(association, column, value):
+    return select(association.c.book_id).where(association.c[column] == value)
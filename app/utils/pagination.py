@@ -1,8 +1,300 @@
-from flask import url_for
+import base64
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+
+from flask import current_app, jsonify, url_for
+from flask_restx import abort, marshal
+from sqlalchemy import Table, and_, or_, text, tuple_
+
+
+# Supported ways of filling total_items / total_pages on a page
+COUNT_STRATEGIES = ("exact", "estimated", "cached", "none")
+
+# Per-process cache of counts for the "cached" strategy
+_count_cache = OrderedDict()
+_count_cache_lock = threading.Lock()
+_COUNT_CACHE_MAX_ENTRIES = 1024
+
+
+# Function to look up the count strategy configured for an endpoint
+def _count_strategy(endpoint):
+    strategies = current_app.config.get("PAGINATION_COUNT_STRATEGIES", {})
+    strategy = strategies.get(
+        endpoint, current_app.config.get("PAGINATION_COUNT_STRATEGY", "exact")
+    )
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"Unknown pagination count strategy: {strategy}")
+    return strategy
+
+
+# Function to run an exact COUNT(*) over the filtered query
+def _exact_count(query):
+    return query.order_by(None).count()
+
+
+# Function to read the planner's row estimate instead of counting
+def _estimated_count(query):
+    connection = query.session.connection()
+    if connection.dialect.name != "postgresql":
+        return _exact_count(query)
+
+    statement = query.order_by(None).statement
+    froms = statement.get_final_froms()
+    if (
+        statement.whereclause is None
+        and len(froms) == 1
+        and isinstance(froms[0], Table)
+    ):
+        # Unfiltered scans can use the table statistics directly
+        estimate = connection.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": froms[0].fullname},
+        ).scalar()
+    else:
+        compiled = statement.compile(dialect=connection.dialect)
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]["Plan"]["Plan Rows"]
+
+    # Tables that were never analyzed report -1
+    if estimate is None or estimate < 0:
+        return _exact_count(query)
+    return int(estimate)
+
+
+# Function to serve a TTL-cached exact count keyed by the filter set
+def _cached_count(query, endpoint, count_key=None):
+    if count_key is None:
+        compiled = query.order_by(None).statement.compile()
+        count_key = (str(compiled), repr(sorted(compiled.params.items())))
+    key = (endpoint, count_key)
+    ttl = current_app.config.get("PAGINATION_COUNT_CACHE_TTL", 60)
+    now = time.monotonic()
+
+    with _count_cache_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[1] > now:
+            _count_cache.move_to_end(key)
+            return entry[0]
+
+    total = _exact_count(query)
+    with _count_cache_lock:
+        _count_cache[key] = (total, now + ttl)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > _COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+    return total
+
+
+# Function to paginate a query with the count strategy configured for an endpoint
+def _paginate(query, page, per_page, endpoint, count_key=None, error_out=True):
+    strategy = _count_strategy(endpoint)
+    offset = (page - 1) * per_page
+
+    # Fetch one extra row so has_next never depends on the count
+    rows = query.limit(per_page + 1).offset(offset).all()
+    items = rows[:per_page]
+    has_next = len(rows) > per_page
+
+    if error_out and page > 1 and not items:
+        abort(HTTPStatus.NOT_FOUND)
+
+    if strategy == "none":
+        total = None
+    elif strategy == "estimated":
+        # Never report fewer rows than the page itself proves exist
+        total = max(_estimated_count(query), offset + len(items) + int(has_next))
+    elif strategy == "cached":
+        total = _cached_count(query, endpoint, count_key)
+    else:
+        total = _exact_count(query)
+
+    total_pages = math.ceil(total / per_page) if total is not None else None
+    return dict(
+        page=page,
+        items_per_page=per_page,
+        total_pages=total_pages,
+        total_items=total,
+        items=items,
+        has_next=has_next,
+        has_prev=page > 1,
+        next_num=page + 1 if has_next else None,
+        prev_num=page - 1 if page > 1 else None,
+        links=[],
+    )
+
+
+# Function to paginate ids ranked elsewhere, loading only the requested page
+def _paginate_ranked_ids(ranked_ids, model, page, per_page, error_out=True):
+    offset = (page - 1) * per_page
+    page_ids = list(ranked_ids[offset : offset + per_page])
+
+    if error_out and page > 1 and not page_ids:
+        abort(HTTPStatus.NOT_FOUND)
+
+    # Hydrate the page in one query and restore the ranking order
+    rows = model.query.filter(model.id.in_(page_ids)).all() if page_ids else []
+    rows_by_id = {row.id: row for row in rows}
+    items = [rows_by_id[row_id] for row_id in page_ids if row_id in rows_by_id]
+
+    total = len(ranked_ids)
+    has_next = offset + per_page < total
+    return dict(
+        page=page,
+        items_per_page=per_page,
+        total_pages=math.ceil(total / per_page),
+        total_items=total,
+        items=items,
+        has_next=has_next,
+        has_prev=page > 1,
+        next_num=page + 1 if has_next else None,
+        prev_num=page - 1 if page > 1 else None,
+        links=[],
+    )
+
+
+# Function to marshal a page and attach its navigation links to body and headers
+def _paginated_response(pagination, model, endpoint, **kwargs):
+    response_data = marshal(pagination, model)
+    if "next_cursor" in pagination:
+        response_data["next_cursor"] = pagination["next_cursor"]
+
+    # Build the links once and reuse them for the Link header
+    nav_links = _pagination_nav_links(pagination, endpoint, **kwargs)
+    response_data["links"] = nav_links
+    response = jsonify(response_data)
+    response.headers["Link"] = _link_header(nav_links)
+    if pagination.get("total_items") is not None:
+        response.headers["Total-Count"] = pagination["total_items"]
+    return response
+
+
+# Function to encode a keyset position as an opaque cursor token
+def encode_cursor(position):
+    payload = json.dumps(position, separators=(",", ":"))
+    token = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+    return token.rstrip("=")
+
+
+# Function to decode a cursor token produced by encode_cursor
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        position = None
+    if not isinstance(position, dict) or "id" not in position:
+        abort(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+    return position
+
+
+# Function to build the cursor pointing just past the given row
+def _cursor_for(item, sort_attr, scope):
+    position = {"s": scope, "id": item.id}
+    if sort_attr:
+        value = getattr(item, sort_attr)
+        if isinstance(value, datetime):
+            position["t"] = "datetime"
+            value = value.isoformat()
+        position["k"] = value
+    return encode_cursor(position)
+
+
+# Function to page through a query with a WHERE clause on (sort key, id)
+def _keyset_pagination(
+    query, model, per_page, cursor=None, sort_attr=None, descending=False, scope=None
+):
+    id_column = model.id
+    sort_column = getattr(model, sort_attr) if sort_attr else None
+
+    # Expressions without a nullable flag, like Book.average_rating, never
+    # yield NULL; NULL values of nullable columns come last in both directions
+    nullable = getattr(sort_column, "nullable", False)
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position.get("s") != scope:
+            abort(HTTPStatus.BAD_REQUEST, "Cursor does not match the requested sort")
+        last_id = position["id"]
+        if sort_column is None:
+            after = id_column < last_id if descending else id_column > last_id
+        elif position.get("k") is None and nullable:
+            # Past the last non-NULL key: only the NULL rows are left
+            after = and_(
+                sort_column.is_(None),
+                id_column < last_id if descending else id_column > last_id,
+            )
+        else:
+            last_key = position.get("k")
+            if last_key is not None and position.get("t") == "datetime":
+                last_key = datetime.fromisoformat(last_key)
+            row_key = tuple_(sort_column, id_column)
+            bound = (last_key, last_id)
+            after = row_key < bound if descending else row_key > bound
+            if nullable:
+                after = or_(after, sort_column.is_(None))
+        query = query.filter(after)
+
+    order_columns = [id_column] if sort_column is None else [sort_column, id_column]
+    if descending:
+        order_columns = [column.desc() for column in order_columns]
+    else:
+        order_columns = [column.asc() for column in order_columns]
+    if nullable:
+        order_columns[0] = order_columns[0].nulls_last()
+
+    # Fetch one extra row to learn whether another page exists without a COUNT(*)
+    rows = query.order_by(None).order_by(*order_columns).limit(per_page + 1).all()
+    items = rows[:per_page]
+    has_next = len(rows) > per_page
+    next_cursor = _cursor_for(items[-1], sort_attr, scope) if has_next else None
+
+    return dict(
+        items_per_page=per_page,
+        items=items,
+        cursor=cursor or "",
+        next_cursor=next_cursor,
+        has_next=has_next,
+        has_prev=bool(cursor),
+        links=[],
+    )
+
+
+# Function to generate navigation links for cursor (keyset) pagination
+def _cursor_nav_links(pagination, endpoint, **kwargs):
+    per_page = pagination["items_per_page"]
+
+    nav_links = {}
+    nav_links["self"] = url_for(
+        f"api.{endpoint}", **kwargs, cursor=pagination["cursor"], per_page=per_page
+    )
+    nav_links["first"] = url_for(
+        f"api.{endpoint}", **kwargs, cursor="", per_page=per_page
+    )
+    if pagination["has_next"]:
+        nav_links["next"] = url_for(
+            f"api.{endpoint}",
+            **kwargs,
+            cursor=pagination["next_cursor"],
+            per_page=per_page,
+        )
+    return nav_links
 
 
 # Function to generate pagination navigation links
 def _pagination_nav_links(pagination, endpoint, **kwargs):
+    # Cursor pages have no page numbers, only a "next" position
+    if "next_cursor" in pagination:
+        return _cursor_nav_links(pagination, endpoint, **kwargs)
+
     # Initialize a dictionary to store navigation links
     nav_links = {}
 
@@ -24,23 +316,18 @@ def _pagination_nav_links(pagination, endpoint, **kwargs):
         nav_links["next"] = url_for(
             f"api.{endpoint}", **kwargs, page=this_page + 1, per_page=per_page
         )
-    nav_links["last"] = url_for(
-        f"api.{endpoint}", **kwargs, page=last_page, per_page=per_page
-    )
+    if last_page is not None:
+        nav_links["last"] = url_for(
+            f"api.{endpoint}", **kwargs, page=last_page, per_page=per_page
+        )
     return nav_links
 
 
-# Function to generate pagination navigation links for HTTP header
-def _pagination_nav_header_links(pagination, endpoint, **kwargs):
-    # Get navigation links dictionary
-    url_dict = _pagination_nav_links(pagination, endpoint, **kwargs)
-
-    # Initialize a string to store HTTP header links
-    link_header = ""
+# Function to format navigation links as an HTTP Link header
+def _link_header(nav_links):
+    return ", ".join(f"<{url}>; rel={rel}" for rel, url in nav_links.items())
 
-    # Construct link header from navigation links
-    for rel, url in url_dict.items():
-        link_header += f"<{url}>; rel={rel}"
 
-    # Strip extra spaces and commas from the link header and return
-    return link_header.strip().strip(",")
+# Function to generate pagination navigation links for HTTP header
+def _pagination_nav_header_links(pagination, endpoint, **kwargs):
+    return _link_header(_pagination_nav_links(pagination, endpoint, **kwargs))
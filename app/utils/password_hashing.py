@@ -0,0 +1,139 @@
+"""Password hashing off the request threads.
+
+bcrypt is CPU bound by design, so hashing and checking passwords on the
+waitress threads lets a burst of logins occupy every thread while catalog
+reads wait. With ``PASSWORD_HASH_WORKERS`` set, the work runs in a pool of
+spawned processes instead. At most ``PASSWORD_HASH_QUEUE_SIZE`` operations
+are admitted at a time (running or queued); beyond that, and when a result
+takes longer than ``PASSWORD_HASH_TIMEOUT`` seconds, ``PasswordHashingBusy``
+is raised and the API answers 503 with a ``Retry-After`` header. A pool
+broken by a dying worker process is replaced on the next operation.
+"""
+
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import flask_bcrypt
+from flask import current_app
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when the password hashing pool admits no more work
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Too many password operations in progress")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for bcrypt
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._exit_hook = False
+
+    def _pool(self, config):
+        with self._lock:
+            if self._executor is None:
+                workers = config["PASSWORD_HASH_WORKERS"]
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    # Forking a process with live threads and connections is unsafe
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._slots = threading.BoundedSemaphore(
+                    config.get("PASSWORD_HASH_QUEUE_SIZE") or workers * 2
+                )
+                if not self._exit_hook:
+                    atexit.register(self.shutdown)
+                    self._exit_hook = True
+            return self._executor, self._slots
+
+    def run(self, function, *args):
+        config = current_app.config
+        if not config.get("PASSWORD_HASH_WORKERS"):
+            return function(*args)
+        retry_after = config.get("PASSWORD_HASH_RETRY_AFTER", 2)
+        executor, slots = self._pool(config)
+        try:
+            return self._submit(executor, slots, config, function, args)
+        except BrokenProcessPool:
+            # A worker process died (OOM, killed) and took the pool with it;
+            # replace the pool and try once more, as the work has no effects
+            self._discard(executor)
+        executor, slots = self._pool(config)
+        try:
+            return self._submit(executor, slots, config, function, args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise PasswordHashingBusy(retry_after)
+
+    def _submit(self, executor, slots, config, function, args):
+        retry_after = config.get("PASSWORD_HASH_RETRY_AFTER", 2)
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy(retry_after)
+        try:
+            future = executor.submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the work finishes or is cancelled, not just
+        # while this request waits, so abandoned work still counts
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=config.get("PASSWORD_HASH_TIMEOUT", 10))
+        except FutureTimeoutError:
+            # Work that has not reached a process yet is dropped
+            future.cancel()
+            raise PasswordHashingBusy(retry_after)
+
+    def _discard(self, executor):
+        # Other threads may have replaced the broken pool already
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._slots = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._slots = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
+# Function to hash a password in a pool process
+def _hash(password, rounds):
+    return flask_bcrypt.generate_password_hash(password, rounds).decode("utf-8")
+
+
+# Function to check a password against its hash in a pool process
+def _check(password_hash, password):
+    return flask_bcrypt.check_password_hash(password_hash, password)
+
+
+# Function to hash a password with the configured number of rounds
+def hash_password(password):
+    return password_hasher.run(
+        _hash, password, current_app.config.get("BCRYPT_LOG_ROUNDS")
+    )
+
+
+# Function to check a password against a stored hash
+def check_password(password_hash, password):
+    return password_hasher.run(_check, password_hash, password)
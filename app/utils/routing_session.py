@@ -0,0 +1,49 @@
+"""Session that sends the reads of read-only requests to a replica.
+
+``app.services.read_replicas`` picks a replica bind for each request and
+stores its key in ``g.db_replica``; everything else (writes, flushes,
+locking reads, raw SQL, work outside a request and every read after the
+session wrote) goes to the primary.
+"""
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Session.info key set once the session has flushed changes
+WROTE_KEY = "routing_wrote"
+
+
+# Function to tell whether a statement only reads and can run on a replica
+def _is_plain_read(clause):
+    if clause is None or not getattr(clause, "is_select", False):
+        return False
+    # SELECT ... FOR UPDATE needs the primary's rows
+    return getattr(clause, "_for_update_arg", None) is None
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session routing plain reads to the request's replica
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not self.info.get(WROTE_KEY)
+            and has_request_context()
+            and _is_plain_read(clause)
+        ):
+            replica = g.get("db_replica")
+            if replica is not None:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    # Read the session's own writes back from the primary
+    session.info[WROTE_KEY] = True
+    if has_request_context():
+        g.db_wrote = True
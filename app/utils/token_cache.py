@@ -0,0 +1,105 @@
+"""Per-process cache of verified tokens.
+
+Clients send the same auth token with every request until it expires, and
+``require_token`` used to check its signature and claims each time.
+``CachingAuthManager`` keeps the tokens that passed verification in a small
+LRU keyed by the SHA-256 digest of the signed token, together with the
+parsed JWT, until the token's ``exp``. At most ``JWT_TOKEN_CACHE_SIZE``
+tokens are kept. Blacklisting a token drops its entry as soon as the
+blacklist row commits (see ``app.services.token_blacklist``).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_pyjwt import JWT, AuthManager
+from jwt import InvalidTokenError
+
+# Entries kept outside an application context
+DEFAULT_TOKEN_CACHE_SIZE = 4096
+
+
+# Function to get the hex SHA-256 digest identifying a signed token
+def token_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class CachingAuthManager(AuthManager):
+    """
+    AuthManager remembering verified tokens until they expire
+    """
+
+    def __init__(self, app=None, dotenv_path=None):
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+        super().__init__(app, dotenv_path)
+
+    def _lookup(self, digest):
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(digest)
+            if entry is None:
+                return None
+            if entry.exp <= now:
+                del self._tokens[digest]
+                return None
+            self._tokens.move_to_end(digest)
+            return entry
+
+    def _store(self, digest, token):
+        max_entries = (
+            current_app.config.get("JWT_TOKEN_CACHE_SIZE", DEFAULT_TOKEN_CACHE_SIZE)
+            if has_app_context()
+            else DEFAULT_TOKEN_CACHE_SIZE
+        )
+        if max_entries <= 0 or not token.exp or token.exp <= time.time():
+            return
+        with self._lock:
+            self._tokens[digest] = token
+            self._tokens.move_to_end(digest)
+            while len(self._tokens) > max_entries:
+                self._tokens.popitem(last=False)
+
+    def verified_token(self, signed_token):
+        """
+        Returns the JWT of a signed token, or None if it does not verify.
+        """
+        if not signed_token:
+            return None
+        digest = token_digest(signed_token)
+        token = self._lookup(digest)
+        if token is not None:
+            return token
+        try:
+            token = JWT.from_signed_token(signed_token)
+        except (InvalidTokenError, KeyError):
+            return None
+        if not super().verify_token(token):
+            return None
+        self._store(digest, token)
+        return token
+
+    def verify_token(self, token):
+        if isinstance(token, JWT):
+            if not token.is_signed():
+                return False
+            token = token.signed
+        return self.verified_token(token) is not None
+
+    def convert_token(self, signed_token):
+        # A verified token is already parsed; anything else is parsed as before
+        token = self._lookup(token_digest(signed_token))
+        if token is not None:
+            return token
+        return JWT.from_signed_token(signed_token)
+
+    def invalidate(self, digest):
+        with self._lock:
+            self._tokens.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
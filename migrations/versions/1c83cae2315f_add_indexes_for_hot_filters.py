@@ -0,0 +1,149 @@
+"""add indexes for hot filters
+
+Revision ID: 1c83cae2315f
+Revises: a3d94e85afda
+Create Date: 2026-10-18 16:40:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "1c83cae2315f"
+down_revision = "a3d94e85afda"
+branch_labels = None
+depends_on = None
+
+
+# Same expression as Book.average_rating, so the rating sort can use the index
+books = sa.table(
+    "books",
+    sa.column("rating_sum", sa.Float),
+    sa.column("rating_count", sa.Integer),
+)
+average_rating = sa.case(
+    (
+        books.c.rating_count > sa.literal_column("0"),
+        books.c.rating_sum / books.c.rating_count,
+    ),
+    else_=sa.literal_column("0.0"),
+)
+
+# (index name, table, columns, unique)
+INDEXES = [
+    ("ix_books_downloads", "books", ["downloads"], False),
+    ("ix_books_popularity_score", "books", ["popularity_score"], False),
+    ("ix_books_created_at", "books", ["created_at"], False),
+    ("ix_books_average_rating_id", "books", [average_rating, "id"], False),
+    ("ix_bookmarks_book_id", "bookmarks", ["book_id"], False),
+    ("ix_bookshelves_user_id", "bookshelves", ["user_id"], False),
+    (
+        "ix_comments_book_id_type_created_at",
+        "comments",
+        ["book_id", "type", "created_at"],
+        False,
+    ),
+    ("ix_comments_parent_id", "comments", ["parent_id"], False),
+    ("ix_comments_user_id", "comments", ["user_id"], False),
+    (
+        "ix_comment_votes_comment_id_user_id",
+        "comment_votes",
+        ["comment_id", "user_id"],
+        False,
+    ),
+    ("ix_comment_votes_user_id", "comment_votes", ["user_id"], False),
+    ("ix_ratings_book_id", "ratings", ["book_id"], False),
+    ("ix_resources_book_id", "resources", ["book_id"], False),
+    ("ix_resources_mime_type", "resources", ["mime_type"], False),
+    ("ix_token_blacklist_expires_at", "token_blacklist", ["expires_at"], False),
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_users_public_id", "users", ["public_id"], True),
+    # Reverse side of the association tables; the primary keys lead with book_id
+    ("ix_book_agents_agent_id_book_id", "book_agents", ["agent_id", "book_id"], False),
+    (
+        "ix_book_bookshelves_bookshelf_id_book_id",
+        "book_bookshelves",
+        ["bookshelf_id", "book_id"],
+        False,
+    ),
+    (
+        "ix_book_languages_language_id_book_id",
+        "book_languages",
+        ["language_id", "book_id"],
+        False,
+    ),
+    (
+        "ix_book_publishers_publisher_id_book_id",
+        "book_publishers",
+        ["publisher_id", "book_id"],
+        False,
+    ),
+    (
+        "ix_book_subjects_subject_id_book_id",
+        "book_subjects",
+        ["subject_id", "book_id"],
+        False,
+    ),
+    (
+        "ix_user_bookshelves_bookshelf_id_user_id",
+        "user_bookshelves",
+        ["bookshelf_id", "user_id"],
+        False,
+    ),
+    (
+        "ix_user_subjects_subject_id_user_id",
+        "user_subjects",
+        ["subject_id", "user_id"],
+        False,
+    ),
+]
+
+# An index whose concurrent build failed, in the current schema
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+    "WHERE pg_class.relname = :name AND pg_table_is_visible(pg_class.oid) "
+    "AND NOT pg_index.indisvalid"
+)
+
+
+# Function to drop an index left INVALID by a failed concurrent build, so a
+# rerun builds it again instead of skipping it
+def _drop_invalid_index(name, table):
+    if op.get_context().as_sql or op.get_bind().dialect.name != "postgresql":
+        return
+    if op.get_bind().execute(INVALID_INDEX, {"name": name}).first() is not None:
+        op.drop_index(
+            name,
+            table_name=table,
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction; building the
+    # indexes this way keeps the tables writable while they are created
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            _drop_invalid_index(name, table)
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,33 @@
+"""add comments counters
+
+Revision ID: 282bb4b7a64c
+Revises: b3b498e2e3ad
+Create Date: 2026-10-18 16:15:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "282bb4b7a64c"
+down_revision = "b3b498e2e3ad"
+branch_labels = None
+depends_on = None
+
+COUNTERS = ["upvote_count", "downvote_count", "reply_count"]
+
+
+def upgrade():
+    # Counters start at 0; `flask catalog reconcile-aggregates` fills them in
+    for name in COUNTERS:
+        op.add_column(
+            "comments",
+            sa.Column(name, sa.Integer(), server_default="0", nullable=False),
+        )
+
+
+def downgrade():
+    for name in reversed(COUNTERS):
+        op.drop_column("comments", name)
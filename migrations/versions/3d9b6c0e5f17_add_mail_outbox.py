@@ -0,0 +1,49 @@
+"""add mail outbox
+
+Revision ID: 3d9b6c0e5f17
+Revises: 8e3f2a61d7b4
+Create Date: 2026-10-18 20:05:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3d9b6c0e5f17"
+down_revision = "8e3f2a61d7b4"
+branch_labels = None
+depends_on = None
+
+mail_status = sa.Enum("PENDING", "SENDING", "SENT", "FAILED", name="mailstatus")
+
+
+def upgrade():
+    op.create_table(
+        "mail_outbox",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("sender", sa.String(), nullable=True),
+        sa.Column("recipients", sa.JSON(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=True),
+        sa.Column("html", sa.Text(), nullable=True),
+        sa.Column("status", mail_status, nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_mail_outbox_status_next_attempt_at",
+        "mail_outbox",
+        ["status", "next_attempt_at"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_mail_outbox_status_next_attempt_at", table_name="mail_outbox")
+    op.drop_table("mail_outbox")
+    mail_status.drop(op.get_bind(), checkfirst=True)
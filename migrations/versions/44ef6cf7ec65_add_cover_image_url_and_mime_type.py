@@ -0,0 +1,29 @@
+"""add cover image url and mime type
+
+Revision ID: 44ef6cf7ec65
+Revises: 77adc6d0efc6
+Create Date: 2026-10-18 16:05:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "44ef6cf7ec65"
+down_revision = "77adc6d0efc6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable columns are added without rewriting the tables; existing rows
+    # are filled by `flask catalog backfill-covers`
+    op.add_column("books", sa.Column("cover_image_url", sa.String(), nullable=True))
+    op.add_column("resources", sa.Column("mime_type", sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("resources", "mime_type")
+    op.drop_column("books", "cover_image_url")
@@ -0,0 +1,66 @@
+"""add books trending score
+
+Revision ID: 5b0e7d9a4c21
+Revises: 1c83cae2315f
+Create Date: 2026-10-18 18:05:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b0e7d9a4c21"
+down_revision = "1c83cae2315f"
+branch_labels = None
+depends_on = None
+
+
+# An index whose concurrent build failed, in the current schema
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+    "WHERE pg_class.relname = :name AND pg_table_is_visible(pg_class.oid) "
+    "AND NOT pg_index.indisvalid"
+)
+
+
+# Function to drop an index left INVALID by a failed concurrent build, so a
+# rerun builds it again instead of skipping it
+def _drop_invalid_index(name, table):
+    if op.get_context().as_sql or op.get_bind().dialect.name != "postgresql":
+        return
+    if op.get_bind().execute(INVALID_INDEX, {"name": name}).first() is not None:
+        op.drop_index(
+            name,
+            table_name=table,
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def upgrade():
+    # A constant server default keeps ADD COLUMN a metadata-only change
+    op.add_column(
+        "books",
+        sa.Column("trending_score", sa.Float(), server_default="0", nullable=False),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_books_trending_score",
+            "books",
+            ["trending_score"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_books_trending_score",
+            table_name="books",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_column("books", "trending_score")
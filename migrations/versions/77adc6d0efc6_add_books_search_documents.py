@@ -0,0 +1,83 @@
+"""add books search documents
+
+Revision ID: 77adc6d0efc6
+Revises:
+Create Date: 2026-10-18 15:55:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "77adc6d0efc6"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# An index whose concurrent build failed, in the current schema
+INVALID_INDEX = sa.text(
+    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+    "WHERE pg_class.relname = :name AND pg_table_is_visible(pg_class.oid) "
+    "AND NOT pg_index.indisvalid"
+)
+
+
+# Function to drop an index left INVALID by a failed concurrent build, so a
+# rerun builds it again instead of skipping it
+def _drop_invalid_index(name, table):
+    if op.get_context().as_sql or op.get_bind().dialect.name != "postgresql":
+        return
+    if op.get_bind().execute(INVALID_INDEX, {"name": name}).first() is not None:
+        op.drop_index(
+            name,
+            table_name=table,
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def upgrade():
+    # Existing books get their documents from `flask search reindex`
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+            "title, agents, subjects, bookshelves, description, "
+            "tokenize = 'porter unicode61')"
+        )
+    op.add_column(
+        "books",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR().with_variant(sa.Text(), "sqlite"),
+            nullable=True,
+        ),
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            _drop_invalid_index("ix_books_search_vector", "books")
+            op.create_index(
+                "ix_books_search_vector",
+                "books",
+                ["search_vector"],
+                if_not_exists=True,
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                "ix_books_search_vector",
+                table_name="books",
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
+    op.drop_column("books", "search_vector")
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS books_fts")
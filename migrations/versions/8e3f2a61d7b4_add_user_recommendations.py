@@ -0,0 +1,41 @@
+"""add user recommendations
+
+Revision ID: 8e3f2a61d7b4
+Revises: 5b0e7d9a4c21
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8e3f2a61d7b4"
+down_revision = "5b0e7d9a4c21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_recommendations",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("language", sa.String(length=16), nullable=False),
+        sa.Column("book_ids", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "language"),
+    )
+    op.create_index(
+        "ix_user_recommendations_computed_at",
+        "user_recommendations",
+        ["computed_at"],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_user_recommendations_computed_at", table_name="user_recommendations"
+    )
+    op.drop_table("user_recommendations")
@@ -0,0 +1,87 @@
+"""store blacklisted token digests
+
+Revision ID: a3d94e85afda
+Revises: 282bb4b7a64c
+Create Date: 2026-10-18 16:20:00.000000
+
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3d94e85afda"
+down_revision = "282bb4b7a64c"
+branch_labels = None
+depends_on = None
+
+# Rows hashed per round trip while backfilling the digests
+BATCH_SIZE = 1000
+
+token_blacklist = sa.table(
+    "token_blacklist",
+    sa.column("id", sa.Integer),
+    sa.column("token", sa.String),
+    sa.column("token_digest", sa.String),
+    sa.column("expires_at", sa.DateTime),
+)
+
+
+def upgrade():
+    connection = op.get_bind()
+    op.add_column(
+        "token_blacklist", sa.Column("token_digest", sa.String(64), nullable=True)
+    )
+
+    # Expired tokens are rejected anyway; only live ones need a digest
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    connection.execute(
+        token_blacklist.delete().where(token_blacklist.c.expires_at < now)
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(token_blacklist.c.id, token_blacklist.c.token)
+            .where(token_blacklist.c.id > last_id)
+            .order_by(token_blacklist.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            token_blacklist.update()
+            .where(token_blacklist.c.id == sa.bindparam("row_id"))
+            .values(token_digest=sa.bindparam("digest")),
+            [
+                dict(
+                    row_id=row_id,
+                    digest=hashlib.sha256(token.encode("utf-8")).hexdigest(),
+                )
+                for row_id, token in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+    # Batch mode rebuilds the table on SQLite, which can't alter columns
+    with op.batch_alter_table("token_blacklist") as batch_op:
+        batch_op.alter_column(
+            "token_digest", existing_type=sa.String(64), nullable=False
+        )
+        batch_op.create_unique_constraint(
+            "token_blacklist_token_digest_key", ["token_digest"]
+        )
+        batch_op.drop_column("token")
+
+
+def downgrade():
+    # Only digests were kept, so the blacklisted tokens can't be restored
+    op.execute(token_blacklist.delete())
+    with op.batch_alter_table("token_blacklist") as batch_op:
+        batch_op.add_column(sa.Column("token", sa.String(500), nullable=False))
+        batch_op.create_unique_constraint("token_blacklist_token_key", ["token"])
+        batch_op.drop_constraint("token_blacklist_token_digest_key", type_="unique")
+        batch_op.drop_column("token_digest")
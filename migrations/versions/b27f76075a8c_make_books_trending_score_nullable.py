@@ -0,0 +1,61 @@
+"""make books trending score nullable
+
+Revision ID: b27f76075a8c
+Revises: 3d9b6c0e5f17
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b27f76075a8c"
+down_revision = "3d9b6c0e5f17"
+branch_labels = None
+depends_on = None
+
+
+# Function to rebuild ix_books_trending_score for the given sort order
+def _replace_index(columns):
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_books_trending_score",
+            table_name="books",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_books_trending_score",
+            "books",
+            columns,
+            postgresql_concurrently=True,
+        )
+
+
+def upgrade():
+    # NULL now stands for "no events yet"; 0 was the old default, not a score
+    with op.batch_alter_table("books") as batch_op:
+        batch_op.alter_column(
+            "trending_score",
+            existing_type=sa.Float(),
+            nullable=True,
+            server_default=None,
+        )
+    op.execute("UPDATE books SET trending_score = NULL WHERE trending_score = 0")
+    if op.get_bind().dialect.name == "postgresql":
+        _replace_index([sa.text("trending_score DESC NULLS LAST")])
+
+
+def downgrade():
+    op.execute("UPDATE books SET trending_score = 0 WHERE trending_score IS NULL")
+    with op.batch_alter_table("books") as batch_op:
+        batch_op.alter_column(
+            "trending_score",
+            existing_type=sa.Float(),
+            nullable=False,
+            server_default="0",
+        )
+    if op.get_bind().dialect.name == "postgresql":
+        _replace_index(["trending_score"])
@@ -0,0 +1,40 @@
+"""add books engagement aggregates
+
+Revision ID: b3b498e2e3ad
+Revises: 44ef6cf7ec65
+Create Date: 2026-10-18 16:10:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b3b498e2e3ad"
+down_revision = "44ef6cf7ec65"
+branch_labels = None
+depends_on = None
+
+# (column, type) of the aggregates stored on books
+AGGREGATES = [
+    ("rating_sum", sa.Float()),
+    ("rating_count", sa.Integer()),
+    ("review_count", sa.Integer()),
+    ("comment_count", sa.Integer()),
+    ("bookmark_count", sa.Integer()),
+]
+
+
+def upgrade():
+    # A constant server default keeps ADD COLUMN a metadata-only change;
+    # `flask catalog reconcile-aggregates` fills in the real values
+    for name, type_ in AGGREGATES:
+        op.add_column(
+            "books", sa.Column(name, type_, server_default="0", nullable=False)
+        )
+
+
+def downgrade():
+    for name, _ in reversed(AGGREGATES):
+        op.drop_column("books", name)
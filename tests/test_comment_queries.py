@@ -0,0 +1,79 @@
+"""Query count of the comment listing."""
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import Book, Comment, CommentType, Profile, User
+
+# Comments on the book, each by a different user
+COMMENT_COUNT = 30
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("JWT_ISSUER", "pico-library-test")
+    monkeypatch.setenv("JWT_AUTHTYPE", "HS256")
+    monkeypatch.setenv("JWT_SECRET", "pico-library-test-secret")
+    monkeypatch.setattr(
+        TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path}/test.db"
+    )
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        book = Book(title="Pride and Prejudice")
+        db.session.add(book)
+        for number in range(COMMENT_COUNT):
+            user = User(email=f"reader{number}@example.com", password="password")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(
+                Profile(user_id=user.id, first_name="Reader", last_name=f"{number}")
+            )
+            db.session.add(
+                Comment(
+                    content=f"Comment {number}",
+                    type=CommentType.COMMENT,
+                    book=book,
+                    user=user,
+                )
+            )
+        db.session.commit()
+        book_id = book.id
+        db.session.remove()
+    app.config["TEST_BOOK_ID"] = book_id
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+# Function to count the statements executed while listing a page of comments
+def _count_listing_queries(app, per_page):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            response = client.get(
+                "/api/v1/comments/",
+                query_string={
+                    "book_id": app.config["TEST_BOOK_ID"],
+                    "type": "comment",
+                    "per_page": per_page,
+                },
+            )
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.get_json()
+    assert len(response.get_json()["items"]) == per_page
+    return len(statements)
+
+
+def test_comment_page_query_count_does_not_grow_with_page_size(app):
+    assert _count_listing_queries(app, 5) == _count_listing_queries(app, 25)